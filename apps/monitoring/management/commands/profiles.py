@@ -0,0 +1,83 @@
+import io
+import os
+import pstats
+from datetime import datetime
+
+from django.core.management.base import (
+    BaseCommand,
+    CommandError,
+)
+
+from monitoring.profiling import (
+    get_profile_dir,
+    get_profiles,
+    make_profile_token,
+)
+
+
+class Command(BaseCommand):
+    help = 'Список и сводка сохраненных профилей запросов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'name',
+            nargs='?',
+            help='Название профиля для вывода сводки',
+        )
+        parser.add_argument(
+            '--sort',
+            default='cumulative',
+            help='Поле сортировки сводки pstats',
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=30,
+            help='Количество функций в сводке',
+        )
+        parser.add_argument(
+            '--route',
+            help='Фильтр списка по названию маршрута',
+        )
+        parser.add_argument(
+            '--token',
+            action='store_true',
+            help='Вывести значение заголовка X-Profile',
+        )
+
+    def handle(self, *args, **options):
+        if options['token']:
+            self.stdout.write(make_profile_token())
+            return
+
+        if options['name']:
+            self.show(
+                name=options['name'],
+                sort=options['sort'],
+                limit=options['limit'],
+            )
+            return
+
+        profiles = get_profiles()
+        if options['route']:
+            profiles = [
+                profile for profile in profiles
+                if profile['route'] == options['route']
+            ]
+        if not profiles:
+            self.stdout.write(f'Профили в {get_profile_dir()} не найдены')
+            return
+        for profile in profiles:
+            created = datetime.fromtimestamp(profile['created']).isoformat(timespec='seconds')
+            self.stdout.write(
+                f'{profile["name"]}  {created}  {profile["route"]}  {profile["latency_ms"]} мс'
+            )
+
+    def show(self, name: str, sort: str, limit: int) -> None:
+        path = os.path.join(get_profile_dir(), os.path.basename(name))
+        if not os.path.exists(path):
+            raise CommandError(f'Профиль {name} не найден')
+        stream = io.StringIO()
+        stats = pstats.Stats(path, stream=stream)
+        stats.strip_dirs().sort_stats(sort).print_stats(limit)
+        self.stdout.write(stream.getvalue())
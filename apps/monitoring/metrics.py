@@ -0,0 +1,501 @@
+import bisect
+import fcntl
+import glob
+import json
+import mmap
+import os
+import struct
+import tempfile
+import threading
+
+from django.conf import settings
+
+
+HEADER = struct.Struct('q')
+KEY_LENGTH = struct.Struct('i')
+VALUE = struct.Struct('d')
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+WAIT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5)
+
+ARCHIVE_NAME = 'metrics_archive.db'
+LOCK_NAME = 'metrics.lock'
+
+
+def get_metrics_dir() -> str:
+    '''
+    Получение директории файлов метрик процессов
+
+    Returns:
+        Путь к директории
+    '''
+
+    return getattr(settings, 'METRICS_DIR', None) or os.path.join(
+        tempfile.gettempdir(),
+        'drf_posts_metrics',
+    )
+
+
+class MmapValues:
+    initial_size = 1 << 16
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._positions = {}
+        self._file = open(path, 'a+b')
+        size = os.fstat(self._file.fileno()).st_size
+        if size < self.initial_size:
+            self._file.truncate(self.initial_size)
+            size = self.initial_size
+        self._capacity = size
+        self._mmap = mmap.mmap(self._file.fileno(), size)
+        self._used = HEADER.unpack_from(self._mmap, 0)[0] or HEADER.size
+        for key, _, position in read_entries(self._mmap, self._used):
+            self._positions[key] = position
+
+    def _grow(self, size: int) -> None:
+        capacity = self._capacity
+        while capacity < size:
+            capacity *= 2
+        self._mmap.close()
+        self._file.truncate(capacity)
+        self._capacity = capacity
+        self._mmap = mmap.mmap(self._file.fileno(), capacity)
+
+    def _add(self, key: str) -> int:
+        '''
+        Добавление ключа в файл, значение записывается до обновления заголовка,
+        поэтому читатели видят только полностью записанные записи
+
+        Args:
+            key: ключ
+
+        Returns:
+            Смещение значения
+        '''
+
+        encoded = key.encode()
+        padded = len(encoded) + (-(KEY_LENGTH.size + len(encoded)) % 8)
+        entry_size = KEY_LENGTH.size + padded + VALUE.size
+        if self._used + entry_size > self._capacity:
+            self._grow(self._used + entry_size)
+        offset = self._used
+        KEY_LENGTH.pack_into(self._mmap, offset, len(encoded))
+        self._mmap[offset + KEY_LENGTH.size:offset + KEY_LENGTH.size + len(encoded)] = encoded
+        position = offset + KEY_LENGTH.size + padded
+        VALUE.pack_into(self._mmap, position, 0.0)
+        self._used += entry_size
+        HEADER.pack_into(self._mmap, 0, self._used)
+        self._positions[key] = position
+        return position
+
+    def inc(self, key: str, amount: float) -> None:
+        with self._lock:
+            position = self._positions.get(key)
+            if position is None:
+                position = self._add(key)
+            value = VALUE.unpack_from(self._mmap, position)[0]
+            VALUE.pack_into(self._mmap, position, value + amount)
+
+    def set(self, key: str, value: float) -> None:
+        with self._lock:
+            position = self._positions.get(key)
+            if position is None:
+                position = self._add(key)
+            VALUE.pack_into(self._mmap, position, value)
+
+    def close(self) -> None:
+        with self._lock:
+            self._mmap.close()
+            self._file.close()
+
+
+def read_entries(data, used: int | None = None):
+    '''
+    Чтение записей файла метрик
+
+    Args:
+        data: содержимое файла
+        used: размер заполненной части
+
+    Returns:
+        Генератор кортежей из ключа, значения и смещения значения
+    '''
+
+    if used is None:
+        used = HEADER.unpack_from(data, 0)[0]
+    offset = HEADER.size
+    while offset < used:
+        length = KEY_LENGTH.unpack_from(data, offset)[0]
+        start = offset + KEY_LENGTH.size
+        key = bytes(data[start:start + length]).decode()
+        position = start + length + (-(KEY_LENGTH.size + length) % 8)
+        yield key, VALUE.unpack_from(data, position)[0], position
+        offset = position + VALUE.size
+
+
+_values = None
+_values_key = None
+_values_lock = threading.Lock()
+
+
+def get_values() -> MmapValues:
+    '''
+    Получение файла метрик текущего процесса, после fork создается новый файл
+
+    Returns:
+        Объект MmapValues
+    '''
+
+    global _values, _values_key
+    key = (os.getpid(), get_metrics_dir())
+    if _values_key != key:
+        with _values_lock:
+            if _values_key != key:
+                pid, directory = key
+                os.makedirs(directory, exist_ok=True)
+                _values = MmapValues(os.path.join(directory, f'metrics_{pid}.db'))
+                _values_key = key
+    return _values
+
+
+def make_key(name: str, suffix: str, labels: dict) -> str:
+    return json.dumps([name, suffix, sorted(labels.items())])
+
+
+class Metric:
+    type = None
+
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        registry[name] = self
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        if not is_enabled():
+            return
+        get_values().inc(make_key(self.name, '_total', labels), amount)
+
+
+class Gauge(Metric):
+    '''
+    Текущее значение процесса, при запросе метрик суммируются значения
+    работающих процессов
+    '''
+
+    type = 'gauge'
+
+    def set(self, value: float, **labels) -> None:
+        if not is_enabled():
+            return
+        get_values().set(make_key(self.name, '', labels), value)
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, name: str, documentation: str, buckets: tuple):
+        super().__init__(name, documentation)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels) -> None:
+        '''
+        Учет значения, в файле хранятся некумулятивные счетчики корзин
+
+        Args:
+            value: значение
+            labels: метки
+
+        Returns:
+            None
+        '''
+
+        if not is_enabled():
+            return
+        values = get_values()
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            bucket = dict(labels, le=format_value(self.buckets[index]))
+            values.inc(make_key(self.name, '_bucket', bucket), 1)
+        values.inc(make_key(self.name, '_sum', labels), value)
+        values.inc(make_key(self.name, '_count', labels), 1)
+
+
+registry = {}
+
+request_duration = Histogram(
+    name='http_request_duration_seconds',
+    documentation='Время обработки запроса',
+    buckets=LATENCY_BUCKETS,
+)
+response_size = Histogram(
+    name='http_response_size_bytes',
+    documentation='Размер тела ответа',
+    buckets=SIZE_BUCKETS,
+)
+request_queries = Histogram(
+    name='http_request_db_queries',
+    documentation='Количество запросов к БД за запрос',
+    buckets=QUERY_BUCKETS,
+)
+requests_total = Counter(
+    name='http_requests',
+    documentation='Количество обработанных запросов',
+)
+cache_requests = Counter(
+    name='cache_requests',
+    documentation='Обращения к кэшам приложения',
+)
+db_pool_connections = Gauge(
+    name='db_pool_connections',
+    documentation='Соединения пула БД по состоянию',
+)
+db_pool_max_connections = Gauge(
+    name='db_pool_max_connections',
+    documentation='Максимальный размер пула БД',
+)
+db_pool_wait = Histogram(
+    name='db_pool_wait_seconds',
+    documentation='Время ожидания соединения из пула БД',
+    buckets=WAIT_BUCKETS,
+)
+db_pool_events = Counter(
+    name='db_pool_events',
+    documentation='Создание, повторное использование, закрытие соединений пула БД '
+                  'и таймауты ожидания',
+)
+
+
+def is_enabled() -> bool:
+    return getattr(settings, 'METRICS_ENABLED', False)
+
+
+def format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def format_labels(labels) -> str:
+    if not labels:
+        return ''
+    items = ','.join(
+        '{}="{}"'.format(
+            name,
+            str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'),
+        )
+        for name, value in labels
+    )
+    return f'{{{items}}}'
+
+
+def get_file_pid(path: str) -> int | None:
+    '''
+    Получение pid процесса по имени файла метрик
+
+    Args:
+        path: путь к файлу
+
+    Returns:
+        pid или None для файла архива
+    '''
+
+    name = os.path.basename(path)[len('metrics_'):-len('.db')]
+    return int(name) if name.isdigit() else None
+
+
+def is_process_alive(pid: int) -> bool:
+    '''
+    Проверка, что процесс с pid существует
+
+    Args:
+        pid: pid процесса
+
+    Returns:
+        Флаг
+    '''
+
+    if pid <= 0:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def is_gauge(key: str) -> bool:
+    metric = registry.get(json.loads(key)[0])
+    return metric is not None and metric.type == 'gauge'
+
+
+def archive_dead_processes(directory: str) -> None:
+    '''
+    Перенос счетчиков завершившихся процессов в файл архива и удаление их файлов,
+    чтобы директория не росла с перезапуском процессов сервиса. Значения Gauge
+    завершившихся процессов отбрасываются
+
+    Args:
+        directory: директория файлов метрик
+
+    Returns:
+        None
+    '''
+
+    dead = []
+    for path in glob.glob(os.path.join(directory, 'metrics_*.db')):
+        pid = get_file_pid(path)
+        if pid is not None and not is_process_alive(pid):
+            dead.append(path)
+    if not dead:
+        return
+    with open(os.path.join(directory, LOCK_NAME), 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        archive = MmapValues(os.path.join(directory, ARCHIVE_NAME))
+        try:
+            for path in dead:
+                try:
+                    with open(path, 'rb') as file:
+                        data = file.read()
+                except FileNotFoundError:
+                    continue
+                if len(data) >= HEADER.size:
+                    for key, value, _ in read_entries(data):
+                        if not is_gauge(key):
+                            archive.inc(key, value)
+                os.remove(path)
+        finally:
+            archive.close()
+
+
+def collect() -> dict:
+    '''
+    Суммирование значений метрик из файлов всех процессов и архива
+    завершившихся процессов
+
+    Returns:
+        Словарь значений по ключам
+    '''
+
+    directory = get_metrics_dir()
+    if os.path.isdir(directory):
+        archive_dead_processes(directory)
+    samples = {}
+    for path in glob.glob(os.path.join(directory, 'metrics_*.db')):
+        try:
+            with open(path, 'rb') as file:
+                data = file.read()
+        except FileNotFoundError:
+            continue
+        if len(data) < HEADER.size:
+            continue
+        for key, value, _ in read_entries(data):
+            samples[key] = samples.get(key, 0) + value
+    return samples
+
+
+def render_histogram(metric: Histogram, samples: dict) -> list:
+    series = {}
+    for (suffix, labels), value in samples.items():
+        labels = dict(labels)
+        le = labels.pop('le', None)
+        item = series.setdefault(tuple(sorted(labels.items())), {'buckets': {}})
+        if suffix == '_bucket':
+            item['buckets'][float(le)] = value
+        else:
+            item[suffix] = value
+
+    lines = []
+    for labels, item in sorted(series.items()):
+        cumulative = 0
+        for bucket in metric.buckets:
+            cumulative += item['buckets'].get(float(bucket), 0)
+            lines.append(
+                f'{metric.name}_bucket'
+                f'{format_labels(labels + (("le", format_value(bucket)),))} '
+                f'{format_value(cumulative)}'
+            )
+        count = item.get('_count', 0)
+        lines.append(
+            f'{metric.name}_bucket{format_labels(labels + (("le", "+Inf"),))} '
+            f'{format_value(count)}'
+        )
+        lines.append(f'{metric.name}_sum{format_labels(labels)} {format_value(item.get("_sum", 0))}')
+        lines.append(f'{metric.name}_count{format_labels(labels)} {format_value(count)}')
+    return lines
+
+
+def render(gauges: list | None = None) -> str:
+    '''
+    Формирование метрик в текстовом формате Prometheus
+
+    Args:
+        gauges: список кортежей из названия, описания и словаря значений по меткам,
+            значения которых вычисляются при запросе метрик
+
+    Returns:
+        Текст метрик
+    '''
+
+    by_metric = {}
+    for key, value in collect().items():
+        name, suffix, labels = json.loads(key)
+        by_metric.setdefault(name, {})[(suffix, tuple(map(tuple, labels)))] = value
+
+    lines = []
+    for name, metric in registry.items():
+        samples = by_metric.get(name)
+        if not samples:
+            continue
+        lines.append(f'# HELP {name} {metric.documentation}')
+        lines.append(f'# TYPE {name} {metric.type}')
+        if metric.type == 'histogram':
+            lines.extend(render_histogram(metric, samples))
+        else:
+            for (suffix, labels), value in sorted(samples.items()):
+                lines.append(f'{name}{suffix}{format_labels(labels)} {format_value(value)}')
+
+    for name, documentation, values in gauges or []:
+        lines.append(f'# HELP {name} {documentation}')
+        lines.append(f'# TYPE {name} gauge')
+        for labels, value in values.items():
+            lines.append(f'{name}{format_labels(labels)} {format_value(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+def observe_request(route: str | None, method: str, status: int, latency: float,
+                    size: int | None, db_queries: int) -> None:
+    '''
+    Учет обработанного запроса в метриках
+
+    Args:
+        route: название маршрута
+        method: метод запроса
+        status: статус ответа
+        latency: время обработки в секундах
+        size: размер тела ответа или None для потоковых ответов
+        db_queries: количество запросов к БД
+
+    Returns:
+        None
+    '''
+
+    if not is_enabled():
+        return
+    route = route or 'unknown'
+    requests_total.inc(route=route, method=method, status=str(status))
+    request_duration.observe(latency, route=route)
+    request_queries.observe(db_queries, route=route)
+    if size is not None:
+        response_size.observe(size, route=route)
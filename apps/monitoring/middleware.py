@@ -0,0 +1,368 @@
+import cProfile
+import logging
+import re
+import time
+import uuid
+from contextlib import (
+    ExitStack,
+    contextmanager,
+)
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from monitoring.metrics import observe_request
+from monitoring.nplusone import (
+    OFF,
+    RAISE,
+    NPlusOneError,
+    QueryShapeDetector,
+)
+from monitoring.profiling import (
+    check_profile_token,
+    save_profile,
+)
+from monitoring.timing import (
+    RequestTimings,
+    request_timings,
+)
+
+from utils.middleware import (
+    HybridMiddleware,
+    aget_connections,
+)
+from utils.logger import (
+    get_logger,
+    is_request_sampled,
+    lazy_message,
+    request_context,
+)
+
+
+logger = get_logger(__name__)
+
+REQUEST_ID_HEADER = 'X-Request-ID'
+REQUEST_ID_PATTERN = re.compile(r'^[\w\-]{1,64}$')
+SERVER_TIMING_HEADER = 'Server-Timing'
+PROFILE_HEADER = 'X-Profile'
+PROFILE_ID_HEADER = 'X-Profile-Id'
+PROFILE_QUERY_PARAM = 'profile'
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class RequestLogMiddleware(HybridMiddleware):
+    def get_request_id(self, request) -> str:
+        '''
+        Получение идентификатора запроса из заголовка или создание нового
+
+        Args:
+            request: запрос
+
+        Returns:
+            Идентификатор запроса
+        '''
+
+        request_id = request.headers.get(REQUEST_ID_HEADER, '')
+        if REQUEST_ID_PATTERN.match(request_id):
+            return request_id
+        return uuid.uuid4().hex
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        with self.observe(request, connections.all()) as result:
+            result['response'] = self.get_response(request)
+        return result['response']
+
+    async def __acall__(self, request):
+        with self.observe(request, await aget_connections(request)) as result:
+            result['response'] = await self.get_response(request)
+        return result['response']
+
+    @contextmanager
+    def observe(self, request, databases: list):
+        '''
+        Логирование запроса и учет в метриках, ответ записывается
+        в словарь под ключом response
+
+        Args:
+            request: запрос
+            databases: соединения, запросы которых учитываются
+
+        Returns:
+            Контекстный менеджер
+        '''
+
+        request_id = self.get_request_id(request)
+        request.request_id = request_id
+        context = {
+            'request_id': request_id,
+            'route': None,
+            'sampled': is_request_sampled(
+                request_id=request_id,
+                sample_rate=settings.LOG_SAMPLE_RATE,
+            ),
+        }
+        token = request_context.set(context)
+        counter = QueryCounter()
+        result = {}
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in databases:
+                    stack.enter_context(connection.execute_wrapper(counter))
+                yield result
+            response = result['response']
+            latency = time.perf_counter() - start
+
+            response[REQUEST_ID_HEADER] = request_id
+            log_data = {
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                'latency_ms': round(latency * 1000, 3),
+                'db_queries': counter.count,
+            }
+            timings = getattr(request, 'timings', None)
+            if timings is not None:
+                log_data['timings'] = timings.as_dict()
+            observe_request(
+                route=context['route'],
+                method=request.method,
+                status=response.status_code,
+                latency=latency,
+                size=None if response.streaming else len(response.content),
+                db_queries=counter.count,
+            )
+            level = logging.ERROR if response.status_code >= 500 else logging.INFO
+            logger.log(
+                level,
+                msg=lazy_message(
+                    logger,
+                    level,
+                    'Запрос {method} {path} обработан со статусом {status} '
+                    'за {latency_ms} мс, запросов к БД: {db_queries}',
+                    **log_data,
+                ),
+                extra={
+                    'request_id': request_id,
+                    'route': context['route'],
+                    **log_data,
+                },
+            )
+        finally:
+            request_context.reset(token)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        context = request_context.get()
+        if context is not None and request.resolver_match is not None:
+            context['route'] = request.resolver_match.url_name
+        return None
+
+
+class ServerTimingMiddleware(HybridMiddleware):
+    def __init__(self, get_response):
+        if not getattr(settings, 'SERVER_TIMING_ENABLED', False):
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        with self.measure(request, connections.all()) as result:
+            result['response'] = self.get_response(request)
+        return result['response']
+
+    async def __acall__(self, request):
+        with self.measure(request, await aget_connections(request)) as result:
+            result['response'] = await self.get_response(request)
+        return result['response']
+
+    @contextmanager
+    def measure(self, request, databases: list):
+        timings = RequestTimings()
+        request.timings = timings
+        token = request_timings.set(timings)
+        result = {}
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in databases:
+                    stack.enter_context(connection.execute_wrapper(timings))
+                yield result
+        finally:
+            request_timings.reset(token)
+        result['response'][SERVER_TIMING_HEADER] = timings.as_header(
+            total=time.perf_counter() - start,
+        )
+
+    def process_template_response(self, request, response):
+        timings = getattr(request, 'timings', None)
+        if timings is None:
+            return response
+        start = time.perf_counter()
+
+        def add_render_time(rendered):
+            timings.get_stage('render')['duration'] += time.perf_counter() - start
+            return None
+
+        response.add_post_render_callback(add_render_time)
+        return response
+
+
+class ProfilingMiddleware(HybridMiddleware):
+    '''
+    Профилирование отдельных запросов через cProfile. Под ASGI профилировщик
+    работает в потоке цикла событий: в профиль попадают корутины других запросов,
+    выполненные во время ожидания, но не код в потоках sync_to_async, поэтому
+    одновременно профилируется только один асинхронный запрос
+    '''
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'PROFILING_ENABLED', False):
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+        self.async_profiling = False
+
+    def should_profile(self, request) -> bool:
+        '''
+        Проверка запроса на профилирование: подписанный заголовок
+        или параметр запроса от сотрудника
+
+        Args:
+            request: запрос
+
+        Returns:
+            Флаг профилирования
+        '''
+
+        token = request.headers.get(PROFILE_HEADER)
+        if token:
+            return check_profile_token(token)
+        if PROFILE_QUERY_PARAM in request.GET:
+            user = getattr(request, 'user', None)
+            return user is not None and user.is_staff
+        return False
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not self.should_profile(request):
+            return self.get_response(request)
+
+        with self.profile(request) as result:
+            if result is None:
+                return self.get_response(request)
+            result['response'] = self.get_response(request)
+        return result['response']
+
+    async def __acall__(self, request):
+        if PROFILE_HEADER not in request.headers and PROFILE_QUERY_PARAM not in request.GET:
+            return await self.get_response(request)
+        # проверка сотрудника загружает пользователя из базы
+        if not await sync_to_async(self.should_profile)(request):
+            return await self.get_response(request)
+        if self.async_profiling:
+            logger.warning(
+                msg='Профилирование запроса пропущено, профилировщик уже запущен',
+            )
+            return await self.get_response(request)
+
+        self.async_profiling = True
+        try:
+            with self.profile(request) as result:
+                if result is None:
+                    return await self.get_response(request)
+                result['response'] = await self.get_response(request)
+        finally:
+            self.async_profiling = False
+        return result['response']
+
+    @contextmanager
+    def profile(self, request):
+        '''
+        Профилирование запроса и сохранение профиля, ответ записывается
+        в словарь под ключом response. Если профилировщик уже запущен,
+        вместо словаря возвращается None
+
+        Args:
+            request: запрос
+
+        Returns:
+            Контекстный менеджер
+        '''
+
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            logger.warning(
+                msg='Профилирование запроса пропущено, профилировщик уже запущен',
+            )
+            yield None
+            return
+
+        result = {}
+        start = time.perf_counter()
+        try:
+            yield result
+        finally:
+            profiler.disable()
+        latency = time.perf_counter() - start
+
+        route = None
+        if request.resolver_match is not None:
+            route = request.resolver_match.url_name
+        name = save_profile(
+            profiler=profiler,
+            route=route,
+            latency=latency,
+        )
+        result['response'][PROFILE_ID_HEADER] = name
+        logger.info(
+            msg=f'Профиль запроса {request.method} {request.path} сохранен в {name}',
+        )
+
+
+class NPlusOneMiddleware(HybridMiddleware):
+    def __init__(self, get_response):
+        self.mode = getattr(settings, 'NPLUSONE_MODE', OFF)
+        if self.mode == OFF:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        detector = QueryShapeDetector()
+        with detector.install():
+            response = self.get_response(request)
+        return self.check(request, response, detector)
+
+    async def __acall__(self, request):
+        detector = QueryShapeDetector()
+        with detector.install(await aget_connections(request)):
+            response = await self.get_response(request)
+        return self.check(request, response, detector)
+
+    def check(self, request, response, detector: QueryShapeDetector):
+        report = detector.get_report()
+        detector.clear()
+        if report is None:
+            return response
+        if self.mode == RAISE:
+            raise NPlusOneError(f'Обнаружены N+1 запросы в {request.method} {request.path}\n{report}')
+        logger.warning(
+            msg=f'Обнаружены N+1 запросы в {request.method} {request.path}\n{report}',
+        )
+        return response
@@ -0,0 +1,179 @@
+import os
+import re
+import sys
+import traceback
+from contextlib import (
+    ExitStack,
+    contextmanager,
+)
+
+from django.conf import settings
+from django.db import connections
+
+
+OFF = 'off'
+WARN = 'warn'
+RAISE = 'raise'
+
+SQL_STRING_PATTERN = re.compile(r"'(?:[^']|'')*'")
+SQL_NUMBER_PATTERN = re.compile(r'\b\d+(?:\.\d+)?\b')
+SQL_IN_PATTERN = re.compile(r'\bIN\s*\((?:\s*(?:%s|\?|\$\d+)\s*,?)+\)', re.IGNORECASE)
+SQL_SPACE_PATTERN = re.compile(r'\s+')
+
+MONITORING_DIR = os.path.normcase(os.path.dirname(os.path.abspath(__file__))) + os.sep
+
+
+class NPlusOneError(Exception):
+    pass
+
+
+def normalize_sql(sql: str) -> str:
+    '''
+    Приведение SQL к форме без значений для группировки одинаковых запросов
+
+    Args:
+        sql: текст запроса
+
+    Returns:
+        Форма запроса
+    '''
+
+    sql = SQL_STRING_PATTERN.sub('?', sql)
+    sql = SQL_IN_PATTERN.sub('IN (...)', sql)
+    sql = SQL_NUMBER_PATTERN.sub('?', sql)
+    return SQL_SPACE_PATTERN.sub(' ', sql).strip()
+
+
+def is_project_file(filename: str, project_dirs: tuple) -> bool:
+    filename = os.path.normcase(os.path.abspath(filename))
+    return (
+        filename.startswith(project_dirs)
+        and f'{os.sep}tests{os.sep}' not in filename
+        and 'site-packages' not in filename
+        and not filename.startswith(MONITORING_DIR)
+    )
+
+
+class QueryShapeDetector:
+    def __init__(self, threshold: int | None = None):
+        if threshold is None:
+            threshold = getattr(settings, 'NPLUSONE_THRESHOLD', 5)
+        self.threshold = threshold
+        self.project_dirs = tuple(
+            os.path.normcase(os.path.join(settings.BASE_DIR, name)) + os.sep
+            for name in ('apps', 'utils')
+        )
+        self.shapes = {}
+        self._entry_frames = []
+
+    def get_project_frames(self) -> list:
+        '''
+        Получение кадров стека из файлов проекта, от внешнего к внутреннему
+
+        Returns:
+            Список кадров
+        '''
+
+        frames = []
+        frame = sys._getframe(2)
+        while frame is not None:
+            if is_project_file(frame.f_code.co_filename, self.project_dirs):
+                frames.append(frame)
+            frame = frame.f_back
+        frames.reverse()
+        return frames
+
+    def __call__(self, execute, sql, params, many, context):
+        if sql.lstrip()[:6].upper() == 'SELECT':
+            self.add(sql)
+        return execute(sql, params, many, context)
+
+    def add(self, sql: str) -> None:
+        '''
+        Учет запроса, запросы группируются по форме внутри одного вызова
+        внешней функции проекта, чтобы повторные вызовы сервиса не считались N+1
+
+        Args:
+            sql: текст запроса
+
+        Returns:
+            None
+        '''
+
+        frames = self.get_project_frames()
+        entry = frames[0] if frames else None
+        if entry is not None:
+            # кадр сохраняется, чтобы его id не был переиспользован до конца проверки
+            self._entry_frames.append(entry)
+        key = (normalize_sql(sql), id(entry))
+        shape = self.shapes.get(key)
+        if shape is None:
+            self.shapes[key] = {
+                'sql': sql,
+                'count': 1,
+                'stack': ''.join(traceback.format_list([
+                    (frame.f_code.co_filename, frame.f_lineno, frame.f_code.co_name, None)
+                    for frame in frames
+                ])),
+            }
+        else:
+            shape['count'] += 1
+
+    def get_repeated(self) -> list:
+        '''
+        Получение форм запросов, повторенных больше порога
+
+        Returns:
+            Список словарей с запросом, количеством и стеком первого выполнения
+        '''
+
+        return [
+            shape for shape in self.shapes.values()
+            if shape['count'] > self.threshold
+        ]
+
+    def get_report(self) -> str | None:
+        '''
+        Формирование отчета о повторяющихся запросах
+
+        Returns:
+            Текст отчета или None
+        '''
+
+        repeated = self.get_repeated()
+        if not repeated:
+            return None
+        lines = []
+        for shape in repeated:
+            lines.append(f'Запрос выполнен {shape["count"]} раз: {shape["sql"]}')
+            lines.append(f'Первое выполнение:\n{shape["stack"]}')
+        return '\n'.join(lines)
+
+    def clear(self) -> None:
+        self.shapes.clear()
+        self._entry_frames.clear()
+
+    @contextmanager
+    def install(self, databases: list | None = None):
+        with ExitStack() as stack:
+            for connection in connections.all() if databases is None else databases:
+                stack.enter_context(connection.execute_wrapper(self))
+            yield self
+
+
+class NPlusOneTestMixin:
+    nplusone_threshold = 1
+
+    def setUp(self):
+        super().setUp()
+        detector = QueryShapeDetector(threshold=self.nplusone_threshold)
+        stack = ExitStack()
+        stack.enter_context(detector.install())
+        self.addCleanup(self.check_nplusone, detector, stack)
+
+    def check_nplusone(self, detector: QueryShapeDetector, stack: ExitStack) -> None:
+        stack.close()
+        report = detector.get_report()
+        detector.clear()
+        if report is not None:
+            raise self.failureException(f'Обнаружены N+1 запросы\n{report}')
@@ -0,0 +1,120 @@
+import os
+import re
+import tempfile
+import time
+
+from django.conf import settings
+from django.core import signing
+
+
+PROFILE_SALT = 'monitoring.profiling'
+PROFILE_NAME_PATTERN = re.compile(
+    r'^(?P<created>\d+)_(?P<route>[\w\-]+)_(?P<latency>\d+)ms\.prof$'
+)
+
+
+def get_profile_dir() -> str:
+    '''
+    Получение директории файлов профилирования
+
+    Returns:
+        Путь к директории
+    '''
+
+    return getattr(settings, 'PROFILE_DIR', None) or os.path.join(
+        tempfile.gettempdir(),
+        'drf_posts_profiles',
+    )
+
+
+def make_profile_token() -> str:
+    '''
+    Создание подписанного значения заголовка для профилирования запроса
+
+    Returns:
+        Значение заголовка
+    '''
+
+    return signing.dumps(
+        obj='profile',
+        salt=PROFILE_SALT,
+    )
+
+
+def check_profile_token(token: str) -> bool:
+    '''
+    Проверка подписи и срока действия значения заголовка профилирования
+
+    Args:
+        token: значение заголовка
+
+    Returns:
+        Флаг корректности
+    '''
+
+    try:
+        signing.loads(
+            token,
+            salt=PROFILE_SALT,
+            max_age=getattr(settings, 'PROFILE_TOKEN_MAX_AGE', 60 * 60),
+        )
+    except signing.BadSignature:
+        return False
+    return True
+
+
+def save_profile(profiler, route: str | None, latency: float) -> str:
+    '''
+    Сохранение результата профилирования с удалением самых старых файлов
+    сверх PROFILE_MAX_FILES
+
+    Args:
+        profiler: объект cProfile.Profile
+        route: название маршрута
+        latency: время обработки запроса в секундах
+
+    Returns:
+        Название файла
+    '''
+
+    directory = get_profile_dir()
+    os.makedirs(directory, exist_ok=True)
+    route = re.sub(r'[^\w\-]', '-', route or 'unknown')
+    name = f'{time.time_ns()}_{route}_{int(latency * 1000)}ms.prof'
+    profiler.dump_stats(os.path.join(directory, name))
+
+    max_files = getattr(settings, 'PROFILE_MAX_FILES', 50)
+    profiles = get_profiles()
+    for profile in profiles[max_files:]:
+        try:
+            os.remove(profile['path'])
+        except FileNotFoundError:
+            pass
+    return name
+
+
+def get_profiles() -> list:
+    '''
+    Получение списка сохраненных профилей, от новых к старым
+
+    Returns:
+        Список словарей с данными профилей
+    '''
+
+    directory = get_profile_dir()
+    if not os.path.isdir(directory):
+        return []
+    profiles = []
+    for name in os.listdir(directory):
+        match = PROFILE_NAME_PATTERN.match(name)
+        if match is None:
+            continue
+        profiles.append({
+            'name': name,
+            'path': os.path.join(directory, name),
+            'created': int(match['created']) / 1e9,
+            'route': match['route'],
+            'latency_ms': int(match['latency']),
+        })
+    profiles.sort(key=lambda profile: profile['name'], reverse=True)
+    return profiles
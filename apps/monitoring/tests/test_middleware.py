@@ -0,0 +1,441 @@
+import io
+import json
+import logging
+import os
+import sys
+import tempfile
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.handlers.asgi import ASGIHandler
+from django.core.management import call_command
+from django.test import (
+    TestCase,
+    override_settings,
+)
+from django.urls import reverse
+
+from unittest.mock import patch
+
+from monitoring.metrics import (
+    ARCHIVE_NAME,
+    LOCK_NAME,
+    MmapValues,
+    collect,
+    db_pool_max_connections,
+    make_key,
+    requests_total,
+)
+from monitoring.nplusone import (
+    QueryShapeDetector,
+    normalize_sql,
+)
+from monitoring.profiling import (
+    get_profiles,
+    make_profile_token,
+)
+from monitoring.timing import (
+    RequestTimings,
+    request_timings,
+    timed,
+)
+from notifications.models import EmailOutbox
+from posts_api.models import Post
+from utils.logger import (
+    AsyncQueueHandler,
+    ColorFormatter,
+    JSONFormatter,
+    RequestContextFilter,
+    is_request_sampled,
+    lazy_message,
+    request_context,
+)
+
+
+User = get_user_model()
+
+
+class RequestLogMiddlewareTest(TestCase):
+    def test_request_id(self):
+        with self.assertLogs('monitoring.middleware', level='INFO') as logs:
+            response = self.client.get(
+                reverse('posts'),
+                HTTP_X_REQUEST_ID='test-request-id',
+            )
+
+        self.assertEqual(response['X-Request-ID'], 'test-request-id')
+        record = logs.records[-1]
+        self.assertEqual(record.status, 200)
+        self.assertEqual(record.db_queries, 1)
+        self.assertEqual(record.request_id, 'test-request-id')
+        self.assertEqual(record.route, 'posts')
+
+        data = json.loads(JSONFormatter().format(record))
+        self.assertEqual(data['request_id'], 'test-request-id')
+        self.assertEqual(data['status'], 200)
+        self.assertIn('latency_ms', data)
+
+    def test_generated_request_id(self):
+        response = self.client.get(
+            reverse('posts'),
+            HTTP_X_REQUEST_ID='invalid id!',
+        )
+
+        self.assertEqual(len(response['X-Request-ID']), 32)
+
+
+@override_settings(SERVER_TIMING_ENABLED=True)
+class ServerTimingMiddlewareTest(TestCase):
+    fixtures = ['users.json', 'posts.json']
+
+    def test_server_timing(self):
+        with self.assertLogs('monitoring.middleware', level='INFO') as logs:
+            response = self.client.get(reverse('posts'))
+
+        header = response['Server-Timing']
+        for metric in ('total;dur=', 'db;dur=', 'auth;dur=', 'posts_api.get_posts;dur=',
+                       'serialize;dur=', 'serialize.db;dur=', 'render;dur='):
+            self.assertIn(metric, header)
+
+        timings = logs.records[-1].timings
+        self.assertGreater(timings['posts_api.get_posts']['db_queries'], 0)
+        self.assertEqual(
+            timings['posts_api.get_posts']['db_queries'],
+            timings['serialize']['db_queries'],
+        )
+        self.assertIn('render', timings)
+
+    async def test_server_timing_async(self):
+        # под ASGI middleware асинхронные, а запросы к БД выполняются в потоке
+        with self.assertLogs('monitoring.middleware', level='INFO') as logs:
+            response = await self.async_client.get(reverse('posts'))
+
+        self.assertIn('posts_api.get_posts;dur=', response['Server-Timing'])
+        self.assertIn('X-Request-ID', response)
+        self.assertGreater(logs.records[-1].db_queries, 0)
+        self.assertGreater(logs.records[-1].timings['posts_api.get_posts']['db_queries'], 0)
+
+    @override_settings(SERVER_TIMING_ENABLED=False)
+    def test_disabled(self):
+        response = self.client.get(reverse('posts'))
+
+        self.assertNotIn('Server-Timing', response)
+
+    def test_timed(self):
+        @timed('stage')
+        def func():
+            return 1
+
+        self.assertEqual(func(), 1)
+
+        timings = RequestTimings()
+        token = request_timings.set(timings)
+        try:
+            func()
+            func()
+        finally:
+            request_timings.reset(token)
+
+        self.assertIn('stage', timings.as_dict())
+
+    async def test_timed_async(self):
+        @timed('stage')
+        async def func():
+            return 1
+
+        timings = RequestTimings()
+        token = request_timings.set(timings)
+        try:
+            self.assertEqual(await func(), 1)
+        finally:
+            request_timings.reset(token)
+
+        self.assertIn('stage', timings.as_dict())
+
+
+class SamplingTest(TestCase):
+    def test_is_request_sampled(self):
+        request_ids = [f'request-{index}' for index in range(10000)]
+        sampled = [
+            request_id for request_id in request_ids
+            if is_request_sampled(request_id=request_id, sample_rate=0.01)
+        ]
+
+        self.assertTrue(50 < len(sampled) < 150)
+        self.assertEqual(
+            sampled,
+            [
+                request_id for request_id in request_ids
+                if is_request_sampled(request_id=request_id, sample_rate=0.01)
+            ],
+        )
+
+    def test_request_context_filter(self):
+        log_filter = RequestContextFilter()
+        token = request_context.set({
+            'request_id': 'test-request-id',
+            'route': 'posts',
+            'sampled': False,
+        })
+        try:
+            info = logging.LogRecord('posts_api', logging.INFO, '', 0, 'info', (), None)
+            warning = logging.LogRecord('posts_api', logging.WARNING, '', 0, 'warning', (), None)
+
+            self.assertFalse(log_filter.filter(info))
+            self.assertTrue(log_filter.filter(warning))
+            self.assertEqual(warning.request_id, 'test-request-id')
+        finally:
+            request_context.reset(token)
+
+        self.assertTrue(log_filter.filter(info))
+
+
+class LazyMessageTest(TestCase):
+    def test_lazy_message(self):
+        logger = logging.getLogger('posts_api.test')
+        logger.setLevel(logging.INFO)
+        self.addCleanup(logger.setLevel, logging.NOTSET)
+        data = {'slug': 'first'}
+
+        message = lazy_message(logger, logging.INFO, 'Пост {data}', data=data)
+        data['slug'] = 'changed'
+
+        self.assertEqual(str(message), "Пост {'slug': 'first'}")
+
+    def test_disabled_level(self):
+        logger = logging.getLogger('posts_api.test')
+        logger.setLevel(logging.INFO)
+        self.addCleanup(logger.setLevel, logging.NOTSET)
+
+        with patch('utils.logger.summarize') as mock_summarize:
+            message = lazy_message(logger, logging.DEBUG, 'Пост {data}', data={})
+
+        mock_summarize.assert_not_called()
+        self.assertEqual(message, 'Пост {data}')
+
+
+class AsyncQueueHandlerTest(TestCase):
+    def test_prepare(self):
+        stream = io.StringIO()
+        handler = AsyncQueueHandler(stream=stream)
+        handler.setFormatter(ColorFormatter('%(funcName)s: %(message)s'))
+        data = {'slug': 'first'}
+        try:
+            raise ValueError('test')
+        except ValueError:
+            record = logging.LogRecord(
+                'posts_api', logging.ERROR, __file__, 0, 'Пост %s', (data,), sys.exc_info(),
+            )
+
+        prepared = handler.prepare(record)
+        handler.handle(record)
+        data['slug'] = 'changed'
+        handler.close()
+
+        self.assertIsNone(prepared.args)
+        self.assertIsNone(prepared.exc_info)
+        self.assertIsNotNone(record.exc_info)
+        self.assertIn("Пост {'slug': 'first'}", stream.getvalue())
+        self.assertIn('ValueError: test', stream.getvalue())
+
+
+class MetricsTest(TestCase):
+    fixtures = ['users.json', 'posts.json']
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_override = override_settings(
+            METRICS_ENABLED=True,
+            METRICS_DIR=directory.name,
+            METRICS_TOKEN='secret',
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_metrics(self):
+        for _ in range(3):
+            self.client.get(reverse('posts'))
+        EmailOutbox.objects.create(
+            email_type='confirm_email',
+            recipient='test@cc.com',
+            subject='subject',
+            message='message',
+        )
+
+        response = self.client.get(
+            reverse('metrics'),
+            headers={'Authorization': 'Bearer secret'},
+        )
+        content = response.content.decode()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('http_request_duration_seconds_count{route="posts"} 3', content)
+        self.assertIn('http_request_duration_seconds_bucket{route="posts",le="+Inf"} 3', content)
+        self.assertIn('http_requests_total{method="GET",route="posts",status="200"} 3', content)
+        self.assertIn('http_response_size_bytes_count{route="posts"} 3', content)
+        self.assertIn('email_outbox_messages{status="pending"} 1', content)
+
+    def test_aggregation(self):
+        # файл другого работающего процесса
+        values = MmapValues(os.path.join(settings.METRICS_DIR, f'metrics_{os.getppid()}.db'))
+        key = make_key('http_requests', '_total', {'route': 'posts'})
+        for _ in range(5000):
+            values.inc(f'{key}{_}', 1)
+        values.inc(key, 2)
+        values.close()
+        requests_total.inc(route='posts')
+
+        self.assertEqual(collect()[key], 3)
+
+    def test_dead_processes(self):
+        key = make_key('http_requests', '_total', {'route': 'posts'})
+        for pid in (999999998, 999999999):
+            values = MmapValues(os.path.join(settings.METRICS_DIR, f'metrics_{pid}.db'))
+            values.inc(key, 2)
+            values.close()
+        requests_total.inc(route='posts')
+
+        self.assertEqual(collect()[key], 5)
+        self.assertEqual(
+            sorted(os.listdir(settings.METRICS_DIR)),
+            sorted([ARCHIVE_NAME, LOCK_NAME, f'metrics_{os.getpid()}.db']),
+        )
+        self.assertEqual(collect()[key], 5)
+
+    def test_dead_process_gauges(self):
+        key = make_key('db_pool_max_connections', '', {'database': 'default'})
+        for pid in (os.getppid(), 999999999):
+            values = MmapValues(os.path.join(settings.METRICS_DIR, f'metrics_{pid}.db'))
+            values.set(key, 10)
+            values.close()
+
+        self.assertEqual(collect()[key], 10)
+        db_pool_max_connections.set(10, database='default')
+        self.assertEqual(collect()[key], 20)
+
+    def test_token(self):
+        fixtures = (
+            (403, {}),
+            (403, {'Authorization': 'Bearer invalid'}),
+            (200, {'Authorization': 'Bearer secret'}),
+        )
+
+        with override_settings(METRICS_TOKEN='secret'):
+            for code, headers in fixtures:
+                response = self.client.get(reverse('metrics'), headers=headers)
+
+                self.assertEqual(response.status_code, code, msg=headers)
+
+    @override_settings(METRICS_TOKEN='')
+    def test_staff(self):
+        user = User.objects.create_user(
+            email='staff@cc.com',
+            password='test123',
+        )
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 403)
+
+        self.client.force_login(user)
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 403)
+
+        user.is_staff = True
+        user.save()
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(METRICS_ENABLED=False)
+    def test_disabled(self):
+        response = self.client.get(reverse('metrics'))
+
+        self.assertEqual(response.status_code, 404)
+
+
+class ProfilingMiddlewareTest(TestCase):
+    fixtures = ['users.json', 'posts.json']
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_override = override_settings(
+            PROFILING_ENABLED=True,
+            PROFILE_DIR=directory.name,
+            PROFILE_MAX_FILES=2,
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_profiling(self):
+        response = self.client.get(reverse('posts'))
+        self.assertNotIn('X-Profile-Id', response)
+
+        response = self.client.get(reverse('posts'), HTTP_X_PROFILE='invalid')
+        self.assertNotIn('X-Profile-Id', response)
+
+        token = make_profile_token()
+        for _ in range(3):
+            response = self.client.get(reverse('posts'), HTTP_X_PROFILE=token)
+
+        name = response['X-Profile-Id']
+        profiles = get_profiles()
+        self.assertEqual(len(profiles), 2)
+        self.assertEqual(profiles[0]['name'], name)
+        self.assertEqual(profiles[0]['route'], 'posts')
+
+        out = io.StringIO()
+        call_command('profiles', name, stdout=out)
+        self.assertIn('get_posts', out.getvalue())
+
+    async def test_profiling_async(self):
+        response = await self.async_client.get(reverse('posts'))
+        self.assertNotIn('X-Profile-Id', response)
+
+        response = await self.async_client.get(
+            reverse('posts'),
+            headers={'X-Profile': make_profile_token()},
+        )
+
+        self.assertIn('X-Profile-Id', response)
+        self.assertEqual(get_profiles()[0]['name'], response['X-Profile-Id'])
+
+    @override_settings(DEBUG=True)
+    def test_asgi_stack(self):
+        # с DEBUG Django логирует каждый синхронный обработчик, обернутый в поток
+        with patch('django.core.handlers.base.logger') as mock_logger:
+            handler = ASGIHandler()
+
+        adapted = [
+            call.args
+            for call in mock_logger.debug.call_args_list
+            if 'adapted' in call.args[0]
+        ]
+        self.assertEqual(adapted, [])
+        self.assertTrue(iscoroutinefunction(handler._middleware_chain))
+
+
+class NPlusOneTest(TestCase):
+    fixtures = ['users.json', 'posts.json']
+
+    def test_normalize_sql(self):
+        self.assertEqual(
+            normalize_sql("SELECT * FROM posts WHERE id IN (%s, %s, %s) AND title = 'a''b' LIMIT 21"),
+            normalize_sql('SELECT *  FROM posts WHERE id IN (%s) AND title = \'c\' LIMIT 1'),
+        )
+
+    def test_detector(self):
+        detector = QueryShapeDetector(threshold=1)
+        with detector.install():
+            for post in Post.objects.all():
+                post.author.email
+
+        repeated = detector.get_repeated()
+        self.assertEqual(len(repeated), 1)
+        self.assertEqual(repeated[0]['count'], 2)
+
+    @override_settings(NPLUSONE_MODE='raise', NPLUSONE_THRESHOLD=1)
+    def test_middleware(self):
+        response = self.client.get(reverse('posts'))
+
+        self.assertEqual(response.status_code, 200)
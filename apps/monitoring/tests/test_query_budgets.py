@@ -0,0 +1,285 @@
+import io
+import json
+import os
+import re
+from unittest import skipUnless
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from notifications.models import (
+    EmailConfiguration,
+    EmailOutbox,
+)
+from notifications.registry import email_registry
+from notifications.services import (
+    Email,
+    deliver_outbox,
+)
+from posts_api import services as posts_services
+from posts_api.models import Post
+from users_api import services as users_services
+from users_api.authentication import CustomTokenAuthentication
+from users_api.models import (
+    CustomToken,
+    CustomUser,
+)
+
+
+PERF_TESTS = os.environ.get('PERF_TESTS') == 'True'
+PERF_DATASET_SIZE = int(os.environ.get('PERF_DATASET_SIZE', 100000))
+
+TRANSACTION_STATEMENTS = (
+    'SAVEPOINT',
+    'RELEASE SAVEPOINT',
+    'ROLLBACK TO SAVEPOINT',
+)
+SQLITE_FULL_SCAN_PATTERN = re.compile(r'^SCAN (?P<table>\w+)$')
+
+
+def get_full_scans(sql: str) -> set:
+    '''
+    Получение таблиц, которые читаются полностью по плану запроса
+
+    Args:
+        sql: текст запроса с подставленными параметрами
+
+    Returns:
+        Множество названий таблиц
+    '''
+
+    tables = set()
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}')
+            plan = cursor.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            nodes = [plan[0]['Plan']]
+            while nodes:
+                node = nodes.pop()
+                if node['Node Type'] == 'Seq Scan':
+                    tables.add(node['Relation Name'])
+                nodes.extend(node.get('Plans', []))
+        else:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            for row in cursor.fetchall():
+                match = SQLITE_FULL_SCAN_PATTERN.match(row[-1])
+                if match is not None:
+                    tables.add(match['table'])
+    return tables
+
+
+@skipUnless(PERF_TESTS, 'Запуск с PERF_TESTS=True, размер данных PERF_DATASET_SIZE')
+class QueryBudgetTest(TestCase):
+    fixtures = ['email_template.json']
+    checked_tables = {
+        Post._meta.db_table,
+        CustomUser._meta.db_table,
+        CustomToken._meta.db_table,
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command(
+            'seed_data',
+            users=max(PERF_DATASET_SIZE // 50, 2),
+            posts=PERF_DATASET_SIZE,
+            workers=1,
+            seed=1,
+            stdout=io.StringIO(),
+        )
+        cls.user = CustomUser.objects.create_user(
+            email='test@cc.com',
+            password='test123',
+        )
+        cls.token = CustomToken.objects.create(user=cls.user)
+        cls.post = Post.objects.filter(hidden=False).select_related('author').first()
+        cls.author = cls.post.author
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+    def setUp(self):
+        request = self.client.post('/').wsgi_request
+        self.get_url_func = request.build_absolute_uri
+
+    def assertQueryBudget(self, budget: int, func, check_plans: bool = True, **kwargs):
+        '''
+        Проверка количества запросов функции и отсутствия полного чтения
+        таблиц постов, пользователей и токенов в планах ее SELECT запросов
+
+        Args:
+            budget: максимальное количество запросов
+            func: функция
+            check_plans: проверять планы запросов
+            kwargs: аргументы функции
+
+        Returns:
+            Результат функции
+        '''
+
+        with CaptureQueriesContext(connection) as context:
+            result = func(**kwargs)
+        # точки сохранения транзакций зависят от окружения тестов и не учитываются
+        queries = [
+            query['sql'] for query in context.captured_queries
+            if not query['sql'].startswith(TRANSACTION_STATEMENTS)
+        ]
+        self.assertLessEqual(
+            len(queries),
+            budget,
+            msg=f'{func.__name__}: превышен бюджет запросов\n' + '\n'.join(queries),
+        )
+        if check_plans:
+            for sql in queries:
+                if not sql.startswith('SELECT'):
+                    continue
+                full_scans = get_full_scans(sql) & self.checked_tables
+                self.assertFalse(
+                    full_scans,
+                    msg=f'{func.__name__}: полное чтение {full_scans} в запросе {sql}',
+                )
+        return result
+
+    def test_posts_services(self):
+        # лента отдает все видимые посты, полное чтение таблицы ожидаемо
+        status_code, _ = self.assertQueryBudget(1, posts_services.get_posts, check_plans=False)
+        self.assertEqual(status_code, 200)
+
+        status_code, _ = self.assertQueryBudget(
+            1,
+            posts_services.get_posts,
+            check_plans=False,
+            fields='title,slug',
+        )
+        self.assertEqual(status_code, 200)
+
+        slug = self.post.slug
+        status_code, _ = self.assertQueryBudget(1, posts_services.detail, slug=slug, user=self.user)
+        self.assertEqual(status_code, 200)
+
+        status_code, _ = self.assertQueryBudget(
+            2,
+            posts_services.get_posts_by_pk,
+            pk=self.author.pk,
+            user=self.user,
+        )
+        self.assertEqual(status_code, 200)
+
+        status_code, _ = self.assertQueryBudget(
+            2,
+            posts_services.add,
+            user=self.user,
+            data={'title': 'Пост', 'description': 'Описание'},
+        )
+        self.assertEqual(status_code, 200)
+
+        slug = Post.objects.filter(author=self.user).values_list('slug', flat=True).first()
+        status_code, _ = self.assertQueryBudget(
+            2,
+            posts_services.update,
+            slug=slug,
+            user=self.user,
+            data={'title': 'Новый пост', 'description': 'Описание'},
+        )
+        self.assertEqual(status_code, 200)
+
+        status_code, _ = self.assertQueryBudget(2, posts_services.remove, slug=slug, user=self.user)
+        self.assertEqual(status_code, 200)
+
+    @patch('users_api.services.send_email_by_type')
+    def test_users_services(self, mock_send_email_by_type):
+        mock_send_email_by_type.return_value = 200
+
+        status_code, _ = self.assertQueryBudget(
+            2,
+            users_services.register,
+            data={
+                'email': 'new@cc.com',
+                'password': 'test123',
+                'confirm_password': 'test123',
+            },
+            get_url_func=self.get_url_func,
+        )
+        self.assertEqual(status_code, 200)
+
+        status_code, _ = self.assertQueryBudget(
+            3,
+            users_services.auth,
+            data={'email': 'test@cc.com', 'password': 'test123'},
+        )
+        self.assertEqual(status_code, 200)
+
+        status_code, _ = self.assertQueryBudget(0, users_services.detail, user=self.user)
+        self.assertEqual(status_code, 200)
+
+        # чтение прежнего аватара в CustomUser.save и сохранение
+        status_code, _ = self.assertQueryBudget(
+            2,
+            users_services.update,
+            user=self.user,
+            data={'password': 'test123', 'new_password': 'test123'},
+        )
+        self.assertEqual(status_code, 200)
+
+        status_code, _ = self.assertQueryBudget(
+            1,
+            users_services.password_restore_request,
+            data={'email': 'test@cc.com'},
+            get_url_func=self.get_url_func,
+        )
+        self.assertEqual(status_code, 200)
+
+        url_hash = users_services.make_email_token(
+            user=self.user,
+            email_type=users_services.CONFIRM_EMAIL,
+        )
+        status_code, _ = self.assertQueryBudget(3, users_services.confirm_email, url_hash=url_hash)
+        self.assertEqual(status_code, 200)
+
+        self.user.refresh_from_db()
+        url_hash = users_services.make_email_token(
+            user=self.user,
+            email_type=users_services.PASSWORD_RESTORE,
+        )
+        status_code, _ = self.assertQueryBudget(
+            3,
+            users_services.password_restore,
+            url_hash=url_hash,
+            data={'password': 'test123', 'new_password': 'test1234'},
+        )
+        self.assertEqual(status_code, 200)
+
+        self.assertQueryBudget(
+            1,
+            CustomTokenAuthentication().authenticate_credentials,
+            key=self.token.key,
+        )
+
+        user = CustomUser.objects.get(email='new@cc.com')
+        status_code, _ = self.assertQueryBudget(8, users_services.remove, user=user)
+        self.assertEqual(status_code, 200)
+
+    def test_notifications_services(self):
+        EmailConfiguration.get_solo()
+        email_registry.clear()
+        # шаблоны и настройки загружаются в реестр один раз на процесс
+        self.assertQueryBudget(2, email_registry.get_configs)
+
+        email = Email(
+            email_type='confirm_email',
+            mail_data={'url': 'http://127.0.0.1:8000/'},
+            recipient=self.user,
+        )
+        self.assertEqual(self.assertQueryBudget(1, email.send), 200)
+        self.assertQueryBudget(0, email.formate_email_text)
+
+        with self.settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend'):
+            # захват пачки и сохранение результата каждого письма
+            status_code, _ = self.assertQueryBudget(3, deliver_outbox, check_plans=False)
+        self.assertEqual(status_code, 200)
+        self.assertFalse(EmailOutbox.objects.filter(status=EmailOutbox.PENDING).exists())
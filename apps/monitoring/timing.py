@@ -0,0 +1,160 @@
+import functools
+import inspect
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+
+request_timings = ContextVar('request_timings', default=None)
+
+
+class RequestTimings:
+    def __init__(self):
+        self.stages = {}
+        self.db_queries = 0
+        self.db_time = 0
+        self._active = []
+
+    def get_stage(self, name: str) -> dict:
+        stage = self.stages.get(name)
+        if stage is None:
+            stage = self.stages[name] = {
+                'duration': 0,
+                'db_queries': 0,
+                'db_time': 0,
+            }
+        return stage
+
+    def add_query(self, duration: float) -> None:
+        '''
+        Учет запроса к БД в общем времени и во всех открытых этапах
+
+        Args:
+            duration: время выполнения запроса в секундах
+
+        Returns:
+            None
+        '''
+
+        self.db_queries += 1
+        self.db_time += duration
+        for stage in self._active:
+            stage['db_queries'] += 1
+            stage['db_time'] += duration
+
+    @contextmanager
+    def stage(self, name: str):
+        stage = self.get_stage(name)
+        self._active.append(stage)
+        start = time.perf_counter()
+        try:
+            yield stage
+        finally:
+            stage['duration'] += time.perf_counter() - start
+            self._active.remove(stage)
+
+    def as_dict(self) -> dict:
+        '''
+        Получение времени этапов в миллисекундах для структурированного лога
+
+        Returns:
+            Словарь этапов
+        '''
+
+        return {
+            name: {
+                'duration_ms': round(stage['duration'] * 1000, 3),
+                'db_queries': stage['db_queries'],
+                'db_time_ms': round(stage['db_time'] * 1000, 3),
+            }
+            for name, stage in self.stages.items()
+        }
+
+    def as_header(self, total: float) -> str:
+        '''
+        Формирование значения заголовка Server-Timing
+
+        Args:
+            total: общее время обработки запроса в секундах
+
+        Returns:
+            Значение заголовка
+        '''
+
+        metrics = [
+            f'total;dur={total * 1000:.3f}',
+            f'db;dur={self.db_time * 1000:.3f};desc="{self.db_queries} queries"',
+        ]
+        for name, stage in self.stages.items():
+            metrics.append(f'{name};dur={stage["duration"] * 1000:.3f}')
+            if stage['db_queries']:
+                metrics.append(
+                    f'{name}.db;dur={stage["db_time"] * 1000:.3f};'
+                    f'desc="{stage["db_queries"]} queries"'
+                )
+        return ', '.join(metrics)
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.add_query(time.perf_counter() - start)
+
+
+@contextmanager
+def stage(name: str):
+    '''
+    Замер этапа обработки запроса, вне запроса или при отключенных замерах ничего не делает
+
+    Args:
+        name: название этапа
+
+    Returns:
+        Контекстный менеджер
+    '''
+
+    timings = request_timings.get()
+    if timings is None:
+        yield None
+        return
+    with timings.stage(name) as current:
+        yield current
+
+
+def timed(name: str | None = None):
+    '''
+    Декоратор замера времени и запросов к БД функции сервиса, в том числе асинхронной
+
+    Args:
+        name: название этапа, по умолчанию <приложение>.<функция>
+
+    Returns:
+        Декоратор
+    '''
+
+    def decorator(func):
+        stage_name = name or f'{func.__module__.split(".")[0]}.{func.__name__}'
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                timings = request_timings.get()
+                if timings is None:
+                    return await func(*args, **kwargs)
+                with timings.stage(stage_name):
+                    return await func(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            timings = request_timings.get()
+            if timings is None:
+                return func(*args, **kwargs)
+            with timings.stage(stage_name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
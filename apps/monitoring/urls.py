@@ -0,0 +1,12 @@
+from django.urls import path
+
+from monitoring.views import metrics
+
+
+urlpatterns = [
+    path(
+        '',
+        metrics,
+        name='metrics',
+    ),
+]
@@ -0,0 +1,75 @@
+import hmac
+
+from django.conf import settings
+from django.db.models import Count
+from django.http import (
+    HttpResponse,
+    HttpResponseForbidden,
+    HttpResponseNotFound,
+)
+
+from monitoring.metrics import (
+    is_enabled,
+    render,
+)
+from notifications.models import EmailOutbox
+
+
+def get_outbox_gauges() -> list:
+    '''
+    Получение размера очереди писем по статусам
+
+    Returns:
+        Список метрик для render
+    '''
+
+    statuses = [
+        EmailOutbox.PENDING,
+        EmailOutbox.SENDING,
+        EmailOutbox.DEAD,
+    ]
+    counts = {
+        (('status', status),): 0
+        for status in statuses
+    }
+    rows = EmailOutbox.objects.filter(
+        status__in=statuses,
+    ).values_list('status').order_by().annotate(count=Count('pk'))
+    for status, count in rows:
+        counts[(('status', status),)] = count
+    return [
+        ('email_outbox_messages', 'Количество писем в очереди отправки', counts),
+    ]
+
+
+def is_authorized(request) -> bool:
+    '''
+    Проверка доступа к метрикам: токен METRICS_TOKEN в заголовке Authorization,
+    без METRICS_TOKEN метрики доступны только сотрудникам
+
+    Args:
+        request: запрос
+
+    Returns:
+        Флаг
+    '''
+
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if not token:
+        user = getattr(request, 'user', None)
+        return user is not None and user.is_staff
+    return hmac.compare_digest(
+        request.headers.get('Authorization', ''),
+        f'Bearer {token}',
+    )
+
+
+def metrics(request):
+    if not is_enabled():
+        return HttpResponseNotFound()
+    if not is_authorized(request):
+        return HttpResponseForbidden()
+    return HttpResponse(
+        content=render(gauges=get_outbox_gauges()),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
@@ -6,6 +6,7 @@ from notifications.forms import EmailTemplateForm
 from notifications.models import (
     EmailTemplate,
     EmailConfiguration,
+    EmailOutbox,
 )
 
 
@@ -20,3 +21,18 @@ class EmailTemplateAdmin(admin.ModelAdmin):
 @admin.register(EmailConfiguration)
 class EmailConfigurationAdmin(SingletonModelAdmin):
     pass
+
+
+@admin.register(EmailOutbox)
+class EmailOutboxAdmin(admin.ModelAdmin):
+    list_display = [
+        'email_type',
+        'recipient',
+        'status',
+        'attempts',
+        'next_attempt_at',
+    ]
+    list_filter = [
+        'status',
+        'email_type',
+    ]
@@ -0,0 +1,45 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from notifications.services import deliver_outbox
+
+
+class Command(BaseCommand):
+    help = 'Отправка писем из очереди EmailOutbox'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.EMAIL_OUTBOX_BATCH_SIZE,
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=settings.EMAIL_OUTBOX_POLL_INTERVAL,
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Отправить все готовые письма и завершить работу',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        try:
+            while True:
+                status_code, result = deliver_outbox(
+                    batch_size=batch_size,
+                )
+                processed = sum(result.values())
+                if status_code == 200 and processed:
+                    self.stdout.write(f'Обработано писем: {result}')
+                if processed == batch_size:
+                    continue
+                if options['once']:
+                    break
+                time.sleep(options['poll_interval'])
+        except KeyboardInterrupt:
+            self.stdout.write('Отправка писем остановлена')
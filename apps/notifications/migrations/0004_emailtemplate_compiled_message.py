@@ -0,0 +1,34 @@
+# Generated by Django 4.2 on 2026-10-19 18:44
+
+from django.db import migrations, models
+
+from notifications.templating import compile_message
+
+
+def compile_messages(apps, schema_editor):
+    EmailTemplate = apps.get_model('notifications', 'EmailTemplate')
+    for template in EmailTemplate.objects.all():
+        try:
+            template.compiled_message = compile_message(template.message)
+        except ValueError:
+            continue
+        template.save(update_fields=['compiled_message'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0003_email_outbox'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='emailtemplate',
+            name='compiled_message',
+            field=models.JSONField(default=list, editable=False, verbose_name='Скомпилированное сообщение'),
+        ),
+        migrations.RunPython(
+            compile_messages,
+            migrations.RunPython.noop,
+        ),
+    ]
@@ -1,6 +1,12 @@
+from django.core.exceptions import ValidationError
 from django.db import models
+from django.utils import timezone
 from solo.models import SingletonModel
 
+from notifications.templating import (
+    compile_message,
+    validate_message,
+)
 from utils.constants import EMAIL_TYPES
 
 
@@ -18,10 +24,40 @@ class EmailTemplate(models.Model):
     message = models.TextField(
         verbose_name='Сообщение',
     )
+    compiled_message = models.JSONField(
+        verbose_name='Скомпилированное сообщение',
+        default=list,
+        editable=False,
+    )
 
     def __str__(self):
         return self.email_type
 
+    def clean(self):
+        try:
+            validate_message(
+                message=self.message,
+                email_type=self.email_type,
+            )
+        except ValidationError as exc:
+            raise ValidationError({'message': exc.messages})
+
+    def save(self, *args, **kwargs):
+        self.compiled_message = compile_message(self.message)
+        return super().save(*args, **kwargs)
+
+    def get_compiled_message(self) -> list:
+        '''
+        Получение скомпилированного текста письма
+
+        Returns:
+            Скомпилированный текст
+        '''
+
+        if not self.compiled_message and self.message:
+            self.compiled_message = compile_message(self.message)
+        return self.compiled_message
+
     class Meta:
         db_table = 'email_templates'
         verbose_name = 'Шаблон письма'
@@ -40,3 +76,73 @@ class EmailConfiguration(SingletonModel):
     class Meta:
         db_table = 'email_configurations'
         verbose_name = 'Настройки email'
+
+
+class EmailOutbox(models.Model):
+    PENDING = 'pending'
+    SENDING = 'sending'
+    SENT = 'sent'
+    DEAD = 'dead'
+    STATUSES = (
+        (PENDING, 'Ожидает отправки'),
+        (SENDING, 'Отправляется'),
+        (SENT, 'Отправлено'),
+        (DEAD, 'Не доставлено'),
+    )
+
+    email_type = models.CharField(
+        verbose_name='Тип письма',
+        max_length=64,
+        choices=EMAIL_TYPES,
+    )
+    recipient = models.EmailField(
+        verbose_name='Получатель',
+    )
+    subject = models.CharField(
+        verbose_name='Тема',
+        max_length=256,
+    )
+    message = models.TextField(
+        verbose_name='Сообщение',
+    )
+    status = models.CharField(
+        verbose_name='Статус',
+        max_length=16,
+        choices=STATUSES,
+        default=PENDING,
+    )
+    attempts = models.PositiveIntegerField(
+        verbose_name='Количество попыток',
+        default=0,
+    )
+    next_attempt_at = models.DateTimeField(
+        verbose_name='Следующая попытка',
+        default=timezone.now,
+    )
+    last_error = models.TextField(
+        verbose_name='Последняя ошибка',
+        blank=True,
+    )
+    created_at = models.DateTimeField(
+        verbose_name='Дата создания',
+        auto_now_add=True,
+    )
+    sent_at = models.DateTimeField(
+        verbose_name='Дата отправки',
+        null=True,
+        blank=True,
+    )
+
+    def __str__(self):
+        return f'{self.email_type} {self.recipient}'
+
+    class Meta:
+        db_table = 'email_outbox'
+        verbose_name = 'Письмо в очереди'
+        verbose_name_plural = 'Очередь писем'
+        indexes = [
+            models.Index(
+                fields=['status', 'next_attempt_at'],
+                name='email_outbox_pending_idx',
+            ),
+        ]
@@ -0,0 +1,175 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+from monitoring.metrics import cache_requests
+from utils.cache import is_process_local
+from notifications.models import (
+    EmailConfiguration,
+    EmailTemplate,
+)
+
+
+class EmailRegistry:
+    '''
+    Шаблоны писем и настройки email, загруженные в память процесса
+
+    Изменения в других процессах отслеживаются по версии в кэше EMAIL_REGISTRY_CACHE.
+    Если этот кэш хранится в памяти процесса, версия другим процессам не видна,
+    и данные перезагружаются не реже раза в EMAIL_REGISTRY_LOCAL_TTL секунд
+    '''
+
+    version_key = 'notifications:email_registry_version'
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        # шаблоны и настройки заменяются одним присваиванием, чтобы чтение без
+        # блокировки не видело данные разных загрузок
+        self._data = None
+        self._version = None
+        self._checked_at = 0
+        self._loaded_at = 0
+
+    @property
+    def cache_alias(self) -> str:
+        return getattr(settings, 'EMAIL_REGISTRY_CACHE', 'default')
+
+    @property
+    def cache(self):
+        '''
+        Кэш с версией реестра
+
+        Returns:
+            Объект кэша Django
+        '''
+
+        return caches[self.cache_alias]
+
+    def _get_shared_version(self) -> int:
+        '''
+        Получение версии реестра из общего кэша
+
+        Returns:
+            Версия
+        '''
+
+        version = self.cache.get(self.version_key)
+        if version is None:
+            self.cache.add(self.version_key, 1, timeout=None)
+            version = self.cache.get(self.version_key, 1)
+        return version
+
+    def _is_stale(self) -> bool:
+        '''
+        Проверка актуальности загруженных данных
+
+        Returns:
+            Флаг устаревания
+        '''
+
+        if self._data is None:
+            return True
+        now = time.monotonic()
+        if is_process_local(self.cache_alias):
+            ttl = getattr(settings, 'EMAIL_REGISTRY_LOCAL_TTL', 60)
+            if now - self._loaded_at >= ttl:
+                return True
+        interval = getattr(settings, 'EMAIL_REGISTRY_CHECK_INTERVAL', 1)
+        if now - self._checked_at < interval:
+            return False
+        self._checked_at = now
+        return self._get_shared_version() != self._version
+
+    def _load(self) -> None:
+        '''
+        Загрузка шаблонов писем и настроек email из базы данных
+
+        Returns:
+            None
+        '''
+
+        version = self._get_shared_version()
+        # get_solo может создать запись настроек, сигнал сохранения сбрасывает реестр,
+        # поэтому настройки загружаются до шаблонов
+        configs = EmailConfiguration.get_solo()
+        templates = {
+            template.email_type: template
+            for template in EmailTemplate.objects.all()
+        }
+        self._data = (templates, configs)
+        self._version = version
+        self._checked_at = self._loaded_at = time.monotonic()
+
+    def _get_data(self) -> tuple:
+        '''
+        Получение загруженных данных, при устаревании данные перезагружаются
+
+        Returns:
+            Кортеж из словаря шаблонов по типу письма и настроек email
+        '''
+
+        data = self._data
+        if data is None or self._is_stale():
+            with self._lock:
+                if self._data is None or self._is_stale():
+                    self._load()
+                    cache_requests.inc(cache='email_registry', result='miss')
+                    return self._data
+                data = self._data
+        cache_requests.inc(cache='email_registry', result='hit')
+        return data
+
+    def get_template(self, email_type: str) -> EmailTemplate | None:
+        '''
+        Получение шаблона письма по типу
+
+        Args:
+            email_type: тип письма
+
+        Returns:
+            Шаблон письма или None
+        '''
+
+        templates, _ = self._get_data()
+        return templates.get(email_type)
+
+    def get_configs(self) -> EmailConfiguration:
+        '''
+        Получение настроек email
+
+        Returns:
+            Объект EmailConfiguration
+        '''
+
+        _, configs = self._get_data()
+        return configs
+
+    def clear(self) -> None:
+        '''
+        Сброс данных реестра в текущем процессе
+
+        Returns:
+            None
+        '''
+
+        with self._lock:
+            self._data = None
+
+    def invalidate(self) -> None:
+        '''
+        Сброс данных реестра во всех процессах через версию в общем кэше
+
+        Returns:
+            None
+        '''
+
+        self.clear()
+        try:
+            self.cache.incr(self.version_key)
+        except ValueError:
+            self.cache.add(self.version_key, 1, timeout=None)
+
+
+email_registry = EmailRegistry()
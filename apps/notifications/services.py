@@ -1,13 +1,28 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
 from django.conf.global_settings import EMAIL_HOST_USER
-from django.core.mail import send_mail
+from django.core.mail import (
+    EmailMessage,
+    get_connection,
+)
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
 
 from notifications.models import (
     EmailConfiguration,
-    EmailTemplate,
+    EmailOutbox,
 )
+from notifications.registry import email_registry
+from notifications.templating import render
 from users_api.models import CustomUser
 
-from utils.logger import get_logger
+from utils.logger import (
+    get_logger,
+    lazy_message,
+)
 
 
 logger = get_logger(__name__)
@@ -33,7 +48,9 @@ class Email:
             msg=f'Поиск шаблона для письма {self.email_type}',
         )
         try:
-            mail = EmailTemplate.objects.filter(email_type=self.email_type).first()
+            mail = email_registry.get_template(
+                email_type=self.email_type,
+            )
         except Exception as exc:
             logger.error(
                 msg=f'Возникла ошибка при поиске шаблона письма {self.email_type}',
@@ -55,7 +72,7 @@ class Email:
             msg='Получение настроек email',
         )
         try:
-            configs = EmailConfiguration.get_solo()
+            configs = email_registry.get_configs()
         except Exception as exc:
             logger.error(
                 msg='Ошибка при получении настроек email',
@@ -76,8 +93,15 @@ class Email:
         '''
 
         logger.info(
-            msg=f'Формирование текста для письма {self.email_type} '
-                f'с данными {self.mail_data} пользователю {self.recipient}'
+            msg=lazy_message(
+                logger,
+                logging.INFO,
+                'Формирование текста для письма {email_type} '
+                'с данными {mail_data} пользователю {recipient}',
+                email_type=self.email_type,
+                mail_data=self.mail_data,
+                recipient=self.recipient,
+            ),
         )
 
         mail = self._get_email_template()
@@ -93,11 +117,21 @@ class Email:
 
         subject = mail.subject
         try:
-            message = mail.message.format(**self.mail_data)
+            message = render(
+                segments=mail.get_compiled_message(),
+                data=self.mail_data,
+            )
         except Exception as exc:
             logger.error(
-                msg=f'Возникла ошибка при форматировании текста для письма {mail} '
-                    f'с данными {self.mail_data} пользователю {self.recipient}',
+                msg=lazy_message(
+                    logger,
+                    logging.ERROR,
+                    'Возникла ошибка при форматировании текста для письма {mail} '
+                    'с данными {mail_data} пользователю {recipient}',
+                    mail=mail,
+                    mail_data=self.mail_data,
+                    recipient=self.recipient,
+                ),
                 exc_info=True,
             )
             return 500, {}
@@ -112,7 +146,10 @@ class Email:
 
     def send(self) -> int:
         '''
-        Отправка письма
+        Постановка письма в очередь на отправку
+
+        Письмо сохраняется в EmailOutbox в текущей транзакции,
+        отправкой занимается команда send_outbox
 
         Returns:
             Статус
@@ -133,26 +170,204 @@ class Email:
             )
             return status_code
 
-        subject = email_text["subject"]
+        subject = email_text['subject']
         logger.info(
-            msg=f'Отправка письма {subject} пользователю {self.recipient}',
+            msg=f'Постановка письма {subject} пользователю {self.recipient} в очередь',
         )
         try:
-            send_mail(
+            EmailOutbox.objects.create(
+                email_type=self.email_type,
+                recipient=self.recipient.email,
                 subject=subject,
                 message=email_text['message'],
-                from_email=self.email_host_user,
-                recipient_list=[self.recipient],
             )
         except Exception as exc:
             logger.error(
-                msg=f'Произошла ошибка при отправке письма {subject} '
-                    f'пользователю {self.recipient}',
+                msg=f'Произошла ошибка при постановке письма {subject} '
+                    f'пользователю {self.recipient} в очередь',
                 exc_info=True,
             )
             return 500
 
         logger.info(
-            msg=f'Письмо {subject} пользователю {self.recipient} успешно отправлено',
+            msg=f'Письмо {subject} пользователю {self.recipient} поставлено в очередь',
         )
         return 200
+
+
+def get_retry_delay(attempts: int) -> timedelta:
+    '''
+    Получение задержки перед повторной отправкой письма
+
+    Args:
+        attempts: количество сделанных попыток
+
+    Returns:
+        Задержка
+    '''
+
+    delay = settings.EMAIL_OUTBOX_RETRY_DELAY * 2 ** (attempts - 1)
+    return timedelta(
+        seconds=min(delay, settings.EMAIL_OUTBOX_MAX_RETRY_DELAY),
+    )
+
+
+def claim_outbox(batch_size: int) -> list:
+    '''
+    Захват пачки писем для отправки в короткой транзакции: письма получают статус
+    sending, next_attempt_at становится сроком захвата. Письма, не отправленные
+    до конца срока (процесс отправки завершился), захватываются повторно
+
+    Args:
+        batch_size: размер пачки
+
+    Returns:
+        Список захваченных писем
+    '''
+
+    now = timezone.now()
+    lease_until = now + timedelta(
+        seconds=settings.EMAIL_OUTBOX_LEASE_SECONDS,
+    )
+    with transaction.atomic():
+        emails = list(
+            EmailOutbox.objects.select_for_update(
+                skip_locked=True,
+            ).filter(
+                status__in=[
+                    EmailOutbox.PENDING,
+                    EmailOutbox.SENDING,
+                ],
+                next_attempt_at__lte=now,
+            ).order_by(
+                'next_attempt_at',
+            )[:batch_size]
+        )
+        if not emails:
+            return emails
+        EmailOutbox.objects.filter(
+            pk__in=[email.pk for email in emails],
+        ).update(
+            status=EmailOutbox.SENDING,
+            attempts=F('attempts') + 1,
+            next_attempt_at=lease_until,
+        )
+    for email in emails:
+        email.status = EmailOutbox.SENDING
+        email.attempts += 1
+        email.next_attempt_at = lease_until
+    return emails
+
+
+def save_delivery_result(email: EmailOutbox) -> None:
+    '''
+    Сохранение результата отправки письма, если захват письма не перехвачен
+    другим процессом после истечения срока
+
+    Args:
+        email: письмо
+
+    Returns:
+        None
+    '''
+
+    EmailOutbox.objects.filter(
+        pk=email.pk,
+        status=EmailOutbox.SENDING,
+        attempts=email.attempts,
+    ).update(
+        status=email.status,
+        next_attempt_at=email.next_attempt_at,
+        last_error=email.last_error,
+        sent_at=email.sent_at,
+    )
+
+
+def deliver_outbox(batch_size: int | None = None) -> (int, dict):
+    '''
+    Отправка пачки писем из очереди через одно SMTP соединение. Блокировки строк
+    держатся только на время захвата пачки, письма отправляются вне транзакции,
+    результат каждого письма сохраняется отдельным запросом
+
+    Args:
+        batch_size: размер пачки
+
+    Returns:
+        Кортеж из статуса и словаря с количеством писем по результатам
+    '''
+
+    batch_size = batch_size or settings.EMAIL_OUTBOX_BATCH_SIZE
+    max_attempts = settings.EMAIL_OUTBOX_MAX_ATTEMPTS
+    result = {
+        EmailOutbox.SENT: 0,
+        EmailOutbox.PENDING: 0,
+        EmailOutbox.DEAD: 0,
+    }
+
+    try:
+        emails = claim_outbox(
+            batch_size=batch_size,
+        )
+    except Exception as exc:
+        logger.error(
+            msg='Возникла ошибка при получении писем из очереди',
+            exc_info=True,
+        )
+        return 500, result
+
+    if not emails:
+        return 200, result
+
+    logger.info(
+        msg=f'Отправка {len(emails)} писем из очереди',
+    )
+    connection = get_connection()
+    try:
+        for email in emails:
+            message = EmailMessage(
+                subject=email.subject,
+                body=email.message,
+                from_email=Email.email_host_user,
+                to=[email.recipient],
+                connection=connection,
+            )
+            try:
+                connection.open()
+                message.send()
+            except Exception as exc:
+                logger.error(
+                    msg=f'Произошла ошибка при отправке письма {email.pk} '
+                        f'пользователю {email.recipient}, попытка {email.attempts}',
+                    exc_info=True,
+                )
+                connection.close()
+                email.last_error = str(exc)
+                if email.attempts >= max_attempts:
+                    email.status = EmailOutbox.DEAD
+                else:
+                    email.status = EmailOutbox.PENDING
+                    email.next_attempt_at = timezone.now() + get_retry_delay(
+                        attempts=email.attempts,
+                    )
+            else:
+                email.status = EmailOutbox.SENT
+                email.sent_at = timezone.now()
+                email.last_error = ''
+            try:
+                save_delivery_result(
+                    email=email,
+                )
+            except Exception as exc:
+                logger.error(
+                    msg=f'Возникла ошибка при сохранении результата отправки письма {email.pk}',
+                    exc_info=True,
+                )
+                return 500, result
+            result[email.status] += 1
+    finally:
+        connection.close()
+
+    logger.info(
+        msg=f'Пачка писем из очереди обработана: {result}',
+    )
+    return 200, result
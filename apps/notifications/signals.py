@@ -0,0 +1,21 @@
+from django.db import transaction
+from django.db.models.signals import (
+    post_save,
+    post_delete,
+)
+from django.dispatch import receiver
+
+from notifications.models import (
+    EmailConfiguration,
+    EmailTemplate,
+)
+from notifications.registry import email_registry
+
+
+@receiver(post_save, sender=EmailTemplate)
+@receiver(post_delete, sender=EmailTemplate)
+@receiver(post_save, sender=EmailConfiguration)
+@receiver(post_delete, sender=EmailConfiguration)
+def invalidate_email_registry(sender, **kwargs):
+    email_registry.clear()
+    transaction.on_commit(email_registry.invalidate)
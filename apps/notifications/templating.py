@@ -0,0 +1,109 @@
+from string import Formatter
+
+from django.core.exceptions import ValidationError
+
+from utils.constants import EMAIL_PLACEHOLDERS
+
+
+_formatter = Formatter()
+
+
+def compile_message(message: str) -> list:
+    '''
+    Разбор текста письма на литералы и плейсхолдеры
+
+    Args:
+        message: текст письма
+
+    Returns:
+        Список сегментов [литерал, плейсхолдер, конвертация, формат]
+    '''
+
+    segments = []
+    for literal, field_name, format_spec, conversion in _formatter.parse(message):
+        if field_name is not None and not field_name.isidentifier():
+            raise ValueError(f'Неподдерживаемый плейсхолдер {{{field_name}}}')
+        if format_spec and '{' in format_spec:
+            raise ValueError(f'Вложенные плейсхолдеры не поддерживаются: {format_spec}')
+        segments.append([literal, field_name, conversion, format_spec or ''])
+    return segments
+
+
+def get_placeholders(segments: list) -> set:
+    '''
+    Получение плейсхолдеров скомпилированного текста
+
+    Args:
+        segments: скомпилированный текст
+
+    Returns:
+        Множество плейсхолдеров
+    '''
+
+    return {segment[1] for segment in segments if segment[1] is not None}
+
+
+def validate_message(message: str, email_type: str) -> list:
+    '''
+    Компиляция текста письма с проверкой плейсхолдеров для типа письма
+
+    Args:
+        message: текст письма
+        email_type: тип письма
+
+    Returns:
+        Скомпилированный текст
+    '''
+
+    try:
+        segments = compile_message(message)
+    except ValueError as exc:
+        raise ValidationError(f'Ошибка в шаблоне письма: {exc}')
+
+    allowed = set(EMAIL_PLACEHOLDERS.get(email_type, ()))
+    unknown = get_placeholders(segments) - allowed
+    if unknown:
+        raise ValidationError(
+            f'Неизвестные плейсхолдеры: {", ".join(sorted(unknown))}. '
+            f'Доступные: {", ".join(sorted(allowed)) or "нет"}'
+        )
+    return segments
+
+
+def render(segments: list, data: dict) -> str:
+    '''
+    Формирование текста из скомпилированного шаблона
+
+    Args:
+        segments: скомпилированный текст
+        data: данные для плейсхолдеров
+
+    Returns:
+        Текст
+    '''
+
+    parts = []
+    for literal, field_name, conversion, format_spec in segments:
+        parts.append(literal)
+        if field_name is None:
+            continue
+        value = data[field_name]
+        if conversion:
+            value = _formatter.convert_field(value, conversion)
+        parts.append(format(value, format_spec))
+    return ''.join(parts)
+
+
+def render_many(segments: list, data_list: list) -> list:
+    '''
+    Формирование текстов из одного шаблона для пачки данных
+
+    Args:
+        segments: скомпилированный текст
+        data_list: список данных для плейсхолдеров
+
+    Returns:
+        Список текстов
+    '''
+
+    return [render(segments, data) for data in data_list]
@@ -1,13 +1,28 @@
 import json
 import os
+from datetime import timedelta
 
-from django.test import TestCase
+from django.test import (
+    TestCase,
+    override_settings,
+)
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 
 from unittest.mock import patch
 
-from notifications.models import EmailConfiguration
-from notifications.services import Email
+from monitoring.nplusone import NPlusOneTestMixin
+from notifications.models import (
+    EmailConfiguration,
+    EmailOutbox,
+    EmailTemplate,
+)
+from notifications.registry import email_registry
+from notifications.services import (
+    Email,
+    deliver_outbox,
+)
+from utils.smtp_sink import SMTPSink
 
 
 CUR_DIR = os.path.dirname(__file__)
@@ -16,7 +31,7 @@ CUR_DIR = os.path.dirname(__file__)
 User = get_user_model()
 
 
-class ServicesTest(TestCase):
+class ServicesTest(NPlusOneTestMixin, TestCase):
     fixtures = ['email_template.json']
 
     @classmethod
@@ -28,6 +43,9 @@ class ServicesTest(TestCase):
         )
         cls.configs = EmailConfiguration.get_solo()
 
+    def setUp(self):
+        email_registry.clear()
+
     def test_formate_email_text(self):
         path = f'{self.path}/formate_email_text'
         fixtures = (
@@ -83,3 +101,145 @@ class ServicesTest(TestCase):
             status_code = email.send()
 
             self.assertEqual(status_code, code, msg=fixture)
+
+        self.assertEqual(
+            EmailOutbox.objects.filter(recipient=self.user.email).count(),
+            2,
+        )
+
+    def test_email_registry(self):
+        email = Email(
+            email_type='confirm_email',
+            mail_data={'url': 'test_url'},
+            recipient=self.user,
+        )
+        email.send()
+
+        with self.assertNumQueries(1):
+            status_code = email.send()
+        self.assertEqual(status_code, 200)
+
+        template = EmailTemplate.objects.get(email_type='confirm_email')
+        template.subject = 'Новая тема'
+        template.save()
+
+        status_code, response = email.formate_email_text()
+        self.assertEqual(response['subject'], 'Новая тема')
+
+        self.configs.send_emails = False
+        self.configs.save()
+
+        with self.assertNumQueries(2):
+            status_code = email.send()
+        self.assertEqual(status_code, 403)
+
+        with self.assertNumQueries(0):
+            email.send()
+
+    @override_settings(EMAIL_REGISTRY_CACHE='default')
+    def test_email_registry_local_ttl(self):
+        email_registry.get_template(email_type='confirm_email')
+        # изменение в другом процессе: без сигнала и без общей версии реестра
+        EmailTemplate.objects.filter(email_type='confirm_email').update(subject='Новая тема')
+
+        with self.assertNumQueries(0):
+            template = email_registry.get_template(email_type='confirm_email')
+        self.assertNotEqual(template.subject, 'Новая тема')
+
+        with override_settings(EMAIL_REGISTRY_LOCAL_TTL=0):
+            template = email_registry.get_template(email_type='confirm_email')
+        self.assertEqual(template.subject, 'Новая тема')
+
+    def test_email_registry_without_configs(self):
+        EmailConfiguration.objects.all().delete()
+
+        template = email_registry.get_template(
+            email_type='confirm_email',
+        )
+        self.assertIsNotNone(template)
+        self.assertTrue(EmailConfiguration.objects.exists())
+
+
+class OutboxTest(NPlusOneTestMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for index in range(3):
+            EmailOutbox.objects.create(
+                email_type='confirm_email',
+                recipient=f'test{index}@cc.com',
+                subject='Подтверждение адреса электронной почты',
+                message='Подтвердите адрес электронной почты по ссылке test_url',
+            )
+        EmailOutbox.objects.create(
+            email_type='confirm_email',
+            recipient='reject@cc.com',
+            subject='Подтверждение адреса электронной почты',
+            message='Подтвердите адрес электронной почты по ссылке test_url',
+        )
+
+    def setUp(self):
+        self.sink = SMTPSink(reject=('reject',)).start()
+        self.addCleanup(self.sink.stop)
+
+    def test_deliver_outbox(self):
+        with override_settings(
+            EMAIL_OUTBOX_MAX_ATTEMPTS=2,
+            **self.sink.email_settings(),
+        ):
+            status_code, result = deliver_outbox()
+
+            self.assertEqual(status_code, 200)
+            self.assertEqual(result, {'sent': 3, 'pending': 1, 'dead': 0})
+            self.assertEqual(len(self.sink.messages), 3)
+            self.assertEqual(self.sink.sessions, 1)
+
+            status_code, result = deliver_outbox()
+            self.assertEqual(result, {'sent': 0, 'pending': 0, 'dead': 0})
+
+            EmailOutbox.objects.filter(
+                status=EmailOutbox.PENDING,
+            ).update(
+                next_attempt_at=timezone.now(),
+            )
+            status_code, result = deliver_outbox()
+            self.assertEqual(result, {'sent': 0, 'pending': 0, 'dead': 1})
+
+        dead = EmailOutbox.objects.get(status=EmailOutbox.DEAD)
+        self.assertEqual(dead.recipient, 'reject@cc.com')
+        self.assertEqual(dead.attempts, 2)
+
+    def test_deliver_outbox_lease(self):
+        # письмо захвачено процессом, который завершился до сохранения результата
+        EmailOutbox.objects.filter(
+            recipient='test0@cc.com',
+        ).update(
+            status=EmailOutbox.SENDING,
+            attempts=1,
+            next_attempt_at=timezone.now() + timedelta(minutes=5),
+        )
+        EmailOutbox.objects.filter(
+            recipient='test1@cc.com',
+        ).update(
+            status=EmailOutbox.SENDING,
+            attempts=1,
+            next_attempt_at=timezone.now() - timedelta(seconds=1),
+        )
+
+        with override_settings(**self.sink.email_settings()):
+            status_code, result = deliver_outbox()
+
+        self.assertEqual(status_code, 200)
+        self.assertEqual(result, {'sent': 2, 'pending': 1, 'dead': 0})
+        recipients = [
+            recipient
+            for message in self.sink.messages
+            for recipient in message['recipients']
+        ]
+        self.assertNotIn('test0@cc.com', recipients)
+        email = EmailOutbox.objects.get(recipient='test1@cc.com')
+        self.assertEqual(email.status, EmailOutbox.SENT)
+        self.assertEqual(email.attempts, 2)
+        self.assertEqual(
+            EmailOutbox.objects.get(recipient='test0@cc.com').status,
+            EmailOutbox.SENDING,
+        )
@@ -0,0 +1,49 @@
+from django.core.exceptions import ValidationError
+from django.test import SimpleTestCase
+
+from notifications.templating import (
+    compile_message,
+    get_placeholders,
+    validate_message,
+    render,
+    render_many,
+)
+
+
+class TemplatingTest(SimpleTestCase):
+    def test_render(self):
+        messages = (
+            'Подтвердите адрес электронной почты по ссылке {url}',
+            '{url}',
+            'Ссылка: {url!r}, {{не плейсхолдер}}, {url:>30}',
+            'Без плейсхолдеров',
+        )
+        data = {'url': 'http://127.0.0.1:8000/confirm/'}
+
+        for message in messages:
+            segments = compile_message(message)
+            self.assertEqual(render(segments, data), message.format(**data), msg=message)
+
+        segments = compile_message(messages[0])
+        self.assertEqual(get_placeholders(segments), {'url'})
+        self.assertEqual(
+            render_many(segments, [{'url': 'a'}, {'url': 'b'}]),
+            [messages[0].format(url='a'), messages[0].format(url='b')],
+        )
+        with self.assertRaises(KeyError):
+            render(segments, {})
+
+    def test_validate_message(self):
+        fixtures = (
+            (True, 'Подтвердите адрес по ссылке {url}'),
+            (False, 'Подтвердите адрес по ссылке {link}'),
+            (False, 'Подтвердите адрес по ссылке {url'),
+            (False, 'Подтвердите адрес по ссылке {url.host}'),
+        )
+
+        for valid, message in fixtures:
+            if valid:
+                validate_message(message=message, email_type='confirm_email')
+                continue
+            with self.assertRaises(ValidationError, msg=message):
+                validate_message(message=message, email_type='confirm_email')
@@ -1,3 +1,4 @@
+from asgiref.sync import sync_to_async
 from rest_framework.permissions import (
     IsAuthenticated,
     IsAuthenticatedOrReadOnly,
@@ -7,19 +8,27 @@ from rest_framework.views import APIView
 
 from posts_api.services import (
     get_posts,
+    aget_posts,
     add,
     detail,
+    adetail,
     update,
     remove,
     get_posts_by_pk,
+    aget_posts_by_pk,
 )
 
+from utils.views import AsyncAPIView
+
 
 class PostListView(APIView):
     permission_classes = [IsAuthenticatedOrReadOnly]
 
     def get(self, request, *args, **kwargs):
-        status_code, data = get_posts()
+        status_code, data = get_posts(
+            fields=request.query_params.get('fields'),
+            user=request.user,
+        )
         return Response(
             status=status_code,
             data=data,
@@ -46,6 +55,7 @@ class PostUserView(APIView):
         status_code, data = get_posts_by_pk(
             pk=pk,
             user=user,
+            fields=request.query_params.get('fields'),
         )
         return Response(
             status=status_code,
@@ -61,6 +71,7 @@ class PostDetailView(APIView):
         status_code, data = detail(
             slug=slug,
             user=user,
+            fields=request.query_params.get('fields'),
         )
         return Response(
             status=status_code,
@@ -90,3 +101,83 @@ class PostDetailView(APIView):
             status=status_code,
             data=data,
         )
+
+
+class AsyncPostListView(AsyncAPIView):
+    permission_classes = [IsAuthenticatedOrReadOnly]
+
+    async def get(self, request, *args, **kwargs):
+        status_code, data = await aget_posts(
+            fields=request.query_params.get('fields'),
+            user=request.user,
+        )
+        return Response(
+            status=status_code,
+            data=data,
+        )
+
+    async def post(self, request, *args, **kwargs):
+        user = request.user
+        status_code, data = await sync_to_async(add)(
+            user=user,
+            data=request.data,
+        )
+        return Response(
+            status=status_code,
+            data=data,
+        )
+
+
+class AsyncPostUserView(AsyncAPIView):
+    permission_classes = [IsAuthenticated]
+
+    async def get(self, request, pk, *args, **kwargs):
+        user = request.user
+        status_code, data = await aget_posts_by_pk(
+            pk=pk,
+            user=user,
+            fields=request.query_params.get('fields'),
+        )
+        return Response(
+            status=status_code,
+            data=data,
+        )
+
+
+class AsyncPostDetailView(AsyncAPIView):
+    permission_classes = [IsAuthenticated]
+
+    async def get(self, request, slug, *args, **kwargs):
+        user = request.user
+        status_code, data = await adetail(
+            slug=slug,
+            user=user,
+            fields=request.query_params.get('fields'),
+        )
+        return Response(
+            status=status_code,
+            data=data,
+        )
+
+    async def patch(self, request, slug, *args, **kwargs):
+        user = request.user
+        status_code, data = await sync_to_async(update)(
+            slug=slug,
+            user=user,
+            data=request.data,
+        )
+        return Response(
+            status=status_code,
+            data=data,
+        )
+
+    async def delete(self, request, slug, *args, **kwargs):
+        user = request.user
+        status_code, data = await sync_to_async(remove)(
+            slug=slug,
+            user=user,
+        )
+        return Response(
+            status=status_code,
+            data=data,
+        )
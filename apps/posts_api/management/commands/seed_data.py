@@ -0,0 +1,395 @@
+import io
+import multiprocessing
+import os
+import random
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import (
+    datetime,
+    timedelta,
+    timezone,
+)
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from posts_api.models import Post
+from users_api.models import CustomUser
+
+
+USER_FIELDS = (
+    'email',
+    'password',
+    'avatar',
+    'thumbnail',
+    'is_superuser',
+    'is_staff',
+    'is_active',
+    'email_confirmed',
+    'date_joined',
+)
+POST_FIELDS = (
+    'author_id',
+    'title',
+    'description',
+    'image',
+    'hidden',
+    'slug',
+    'created_at',
+)
+
+WORDS = (
+    'город', 'утро', 'кофе', 'поездка', 'книга', 'музыка', 'проект', 'код', 'горы', 'море',
+    'фильм', 'спорт', 'работа', 'осень', 'весна', 'друзья', 'рецепт', 'новость', 'идея', 'отпуск',
+)
+
+COPY_ESCAPES = str.maketrans({
+    '\\': '\\\\',
+    '\t': '\\t',
+    '\n': '\\n',
+    '\r': '\\r',
+})
+
+_author_ids = ()
+
+
+def init_worker(author_ids: tuple) -> None:
+    global _author_ids
+    _author_ids = author_ids
+
+
+NULL = '\\N'
+
+
+def to_copy_value(value) -> str:
+    if value is None:
+        return NULL
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value).translate(COPY_ESCAPES)
+
+
+def to_copy(rows: list) -> str:
+    '''
+    Формирование данных для COPY ... FROM STDIN в текстовом формате
+
+    Args:
+        rows: строки
+
+    Returns:
+        Текст
+    '''
+
+    return ''.join(
+        '\t'.join(map(to_copy_value, row)) + '\n'
+        for row in rows
+    )
+
+
+def get_created_at(rnd: random.Random, now: datetime, days: int) -> datetime:
+    # квадрат равномерного распределения сгущает даты к текущему моменту
+    return now - timedelta(seconds=days * 86400 * rnd.random() ** 2)
+
+
+def generate_users(task: dict) -> list | str:
+    '''
+    Генерация пачки пользователей
+
+    Args:
+        task: параметры пачки
+
+    Returns:
+        Список строк или текст для COPY
+    '''
+
+    rnd = random.Random(task['seed'])
+    now = task['now']
+    rows = [
+        (
+            f'{task["prefix"]}-{index}@example.com',
+            task['password'],
+            'avatars/default.jpeg',
+            'thumbnails/default.jpeg',
+            False,
+            False,
+            True,
+            rnd.random() < 0.8,
+            get_created_at(rnd, now, task['days']),
+        )
+        for index in range(task['start'], task['start'] + task['count'])
+    ]
+    return to_copy(rows) if task['copy'] else rows
+
+
+def get_text_pool(seed: int, size: int = 2000) -> tuple:
+    '''
+    Получение заголовков и предложений, из которых собираются тексты постов
+
+    Args:
+        seed: начальное значение генератора
+        size: количество заголовков и предложений
+
+    Returns:
+        Кортеж из списков заголовков и предложений
+    '''
+
+    rnd = random.Random(seed)
+    titles = [
+        ' '.join(rnd.choices(WORDS, k=rnd.randint(2, 6))).capitalize()
+        for _ in range(size)
+    ]
+    sentences = [
+        ' '.join(rnd.choices(WORDS, k=rnd.randint(4, 12))).capitalize() + '.'
+        for _ in range(size)
+    ]
+    return titles, sentences
+
+
+def generate_posts(task: dict) -> list | str:
+    '''
+    Генерация пачки постов с перекосом распределения по авторам:
+    небольшая доля авторов пишет большую часть постов
+
+    Args:
+        task: параметры пачки
+
+    Returns:
+        Список строк или текст для COPY
+    '''
+
+    rnd = random.Random(task['seed'])
+    now = task['now']
+    authors = len(_author_ids)
+    skew = task['skew']
+    hidden_ratio = task['hidden_ratio']
+    titles, sentences = get_text_pool(task['seed'])
+    rows = []
+    for _ in range(task['count']):
+        size = rnd.randint(0, 20)
+        rows.append((
+            _author_ids[int(authors * rnd.random() ** skew)],
+            rnd.choice(titles),
+            ' '.join(rnd.choices(sentences, k=size)) if size else None,
+            None,
+            rnd.random() < hidden_ratio,
+            str(uuid.uuid4()),
+            get_created_at(rnd, now, task['days']),
+        ))
+    if not task['copy']:
+        return rows
+    # тексты из пула не содержат символов, требующих экранирования в COPY
+    return ''.join(
+        f'{author_id}\t{title}\t{description or NULL}\t{NULL}\t'
+        f'{"t" if hidden else "f"}\t{slug}\t{created_at.isoformat()}\n'
+        for author_id, title, description, _, hidden, slug, created_at in rows
+    )
+
+
+@contextmanager
+def keep_field_values(model):
+    '''
+    Отключение auto_now_add, чтобы bulk_create сохранил сгенерированные даты
+
+    Args:
+        model: модель
+
+    Returns:
+        Контекстный менеджер
+    '''
+
+    fields = [
+        field for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now_add', False)
+    ]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+class Command(BaseCommand):
+    help = 'Генерация пользователей и постов для нагрузочного тестирования'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users',
+            type=int,
+            default=10000,
+        )
+        parser.add_argument(
+            '--posts',
+            type=int,
+            default=100000,
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=10000,
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Количество процессов генерации, 1 - генерация в текущем процессе',
+        )
+        parser.add_argument(
+            '--hidden-ratio',
+            type=float,
+            default=0.1,
+            help='Доля скрытых постов',
+        )
+        parser.add_argument(
+            '--skew',
+            type=float,
+            default=3,
+            help='Перекос распределения постов по авторам, 1 - равномерно',
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=365,
+            help='Период дат создания в днях',
+        )
+        parser.add_argument(
+            '--password',
+            default='test123',
+            help='Пароль всех пользователей',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=None,
+        )
+
+    def handle(self, *args, **options):
+        self.use_copy = connection.vendor == 'postgresql'
+        self.batch_size = options['batch_size']
+        self.workers = max(options['workers'], 1)
+        seed = options['seed']
+        if seed is None:
+            seed = random.SystemRandom().getrandbits(32)
+        common = {
+            'now': datetime.now(tz=timezone.utc),
+            'days': options['days'],
+            'copy': self.use_copy,
+        }
+
+        prefix = f'seed-{seed:x}-{uuid.uuid4().hex[:6]}'
+        users_task = dict(
+            common,
+            prefix=prefix,
+            password=make_password(options['password']),
+        )
+        self.insert(
+            model=CustomUser,
+            fields=USER_FIELDS,
+            func=generate_users,
+            tasks=self.get_tasks(options['users'], seed, users_task),
+        )
+
+        author_ids = tuple(
+            CustomUser.objects.filter(
+                email__startswith=f'{prefix}-',
+            ).order_by('pk').values_list('pk', flat=True)
+        )
+        if not author_ids:
+            return
+        posts_task = dict(
+            common,
+            hidden_ratio=options['hidden_ratio'],
+            skew=options['skew'],
+        )
+        self.insert(
+            model=Post,
+            fields=POST_FIELDS,
+            func=generate_posts,
+            tasks=self.get_tasks(options['posts'], seed + 1, posts_task),
+            author_ids=author_ids,
+        )
+
+        if self.use_copy:
+            with connection.cursor() as cursor:
+                cursor.execute(f'ANALYZE {CustomUser._meta.db_table}, {Post._meta.db_table}')
+
+    def get_tasks(self, total: int, seed: int, params: dict) -> list:
+        return [
+            dict(
+                params,
+                start=start,
+                count=min(self.batch_size, total - start),
+                seed=seed * 1000003 + start,
+            )
+            for start in range(0, total, self.batch_size)
+        ]
+
+    def insert(self, model, fields: tuple, func, tasks: list, author_ids: tuple = ()) -> None:
+        '''
+        Генерация пачек в процессах и запись в базу данных по мере готовности
+
+        Args:
+            model: модель
+            fields: поля строк
+            func: функция генерации пачки
+            tasks: параметры пачек
+            author_ids: идентификаторы авторов для генерации постов
+
+        Returns:
+            None
+        '''
+
+        total = sum(task['count'] for task in tasks)
+        if not total:
+            return
+        start = time.perf_counter()
+        if self.workers > 1:
+            pool = multiprocessing.Pool(
+                processes=self.workers,
+                initializer=init_worker,
+                initargs=(author_ids,),
+            )
+            batches = pool.imap(func, tasks)
+        else:
+            pool = None
+            init_worker(author_ids)
+            batches = map(func, tasks)
+
+        try:
+            with keep_field_values(model):
+                for batch in batches:
+                    if self.use_copy:
+                        self.copy(model, fields, batch)
+                    else:
+                        model.objects.bulk_create(
+                            [model(**dict(zip(fields, row))) for row in batch],
+                            batch_size=1000,
+                        )
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+
+        duration = time.perf_counter() - start
+        self.stdout.write(
+            f'{model._meta.verbose_name_plural}: {total} за {duration:.1f} с '
+            f'({total / duration:.0f} строк/с)'
+        )
+
+    def copy(self, model, fields: tuple, data: str) -> None:
+        columns = ', '.join(
+            connection.ops.quote_name(model._meta.get_field(name).column)
+            for name in fields
+        )
+        sql = f'COPY {connection.ops.quote_name(model._meta.db_table)} ({columns}) FROM STDIN'
+        with connection.cursor() as cursor:
+            if hasattr(cursor.cursor, 'copy_expert'):
+                cursor.cursor.copy_expert(sql, io.StringIO(data))
+            else:
+                with cursor.cursor.copy(sql) as copy:
+                    copy.write(data)
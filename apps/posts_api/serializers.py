@@ -8,9 +8,22 @@ from posts_api.models import Post
 User = get_user_model()
 
 
-class PostSerializer(serializers.ModelSerializer):
+class FieldsMixin:
+    '''
+    Ограничение полей сериализатора аргументом fields
+    '''
+
+    def __init__(self, *args, fields: list | None = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+class PostSerializer(FieldsMixin, serializers.ModelSerializer):
+    # author_id вместо author.pk, чтобы для поля не загружался автор
     author_pk = serializers.CharField(
-        source='author.pk',
+        source='author_id',
         read_only=True,
     )
     author_nickname = serializers.SerializerMethodField(
@@ -61,6 +74,13 @@ class PostsSerializer(serializers.ModelSerializer):
 
 
 class AuthorPostSerializer(serializers.ModelSerializer):
+    def __init__(self, *args, post_fields: list | None = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if post_fields is not None:
+            posts = self.fields['posts'].child
+            for name in set(posts.fields) - set(post_fields):
+                posts.fields.pop(name)
+
     nickname = serializers.SerializerMethodField(
         read_only=True,
     )
@@ -1,37 +1,203 @@
+import logging
+
 from django.db.models import (
     Q,
     Prefetch,
 )
 from django.http.request import QueryDict
 
+from monitoring.timing import (
+    stage,
+    timed,
+)
 from posts_api.models import Post
 from posts_api.serializers import (
     PostSerializer,
+    PostsSerializer,
     AuthorPostSerializer,
 )
 
 from users_api.models import CustomUser
 
+from utils.db_router import (
+    ause_replica,
+    use_replica,
+)
 from utils.response_patterns import generate_response
-from utils.logger import get_logger
+from utils.logger import (
+    get_logger,
+    lazy_message,
+)
 
 logger = get_logger(__name__)
 
+# колонки, которые нужны полям сериализаторов постов
+POST_FIELD_COLUMNS = {
+    'author_pk': 'author_id',
+    'author_nickname': 'author__email',
+    'title': 'title',
+    'description': 'description',
+    'image': 'image',
+    'hidden': 'hidden',
+    'slug': 'slug',
+    'created_at': 'created_at',
+}
+
+
+def parse_fields(fields: str | None, allowed: list) -> list | None:
+    '''
+    Разбор параметра fields со списком полей через запятую
+
+    Args:
+        fields: значение параметра
+        allowed: допустимые поля
+
+    Returns:
+        Список полей или None, если параметр не передан
+
+    Raises:
+        ValueError: недопустимые поля
+    '''
+
+    if not fields:
+        return None
+    fields = [name.strip() for name in fields.split(',') if name.strip()]
+    unknown = set(fields) - set(allowed)
+    if unknown:
+        raise ValueError(f'Недопустимые поля: {", ".join(sorted(unknown))}')
+    return fields
+
+
+def only_fields(queryset, fields: list | None):
+    '''
+    Ограничение колонок запроса постов полями сериализатора
+
+    Args:
+        queryset: запрос постов
+        fields: поля или None для всех полей
+
+    Returns:
+        Запрос
+    '''
+
+    if fields is None:
+        return queryset.select_related(
+            'author',
+        )
+    columns = [POST_FIELD_COLUMNS[name] for name in fields]
+    if 'author__email' in columns:
+        queryset = queryset.select_related(
+            'author',
+        )
+    return queryset.only(*columns)
+
+
+def parse_request_fields(fields: str | None, allowed: list, target: str) -> (int, list | None):
+    '''
+    Разбор параметра fields запроса с записью ошибки в лог
+
+    Args:
+        fields: поля через запятую
+        allowed: допустимые поля
+        target: описание запрашиваемых данных для лога
+
+    Returns:
+        Кортеж из статуса и списка полей или None
+    '''
+
+    try:
+        fields = parse_fields(
+            fields=fields,
+            allowed=allowed,
+        )
+    except ValueError as exc:
+        logger.error(
+            msg=f'Невалидные поля для получения {target}: {exc}',
+        )
+        return 400, None
+    return 200, fields
+
+
+def build_posts_queryset(fields: list | None):
+    '''
+    Запрос постов основной ленты
+
+    Args:
+        fields: поля постов или None для всех полей
+
+    Returns:
+        Запрос
+    '''
+
+    return only_fields(
+        queryset=Post.objects.filter(
+            hidden=False,
+        ),
+        fields=fields,
+    )
+
+
+def posts_response(posts, fields: list | None) -> (int, dict):
+    '''
+    Сериализация постов основной ленты
+
+    Args:
+        posts: посты
+        fields: поля постов или None для всех полей
+
+    Returns:
+        Кортеж из статуса и словаря данных
+    '''
+
+    with stage('serialize'):
+        data = PostSerializer(
+            instance=posts,
+            many=True,
+            fields=fields,
+        ).data
+    logger.info(
+        msg=lazy_message(
+            logger,
+            logging.INFO,
+            'Список всех постов получен: {data}',
+            data=data,
+        ),
+    )
+    return generate_response(
+        status_code=200,
+        data=data,
+    )
 
-def get_posts() -> (int, dict):
+
+@timed()
+def get_posts(fields: str | None = None, user: CustomUser | None = None) -> (int, dict):
     '''
     Получение списка всех постов
 
+    Args:
+        fields: поля постов через запятую, по умолчанию все
+        user: пользователь, для выбора базы данных чтения
+
     Returns:
         Кортеж из статуса и словаря данных
     '''
 
     logger.info(
-        msg='Получение списка всех постов',
+        msg=f'Получение списка всех постов с полями {fields}',
     )
+    status_code, fields = parse_request_fields(
+        fields=fields,
+        allowed=PostSerializer.Meta.fields,
+        target='списка всех постов',
+    )
+    if status_code != 200:
+        return generate_response(
+            status_code=status_code,
+        )
+
     try:
-        posts = Post.objects.filter(
-            hidden=False,
+        posts = build_posts_queryset(
+            fields=fields,
         )
     except Exception as exc:
         logger.error(
@@ -42,19 +208,63 @@ def get_posts() -> (int, dict):
             status_code=500,
         )
 
-    data = PostSerializer(
-        instance=posts,
-        many=True,
-    ).data
+    # запрос выполняется при сериализации
+    with use_replica(user=user):
+        return posts_response(
+            posts=posts,
+            fields=fields,
+        )
+
+
+@timed()
+async def aget_posts(fields: str | None = None, user: CustomUser | None = None) -> (int, dict):
+    '''
+    Асинхронное получение списка всех постов
+
+    Args:
+        fields: поля постов через запятую, по умолчанию все
+        user: пользователь, для выбора базы данных чтения
+
+    Returns:
+        Кортеж из статуса и словаря данных
+    '''
+
     logger.info(
-        msg=f'Список всех постов получен: {data}'
+        msg=f'Получение списка всех постов с полями {fields}',
     )
-    return generate_response(
-        status_code=200,
-        data=data,
+    status_code, fields = parse_request_fields(
+        fields=fields,
+        allowed=PostSerializer.Meta.fields,
+        target='списка всех постов',
+    )
+    if status_code != 200:
+        return generate_response(
+            status_code=status_code,
+        )
+
+    try:
+        async with ause_replica(user=user):
+            posts = [
+                post async for post in build_posts_queryset(
+                    fields=fields,
+                ).aiterator()
+            ]
+    except Exception as exc:
+        logger.error(
+            msg='Возникла ошибка при попытке получить список всех постов',
+            exc_info=True,
+        )
+        return generate_response(
+            status_code=500,
+        )
+
+    return posts_response(
+        posts=posts,
+        fields=fields,
     )
 
 
+@timed()
 def add(user: CustomUser, data: QueryDict) -> (int, dict):
     '''
     Создание поста
@@ -68,15 +278,26 @@ def add(user: CustomUser, data: QueryDict) -> (int, dict):
     '''
 
     logger.info(
-        msg=f'Создание поста пользователем {user}: {data}',
+        msg=lazy_message(
+            logger,
+            logging.INFO,
+            'Создание поста пользователем {user}: {data}',
+            user=user,
+            data=data,
+        ),
     )
     serializer = PostSerializer(
         data=data,
     )
     if not serializer.is_valid():
         logger.error(
-            msg=f'Невалидные данные для создания поста\
-            пользователем {user}: {serializer.errors}',
+            msg=lazy_message(
+                logger,
+                logging.ERROR,
+                'Невалидные данные для создания поста пользователем {user}: {errors}',
+                user=user,
+                errors=serializer.errors,
+            ),
         )
         return generate_response(
             status_code=400,
@@ -90,8 +311,13 @@ def add(user: CustomUser, data: QueryDict) -> (int, dict):
         )
     except Exception as exc:
         logger.error(
-            msg=f'Возникла ошибка при попытке создании поста\
-                    пользователем {user}: {validated_data}',
+            msg=lazy_message(
+                logger,
+                logging.ERROR,
+                'Возникла ошибка при попытке создании поста пользователем {user}: {data}',
+                user=user,
+                data=validated_data,
+            ),
             exc_info=True,
         )
         return generate_response(
@@ -106,13 +332,61 @@ def add(user: CustomUser, data: QueryDict) -> (int, dict):
     )
 
 
-def get_post(slug: str, user: CustomUser) -> (int, Post | None):
+def build_post_queryset(slug: str, user: CustomUser, fields: list | None):
+    '''
+    Запрос поста по slug: своего или не скрытого
+
+    Args:
+        slug: слаг
+        user: пользователь
+        fields: поля поста или None для всех полей
+
+    Returns:
+        Запрос
+    '''
+
+    return only_fields(
+        queryset=Post.objects.filter(
+            Q(author=user) & Q(slug=slug) | Q(slug=slug) & Q(hidden=False)
+        ),
+        fields=fields,
+    )
+
+
+def check_post(post: Post | None, slug: str, user: CustomUser) -> (int, Post | None):
+    '''
+    Проверка результата поиска поста по slug
+
+    Args:
+        post: найденный пост или None
+        slug: слаг
+        user: пользователь
+
+    Returns:
+        Кортеж из статуса и объекта Post
+    '''
+
+    if post is None:
+        logger.error(
+            msg=f'Пост со слагом {slug} не найден пользователем {user}',
+        )
+        return 404, None
+
+    logger.info(
+        msg=f'Пост со слагом {slug} успешно найден пользователем {user}',
+    )
+    return 200, post
+
+
+@timed()
+def get_post(slug: str, user: CustomUser, fields: list | None = None) -> (int, Post | None):
     '''
     Получение поста по slug
 
     Args:
         slug: слаг
         user: пользователь
+        fields: поля поста для загрузки, по умолчанию все
 
     Returns:
         Кортеж из статуса и объекта Post
@@ -122,8 +396,10 @@ def get_post(slug: str, user: CustomUser) -> (int, Post | None):
         msg=f'Поиск поста по слагу {slug} пользователем {user}',
     )
     try:
-        post = Post.objects.filter(
-            Q(author=user) & Q(slug=slug) | Q(slug=slug) & Q(hidden=False)
+        post = build_post_queryset(
+            slug=slug,
+            user=user,
+            fields=fields,
         ).first()
     except Exception as exc:
         logger.error(
@@ -132,55 +408,179 @@ def get_post(slug: str, user: CustomUser) -> (int, Post | None):
         )
         return 500, None
 
-    if post is None:
+    return check_post(
+        post=post,
+        slug=slug,
+        user=user,
+    )
+
+
+@timed()
+async def aget_post(slug: str, user: CustomUser, fields: list | None = None) -> (int, Post | None):
+    '''
+    Асинхронное получение поста по slug
+
+    Args:
+        slug: слаг
+        user: пользователь
+        fields: поля поста для загрузки, по умолчанию все
+
+    Returns:
+        Кортеж из статуса и объекта Post
+    '''
+
+    logger.info(
+        msg=f'Поиск поста по слагу {slug} пользователем {user}',
+    )
+    try:
+        post = await build_post_queryset(
+            slug=slug,
+            user=user,
+            fields=fields,
+        ).afirst()
+    except Exception as exc:
         logger.error(
-            msg=f'Пост со слагом {slug} не найден пользователем {user}',
+            msg=f'Возникла ошибка при поиcке поста по слагу {slug} пользователем {user}',
+            exc_info=True,
         )
-        return 404, None
+        return 500, None
+
+    return check_post(
+        post=post,
+        slug=slug,
+        user=user,
+    )
+
+
+def post_response(post: Post, slug: str, user: CustomUser, fields: list | None) -> (int, dict):
+    '''
+    Сериализация данных поста
+
+    Args:
+        post: пост
+        slug: слаг
+        user: пользователь
+        fields: поля поста или None для всех полей
+
+    Returns:
+        Кортеж из статуса и словаря данных
+    '''
 
+    serializer = PostSerializer(
+        instance=post,
+        fields=fields,
+    )
+    with stage('serialize'):
+        data = serializer.data
     logger.info(
-        msg=f'Пост со слагом {slug} успешно найден пользователем {user}',
+        msg=lazy_message(
+            logger,
+            logging.INFO,
+            'Данные поста с слагом {slug} успешно получены: {data} пользователем {user}',
+            slug=slug,
+            data=data,
+            user=user,
+        ),
+    )
+    return generate_response(
+        status_code=200,
+        data=data,
     )
-    return 200, post
 
 
-def detail(slug: str, user: CustomUser) -> (int, dict):
+@timed()
+def detail(slug: str, user: CustomUser, fields: str | None = None) -> (int, dict):
     '''
     Получение данных поста по slug
 
     Args:
         slug: слаг
         user: пользователь
+        fields: поля поста через запятую, по умолчанию все
 
     Returns:
         Кортеж из статуса и словаря данных
     '''
 
     logger.info(
-        msg=f'Получение данных поста с слагом {slug} пользователем {user}',
+        msg=f'Получение данных поста с слагом {slug} и полями {fields} пользователем {user}',
     )
-    status_code, post = get_post(
-        slug=slug,
-        user=user,
+    status_code, fields = parse_request_fields(
+        fields=fields,
+        allowed=PostSerializer.Meta.fields,
+        target=f'данных поста с слагом {slug}',
     )
     if status_code != 200:
         return generate_response(
             status_code=status_code,
         )
 
-    serializer = PostSerializer(
-        instance=post,
+    with use_replica(user=user):
+        status_code, post = get_post(
+            slug=slug,
+            user=user,
+            fields=fields,
+        )
+    if status_code != 200:
+        return generate_response(
+            status_code=status_code,
+        )
+
+    return post_response(
+        post=post,
+        slug=slug,
+        user=user,
+        fields=fields,
     )
-    data = serializer.data
+
+
+@timed()
+async def adetail(slug: str, user: CustomUser, fields: str | None = None) -> (int, dict):
+    '''
+    Асинхронное получение данных поста по slug
+
+    Args:
+        slug: слаг
+        user: пользователь
+        fields: поля поста через запятую, по умолчанию все
+
+    Returns:
+        Кортеж из статуса и словаря данных
+    '''
+
     logger.info(
-        msg=f'Данные поста с слагом {slug} успешно получены: {data} пользователем {user}',
+        msg=f'Получение данных поста с слагом {slug} и полями {fields} пользователем {user}',
     )
-    return generate_response(
-        status_code=200,
-        data=data,
+    status_code, fields = parse_request_fields(
+        fields=fields,
+        allowed=PostSerializer.Meta.fields,
+        target=f'данных поста с слагом {slug}',
+    )
+    if status_code != 200:
+        return generate_response(
+            status_code=status_code,
+        )
+
+    async with ause_replica(user=user):
+        status_code, post = await aget_post(
+            slug=slug,
+            user=user,
+            fields=fields,
+        )
+    if status_code != 200:
+        return generate_response(
+            status_code=status_code,
+        )
+
+    return post_response(
+        post=post,
+        slug=slug,
+        user=user,
+        fields=fields,
     )
 
 
+@timed()
 def update(slug: str, user: CustomUser, data: QueryDict) -> (int, dict):
     '''
     Обновление поста по slug
@@ -195,7 +595,14 @@ def update(slug: str, user: CustomUser, data: QueryDict) -> (int, dict):
     '''
 
     logger.info(
-        msg=f'Обновление поста по слагу {slug} пользователем {user} c данными: {data}'
+        msg=lazy_message(
+            logger,
+            logging.INFO,
+            'Обновление поста по слагу {slug} пользователем {user} c данными: {data}',
+            slug=slug,
+            user=user,
+            data=data,
+        ),
     )
     status_code, post = get_post(
         slug=slug,
@@ -208,7 +615,14 @@ def update(slug: str, user: CustomUser, data: QueryDict) -> (int, dict):
 
     if post.author != user:
         logger.error(
-            msg=f'Обновление поста {post} пользователем {user} c данными {data} не доступно'
+            msg=lazy_message(
+                logger,
+                logging.ERROR,
+                'Обновление поста {post} пользователем {user} c данными {data} не доступно',
+                post=post,
+                user=user,
+                data=data,
+            ),
         )
         return generate_response(
             status_code=403,
@@ -220,8 +634,14 @@ def update(slug: str, user: CustomUser, data: QueryDict) -> (int, dict):
     )
     if not serializer.is_valid():
         logger.error(
-            msg=f'Невалидные данные для обновления \
-            поста {post} пользователем {user}: {serializer.errors}',
+            msg=lazy_message(
+                logger,
+                logging.ERROR,
+                'Невалидные данные для обновления поста {post} пользователем {user}: {errors}',
+                post=post,
+                user=user,
+                errors=serializer.errors,
+            ),
         )
         return generate_response(
             status_code=400,
@@ -235,8 +655,15 @@ def update(slug: str, user: CustomUser, data: QueryDict) -> (int, dict):
         )
     except Exception as exc:
         logger.error(
-            msg=f'Возникла ошибка при попытке обновления поста {post} \
-            пользователем {user} данными {validated_data}',
+            msg=lazy_message(
+                logger,
+                logging.ERROR,
+                'Возникла ошибка при попытке обновления поста {post} пользователем {user} '
+                'данными {data}',
+                post=post,
+                user=user,
+                data=validated_data,
+            ),
             exc_info=True,
         )
         return generate_response(
@@ -253,6 +680,7 @@ def update(slug: str, user: CustomUser, data: QueryDict) -> (int, dict):
     )
 
 
+@timed()
 def remove(slug: str, user: CustomUser) -> (int, dict):
     '''
     Удаление поста по slug
@@ -306,28 +734,111 @@ def remove(slug: str, user: CustomUser) -> (int, dict):
     )
 
 
-def get_posts_by_pk(pk: int, user: CustomUser) -> (int, dict):
+def build_author_queryset(pk: int, user: CustomUser, fields: list | None):
+    '''
+    Запрос автора с его постами: всеми для самого автора, не скрытыми для остальных
+
+    Args:
+        pk: идентификатор автора
+        user: пользователь
+        fields: поля постов или None для всех полей
+
+    Returns:
+        Запрос
+    '''
+
+    posts = Post.objects.filter(
+        Q(author=user) & Q(author__pk=pk) | Q(author__pk=pk) & Q(hidden=False)
+    )
+    if fields is not None:
+        # author_id нужен для распределения постов по автору
+        posts = posts.only('author_id', *fields)
+    return CustomUser.objects.filter(
+        pk=pk,
+    ).prefetch_related(
+        Prefetch('posts', queryset=posts),
+    )
+
+
+def author_posts_response(author: CustomUser | None, pk: int, user: CustomUser,
+                          fields: list | None) -> (int, dict):
+    '''
+    Сериализация постов автора
+
+    Args:
+        author: автор с загруженными постами или None
+        pk: идентификатор автора
+        user: пользователь
+        fields: поля постов или None для всех полей
+
+    Returns:
+        Кортеж из статуса и словаря данных
+    '''
+
+    if author is None:
+        logger.error(
+            msg=f'Автор с pk {pk} не найден пользователем {user}',
+        )
+        return generate_response(
+            status_code=404,
+        )
+
+    with stage('serialize'):
+        data = AuthorPostSerializer(
+            instance=author,
+            post_fields=fields,
+        ).data
+
+    logger.info(
+        msg=lazy_message(
+            logger,
+            logging.INFO,
+            'Список постов автора с pk {pk} пользователем {user} получен: {data}',
+            pk=pk,
+            user=user,
+            data=data,
+        ),
+    )
+    return generate_response(
+        status_code=200,
+        data=data,
+    )
+
+
+@timed()
+def get_posts_by_pk(pk: int, user: CustomUser, fields: str | None = None) -> (int, dict):
     '''
     Получение постов пользователя по pk
 
     Args:
         pk: идентификатор пользователя
         user: пользователь
+        fields: поля постов через запятую, по умолчанию все
 
     Returns:
         Кортеж из статуса и словаря данных
     '''
 
     logger.info(
-        msg=f'Получение списка постов автора с pk {pk} пользователем {user}',
+        msg=f'Получение списка постов автора с pk {pk} и полями {fields} пользователем {user}',
+    )
+    status_code, fields = parse_request_fields(
+        fields=fields,
+        allowed=PostsSerializer.Meta.fields,
+        target=f'списка постов автора с pk {pk}',
     )
+    if status_code != 200:
+        return generate_response(
+            status_code=status_code,
+        )
+
     try:
-        author = CustomUser.objects.filter(
-            pk=pk,
-        ).prefetch_related(
-            Prefetch("posts", queryset=Post.objects.filter(
-                Q(author=user) & Q(author__pk=pk) | Q(author__pk=pk) & Q(hidden=False)
-            ))).first()
+        with use_replica(user=user):
+            author = build_author_queryset(
+                pk=pk,
+                user=user,
+                fields=fields,
+            ).first()
     except Exception as exc:
         logger.error(
             msg=f'Возникла ошибка при проверке существования автора '
@@ -338,22 +849,61 @@ def get_posts_by_pk(pk: int, user: CustomUser) -> (int, dict):
             status_code=500,
         )
 
-    if author is None:
+    return author_posts_response(
+        author=author,
+        pk=pk,
+        user=user,
+        fields=fields,
+    )
+
+
+@timed()
+async def aget_posts_by_pk(pk: int, user: CustomUser, fields: str | None = None) -> (int, dict):
+    '''
+    Асинхронное получение постов пользователя по pk
+
+    Args:
+        pk: идентификатор пользователя
+        user: пользователь
+        fields: поля постов через запятую, по умолчанию все
+
+    Returns:
+        Кортеж из статуса и словаря данных
+    '''
+
+    logger.info(
+        msg=f'Получение списка постов автора с pk {pk} и полями {fields} пользователем {user}',
+    )
+    status_code, fields = parse_request_fields(
+        fields=fields,
+        allowed=PostsSerializer.Meta.fields,
+        target=f'списка постов автора с pk {pk}',
+    )
+    if status_code != 200:
+        return generate_response(
+            status_code=status_code,
+        )
+
+    try:
+        async with ause_replica(user=user):
+            author = await build_author_queryset(
+                pk=pk,
+                user=user,
+                fields=fields,
+            ).afirst()
+    except Exception as exc:
         logger.error(
-            msg=f'Автор с pk {pk} не найден пользователем {user}',
+            msg=f'Возникла ошибка при проверке существования автора '
+                f'с pk {pk} пользователем {user}',
+            exc_info=True,
         )
         return generate_response(
-            status_code=404,
+            status_code=500,
         )
 
-    data = AuthorPostSerializer(
-        instance=author,
-    ).data
-
-    logger.info(
-        msg=f'Список постов автора с pk {pk} пользователем {user} получен: {data}',
-    )
-    return generate_response(
-        status_code=200,
-        data=data,
+    return author_posts_response(
+        author=author,
+        pk=pk,
+        user=user,
+        fields=fields,
     )
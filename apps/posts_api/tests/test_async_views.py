@@ -0,0 +1,89 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.test import (
+    AsyncRequestFactory,
+    TestCase,
+)
+from django.urls import (
+    resolve,
+    reverse,
+)
+from django.utils import timezone
+
+from posts_api.api import (
+    AsyncPostDetailView,
+    AsyncPostListView,
+    AsyncPostUserView,
+)
+from posts_api.models import Post
+from users_api.models import CustomToken
+
+
+User = get_user_model()
+
+
+class AsyncViewsTest(TestCase):
+    fixtures = ['users.json', 'posts.json']
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.get(email='test1@cc.com')
+        cls.token = CustomToken.objects.create(user=cls.user)
+        cls.slug = '7db5e68f-d5fa-4d68-bc77-37a7cd9d4f65'
+
+    def setUp(self):
+        self.factory = AsyncRequestFactory()
+
+    async def call(self, view, method: str, path: str, token: str | None = None,
+                   data: dict | None = None, **kwargs):
+        headers = {}
+        if token is not None:
+            headers['Authorization'] = f'Token {token}'
+        request = getattr(self.factory, method)(path, data=data, headers=headers)
+        request.resolver_match = resolve(path)
+        return await view.as_view()(request, **kwargs)
+
+    async def test_get(self):
+        fixtures = (
+            (200, AsyncPostListView, reverse('posts'), {}),
+            (200, AsyncPostDetailView, reverse('post', args=[self.slug]), {'slug': self.slug}),
+            (200, AsyncPostUserView, reverse('author_posts', args=[1]), {'pk': 1}),
+            (404, AsyncPostDetailView, reverse('post', args=['unknown']), {'slug': 'unknown'}),
+        )
+
+        for code, view, path, kwargs in fixtures:
+            response = await self.call(view, 'get', path, token=self.token.key, **kwargs)
+
+            self.assertEqual(response.status_code, code, msg=path)
+
+    async def test_authentication(self):
+        path = reverse('post', args=[self.slug])
+        expired = await CustomToken.objects.acreate(
+            user=await User.objects.aget(email='test2@cc.com'),
+            expires_at=timezone.now() - timedelta(days=1),
+        )
+        fixtures = (
+            (403, None),
+            (403, 'invalid'),
+            (403, expired.key),
+            (200, self.token.key),
+        )
+
+        for code, token in fixtures:
+            response = await self.call(AsyncPostDetailView, 'get', path, token=token, slug=self.slug)
+
+            self.assertEqual(response.status_code, code, msg=token)
+        self.assertFalse(await CustomToken.objects.filter(key=expired.key).aexists())
+
+    async def test_post(self):
+        response = await self.call(
+            AsyncPostListView,
+            'post',
+            reverse('posts'),
+            token=self.token.key,
+            data={'title': 'Асинхронный пост'},
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(await Post.objects.filter(title='Асинхронный пост').aexists())
@@ -0,0 +1,135 @@
+import gzip
+import zlib
+
+from django.http import (
+    HttpResponse,
+    StreamingHttpResponse,
+)
+from django.test import (
+    RequestFactory,
+    SimpleTestCase,
+    TestCase,
+    override_settings,
+)
+from django.urls import reverse
+
+from unittest import skipUnless
+from unittest.mock import patch
+
+from utils.compression import (
+    CompressionMiddleware,
+    GzipCompressor,
+    brotli,
+    choose_encoding,
+    zstandard,
+)
+
+
+@override_settings(
+    COMPRESSION_ENABLED=True,
+    COMPRESSION_MIN_SIZE=100,
+)
+class CompressionMiddlewareTest(TestCase):
+    fixtures = ['users.json', 'posts.json']
+
+    def test_compress(self):
+        url = reverse('posts')
+        content = self.client.get(url).content
+
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(int(response['Content-Length']), len(response.content))
+        self.assertEqual(gzip.decompress(response.content), content)
+
+    @skipUnless(brotli, 'Требуется пакет brotli')
+    def test_compress_brotli(self):
+        url = reverse('posts')
+        content = self.client.get(url).content
+
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip, deflate, br')
+
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(brotli.decompress(response.content), content)
+
+    @skipUnless(zstandard, 'Требуется пакет zstandard')
+    def test_compress_zstd(self):
+        url = reverse('posts')
+        content = self.client.get(url).content
+
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip;q=0.5, zstd')
+
+        self.assertEqual(response['Content-Encoding'], 'zstd')
+        self.assertEqual(zstandard.ZstdDecompressor().decompress(response.content), content)
+
+    @override_settings(COMPRESSION_MIN_SIZE=100000)
+    def test_min_size(self):
+        response = self.client.get(reverse('posts'), HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_cached(self):
+        url = reverse('posts')
+
+        with patch.object(
+            GzipCompressor,
+            'compress',
+            autospec=True,
+            side_effect=GzipCompressor.compress,
+        ) as mock_compress:
+            first = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+            second = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertEqual(mock_compress.call_count, 1)
+        self.assertEqual(first.content, second.content)
+
+
+@override_settings(
+    COMPRESSION_ENABLED=True,
+    COMPRESSION_MIN_SIZE=100,
+)
+class CompressionTest(SimpleTestCase):
+    def setUp(self):
+        self.request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip')
+
+    def test_choose_encoding(self):
+        encodings = ['br', 'gzip']
+        fixtures = (
+            ('br', 'gzip, br'),
+            ('gzip', 'gzip'),
+            ('gzip', 'br;q=0.5, gzip'),
+            ('br', '*'),
+            (None, 'identity'),
+            (None, 'gzip;q=0, br;q=0'),
+            (None, ''),
+        )
+
+        for encoding, header in fixtures:
+            self.assertEqual(choose_encoding(header, encodings), encoding, msg=header)
+
+    def test_content_type(self):
+        for content_type in ('image/png', 'text/html; charset=utf-8'):
+            middleware = CompressionMiddleware(
+                lambda request: HttpResponse(b'\x00' * 1000, content_type=content_type),
+            )
+
+            response = middleware(self.request)
+
+            self.assertFalse(response.has_header('Content-Encoding'), msg=content_type)
+
+    def test_streaming(self):
+        chunks = [f'{{"chunk": {index}}}'.encode() * 100 for index in range(3)]
+        middleware = CompressionMiddleware(
+            lambda request: StreamingHttpResponse(iter(chunks), content_type='application/json'),
+        )
+
+        response = middleware(self.request)
+        compressed = list(response.streaming_content)
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertGreaterEqual(len(compressed), len(chunks))
+        decompressor = zlib.decompressobj(31)
+        # каждая часть распаковывается сразу, без ожидания конца потока
+        for chunk, part in zip(chunks, compressed):
+            self.assertEqual(decompressor.decompress(part), chunk)
@@ -0,0 +1,123 @@
+import threading
+
+from django.test import SimpleTestCase
+
+from utils.db_pool.pool import (
+    TRANSACTION_STATUS_IDLE,
+    ConnectionPool,
+    PoolTimeout,
+)
+
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def execute(self, sql):
+        if self.connection.broken:
+            raise Exception('server closed the connection unexpectedly')
+
+
+class FakeInfo:
+    transaction_status = TRANSACTION_STATUS_IDLE
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = False
+        self.broken = False
+        self.rolled_back = False
+        self.info = FakeInfo()
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def rollback(self):
+        self.rolled_back = True
+        self.info.transaction_status = TRANSACTION_STATUS_IDLE
+
+    def close(self):
+        self.closed = True
+
+
+class ConnectionPoolTest(SimpleTestCase):
+    def setUp(self):
+        self.pool = ConnectionPool(
+            alias='test',
+            max_size=2,
+            timeout=0.05,
+            check_interval=0,
+        )
+
+    def test_reuse(self):
+        connection = self.pool.acquire(connect=FakeConnection)
+        self.pool.release(connection)
+
+        self.assertIs(self.pool.acquire(connect=FakeConnection), connection)
+        self.assertEqual(self.pool.size, 1)
+        self.assertEqual(self.pool.in_use, 1)
+
+    def test_health_check(self):
+        connection = self.pool.acquire(connect=FakeConnection)
+        self.pool.release(connection)
+        connection.broken = True
+
+        new_connection = self.pool.acquire(connect=FakeConnection)
+
+        self.assertIsNot(new_connection, connection)
+        self.assertTrue(connection.closed)
+        self.assertEqual(self.pool.size, 1)
+
+    def test_rollback(self):
+        connection = self.pool.acquire(connect=FakeConnection)
+        connection.info.transaction_status = 2
+
+        self.pool.release(connection)
+
+        self.assertTrue(connection.rolled_back)
+        self.assertEqual(self.pool.in_use, 0)
+
+    def test_timeout(self):
+        self.pool.acquire(connect=FakeConnection)
+        self.pool.acquire(connect=FakeConnection)
+
+        with self.assertRaises(PoolTimeout):
+            self.pool.acquire(connect=FakeConnection)
+
+    def test_wait(self):
+        self.pool.timeout = 5
+        connections = [self.pool.acquire(connect=FakeConnection) for _ in range(2)]
+        timer = threading.Timer(0.01, self.pool.release, args=[connections[0]])
+        timer.start()
+
+        self.assertIs(self.pool.acquire(connect=FakeConnection), connections[0])
+        timer.join()
+
+    def test_connect_error(self):
+        def connect():
+            raise Exception('connection refused')
+
+        with self.assertRaises(Exception):
+            self.pool.acquire(connect=connect)
+
+        self.assertEqual(self.pool.size, 0)
+        self.assertEqual(self.pool.in_use, 0)
+
+    def test_close(self):
+        idle = self.pool.acquire(connect=FakeConnection)
+        busy = self.pool.acquire(connect=FakeConnection)
+        self.pool.release(idle)
+
+        self.pool.close()
+        self.assertTrue(idle.closed)
+        self.assertFalse(busy.closed)
+
+        self.pool.release(busy)
+        self.assertTrue(busy.closed)
+        self.assertEqual(self.pool.size, 0)
@@ -0,0 +1,152 @@
+import io
+import uuid
+from datetime import (
+    date,
+    datetime,
+    timedelta,
+    timezone,
+)
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase
+from django.urls import reverse
+from django.utils.translation import gettext_lazy
+
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase
+
+from unittest import skipUnless
+from unittest.mock import patch
+
+from users_api.models import CustomToken
+from utils.parsers import ORJSONParser
+from utils.renderers import (
+    ORJSONRenderer,
+    msgpack,
+)
+
+
+User = get_user_model()
+
+
+class RenderersTest(SimpleTestCase):
+    def test_render(self):
+        fixtures = (
+            None,
+            {},
+            {'message': 'Успешно', 'data': {}},
+            {'data': [{'title': 'Пост', 'hidden': False, 'image': None, 'rating': 4.5}]},
+            {'created_at': datetime(2024, 5, 1, 12, 30, 15, 123456, tzinfo=timezone.utc)},
+            {'created_at': datetime(2024, 5, 1, 12, 30, tzinfo=timezone(timedelta(hours=3)))},
+            {'date': date(2024, 5, 1), 'duration': timedelta(minutes=5)},
+            {'uuid': uuid.UUID('fc0ecf9c-4c37-4bb2-8c22-938a1dc65da4'), 'price': Decimal('1.50')},
+            {'message': gettext_lazy('Invalid token.')},
+            {1: 'int key', 'text': 'строка с разделителем \u2028'},
+            {'big': 2 ** 70},
+            ['a', ('b', 'c')],
+            {'values': [1e16, 1e-7, 1e-5, -2.5e-300, 1.5e15]},
+            {'price': Decimal('1E-7')},
+            {'text': 'время 12:30.5'},
+            0.5,
+        )
+
+        for data in fixtures:
+            self.assertEqual(
+                ORJSONRenderer().render(data),
+                JSONRenderer().render(data),
+                msg=data,
+            )
+
+    def test_render_non_finite(self):
+        for value in (float('nan'), float('inf'), float('-inf')):
+            with self.assertRaises(ValueError):
+                JSONRenderer().render({'rating': value})
+            with self.assertRaises(ValueError):
+                ORJSONRenderer().render({'rating': value, 'price': 1.5})
+            # без других дробных чисел orjson выводит null
+            self.assertEqual(ORJSONRenderer().render({'rating': value}), b'{"rating":null}')
+
+    def test_render_indent(self):
+        data = {'data': [1, 2]}
+
+        self.assertEqual(
+            ORJSONRenderer().render(data, 'application/json; indent=4'),
+            JSONRenderer().render(data, 'application/json; indent=4'),
+        )
+
+    @patch('utils.renderers.orjson', None)
+    def test_render_without_orjson(self):
+        data = {'message': 'Успешно', 'data': {}}
+
+        self.assertEqual(
+            ORJSONRenderer().render(data),
+            JSONRenderer().render(data),
+        )
+
+    def test_parse(self):
+        fixtures = (
+            b'{"email": "test@cc.com", "password": "test123"}',
+            '{"title": "Пост", "hidden": false, "rating": 4.5}'.encode(),
+            b'{"big": 1180591620717411303424}',
+        )
+
+        for body in fixtures:
+            self.assertEqual(
+                ORJSONParser().parse(io.BytesIO(body)),
+                JSONParser().parse(io.BytesIO(body)),
+                msg=body,
+            )
+
+    def test_parse_error(self):
+        for body in (b'{"email": ', b'{"value": NaN}'):
+            with self.assertRaises(ParseError) as orjson_error:
+                ORJSONParser().parse(io.BytesIO(body))
+            with self.assertRaises(ParseError) as json_error:
+                JSONParser().parse(io.BytesIO(body))
+
+            self.assertEqual(
+                str(orjson_error.exception),
+                str(json_error.exception),
+                msg=body,
+            )
+
+
+@skipUnless(settings.MSGPACK_ENABLED, 'Требуется пакет msgpack')
+class MessagePackTest(APITestCase):
+    fixtures = ['users.json', 'posts.json']
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.get(email='test1@cc.com')
+        cls.token = CustomToken.objects.create(user=cls.user)
+
+    def test_render(self):
+        url = reverse('posts')
+        json_response = self.client.get(url)
+        response = self.client.get(url, HTTP_ACCEPT='application/msgpack')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        self.assertEqual(msgpack.unpackb(response.content), json_response.json())
+
+    def test_parse(self):
+        fixtures = (
+            (200, msgpack.packb({'title': 'Пост', 'description': 'Описание'})),
+            (400, b'\xc1'),
+        )
+
+        for code, body in fixtures:
+            response = self.client.post(
+                reverse('posts'),
+                data=body,
+                content_type='application/msgpack',
+                HTTP_ACCEPT='application/msgpack',
+                HTTP_AUTHORIZATION=f'Token {self.token.key}',
+            )
+
+            self.assertEqual(response.status_code, code, msg=body)
+            self.assertEqual(response['Content-Type'], 'application/msgpack')
@@ -0,0 +1,124 @@
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections
+from django.test import (
+    SimpleTestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from unittest import skipUnless
+
+from posts_api.models import Post
+from users_api.models import CustomToken
+from utils.db_router import (
+    ReplicaRouter,
+    ReplicaStickinessMiddleware,
+    get_cache,
+    mark_written,
+    use_replica,
+)
+
+
+User = get_user_model()
+
+
+@override_settings(DATABASE_REPLICAS=['replica_0'])
+class ReplicaRouterTest(SimpleTestCase):
+    def setUp(self):
+        get_cache().clear()
+        self.router = ReplicaRouter()
+        self.user = User(pk=1, email='test1@cc.com')
+
+    def test_read(self):
+        self.assertEqual(self.router.db_for_read(Post), 'default')
+
+        with use_replica(user=self.user):
+            self.assertEqual(self.router.db_for_read(Post), 'replica_0')
+
+            with override_settings(DATABASE_REPLICAS=[]), use_replica():
+                self.assertEqual(self.router.db_for_read(Post), 'default')
+
+            self.assertEqual(self.router.db_for_read(Post), 'replica_0')
+
+        self.assertEqual(self.router.db_for_read(Post), 'default')
+
+    def test_write(self):
+        with use_replica(user=self.user):
+            self.assertEqual(self.router.db_for_write(Post), 'default')
+            # после записи чтение в том же запросе идет с основной базы
+            self.assertEqual(self.router.db_for_read(Post), 'default')
+
+    def test_sticky(self):
+        mark_written(self.user)
+
+        with use_replica(user=self.user):
+            self.assertEqual(self.router.db_for_read(Post), 'default')
+
+        with use_replica(user=User(pk=2, email='test2@cc.com')):
+            self.assertEqual(self.router.db_for_read(Post), 'replica_0')
+
+    def test_middleware_cache(self):
+        with override_settings(REPLICA_STICKY_CACHE='default'):
+            with self.assertRaises(ImproperlyConfigured):
+                ReplicaStickinessMiddleware(get_response=lambda request: None)
+
+        with tempfile.TemporaryDirectory() as directory:
+            with override_settings(
+                CACHES={
+                    'default': {
+                        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                    },
+                    'shared': {
+                        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                        'LOCATION': directory,
+                    },
+                },
+                REPLICA_STICKY_CACHE='shared',
+            ):
+                ReplicaStickinessMiddleware(get_response=lambda request: None)
+
+    def test_migrate(self):
+        self.assertTrue(self.router.allow_migrate('default', 'posts_api'))
+        self.assertFalse(self.router.allow_migrate('replica_0', 'posts_api'))
+
+
+@skipUnless(settings.DATABASE_REPLICAS, 'Требуются реплики в DB_REPLICA_HOSTS')
+class ReplicaTest(TransactionTestCase):
+    # реплика - отдельное подключение и видит только зафиксированные данные
+    databases = '__all__'
+    fixtures = ['users.json', 'posts.json']
+
+    def setUp(self):
+        get_cache().clear()
+        self.user = User.objects.get(email='test1@cc.com')
+        self.token = CustomToken.objects.create(user=self.user)
+        self.replica = connections[settings.DATABASE_REPLICAS[0]]
+
+    def test_read_your_writes(self):
+        headers = {'HTTP_AUTHORIZATION': f'Token {self.token.key}'}
+
+        with CaptureQueriesContext(self.replica) as context:
+            response = self.client.get(reverse('posts'), **headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(context.captured_queries), 1)
+
+        response = self.client.post(
+            reverse('posts'),
+            data={'title': 'Новый пост'},
+            **headers,
+        )
+        self.assertEqual(response.status_code, 200)
+
+        with CaptureQueriesContext(self.replica) as context:
+            response = self.client.get(reverse('posts'), **headers)
+        self.assertEqual(len(context.captured_queries), 0)
+        self.assertIn(
+            'Новый пост',
+            [post['title'] for post in response.json()['data']],
+        )
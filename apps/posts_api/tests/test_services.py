@@ -1,18 +1,25 @@
 import json
 import os
 
+from asgiref.sync import sync_to_async
 from django.contrib.auth import get_user_model
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
+from monitoring.nplusone import NPlusOneTestMixin
 from posts_api.services import (
     get_posts,
+    aget_posts,
     add,
     get_post,
     detail,
+    adetail,
     update,
     remove,
     get_posts_by_pk,
+    aget_posts_by_pk,
 )
 
 CUR_DIR = os.path.dirname(__file__)
@@ -21,7 +28,7 @@ CUR_DIR = os.path.dirname(__file__)
 User = get_user_model()
 
 
-class ServicesTest(TestCase):
+class ServicesTest(NPlusOneTestMixin, TestCase):
     fixtures = ['users.json', 'posts.json']
 
     @classmethod
@@ -179,3 +186,107 @@ class ServicesTest(TestCase):
             )
 
             self.assertEqual(status_code, code, msg=fixture)
+
+    def test_fields(self):
+        slug = '7db5e68f-d5fa-4d68-bc77-37a7cd9d4f65'
+        fixtures = (
+            (get_posts, {}, 'title,slug', ['title', 'slug']),
+            (get_posts, {}, 'author_nickname', ['author_nickname']),
+            (detail, {'slug': slug, 'user': self.user}, 'title,created_at', ['title', 'created_at']),
+            (get_posts_by_pk, {'pk': 1, 'user': self.user}, 'slug', ['slug']),
+        )
+
+        for func, kwargs, fields, expected in fixtures:
+            with CaptureQueriesContext(connection) as context:
+                status_code, response_data = func(
+                    fields=fields,
+                    **kwargs,
+                )
+
+            self.assertEqual(status_code, 200, msg=fields)
+            data = response_data['data']
+            if func is get_posts_by_pk:
+                data = data['posts']
+            items = data if isinstance(data, list) else [data]
+            self.assertTrue(items, msg=fields)
+            for item in items:
+                self.assertEqual(list(item), expected, msg=fields)
+            for query in context.captured_queries:
+                self.assertNotIn('"description"', query['sql'], msg=fields)
+
+    def test_fields_invalid(self):
+        fixtures = (
+            (get_posts, {}),
+            (detail, {'slug': '7db5e68f-d5fa-4d68-bc77-37a7cd9d4f65', 'user': self.user}),
+            (get_posts_by_pk, {'pk': 1, 'user': self.user}),
+        )
+
+        for func, kwargs in fixtures:
+            status_code, response_data = func(
+                fields='title,password',
+                **kwargs,
+            )
+
+            self.assertEqual(status_code, 400, msg=func.__name__)
+
+
+class AsyncServicesTest(TestCase):
+    fixtures = ['users.json', 'posts.json']
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.path = f'{CUR_DIR}/fixtures/services'
+        cls.user = User.objects.get(email='test1@cc.com')
+
+    async def test_aget_posts(self):
+        status_code, response_data = await aget_posts(
+            fields='title,author_nickname',
+        )
+
+        self.assertEqual(status_code, 200)
+        _, expected = await sync_to_async(get_posts)(fields='title,author_nickname')
+        self.assertEqual(response_data, expected)
+
+    async def test_adetail(self):
+        path = f'{self.path}/get_post'
+        fixtures = (
+            (200, 'valid'),
+            (404, 'not_found'),
+        )
+
+        for code, name in fixtures:
+            fixture = f'{code}_{name}'
+
+            with open(f'{path}/{fixture}_request.json') as file:
+                slug = json.load(file)
+
+            status_code, response_data = await adetail(
+                slug=slug,
+                user=self.user,
+            )
+
+            _, expected = await sync_to_async(detail)(slug=slug, user=self.user)
+            self.assertEqual(status_code, code, msg=fixture)
+            self.assertEqual(response_data, expected, msg=fixture)
+
+    async def test_aget_posts_by_pk(self):
+        path = f'{self.path}/get_posts_by_pk'
+        fixtures = (
+            (200, 'valid'),
+            (404, 'not_found'),
+        )
+
+        for code, name in fixtures:
+            fixture = f'{code}_{name}'
+
+            with open(f'{path}/{fixture}_request.json') as file:
+                pk = json.load(file)
+
+            status_code, response_data = await aget_posts_by_pk(
+                pk=pk,
+                user=self.user,
+            )
+
+            _, expected = await sync_to_async(get_posts_by_pk)(pk=pk, user=self.user)
+            self.assertEqual(status_code, code, msg=fixture)
+            self.assertEqual(response_data, expected, msg=fixture)
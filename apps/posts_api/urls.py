@@ -1,10 +1,18 @@
+from django.conf import settings
 from django.urls import path
 
-from posts_api.api import (
-    PostListView,
-    PostDetailView,
-    PostUserView,
-)
+if settings.ASYNC_VIEWS_ENABLED:
+    from posts_api.api import (
+        AsyncPostListView as PostListView,
+        AsyncPostDetailView as PostDetailView,
+        AsyncPostUserView as PostUserView,
+    )
+else:
+    from posts_api.api import (
+        PostListView,
+        PostDetailView,
+        PostUserView,
+    )
 
 
 urlpatterns = [
@@ -13,8 +13,16 @@ from users_api.services import (
     remove,
 )
 
+from utils.throttling import (
+    IPRateThrottle,
+    EmailRateThrottle,
+)
+
 
 class RegisterView(APIView):
+    throttle_classes = [IPRateThrottle, EmailRateThrottle]
+    throttle_scope = 'register'
+
     def post(self, request, *args, **kwargs):
         data = request.data
         get_url_func = request.build_absolute_uri
@@ -29,6 +37,9 @@ class RegisterView(APIView):
 
 
 class AuthView(APIView):
+    throttle_classes = [IPRateThrottle, EmailRateThrottle]
+    throttle_scope = 'auth'
+
     def post(self, request, *args, **kwargs):
         data = request.data
         status_code, data = auth(
@@ -88,6 +99,9 @@ class ConfirmEmailView(APIView):
 
 
 class PasswordRestoreRequestView(APIView):
+    throttle_classes = [IPRateThrottle, EmailRateThrottle]
+    throttle_scope = 'password_restore_request'
+
     def post(self, request, *args, **kwargs):
         data = request.data
         get_url_func = request.build_absolute_uri
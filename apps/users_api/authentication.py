@@ -1,13 +1,28 @@
 from rest_framework.authentication import BaseAuthentication
 from rest_framework.exceptions import AuthenticationFailed
 from django.utils.translation import gettext_lazy
+from monitoring.timing import timed
 from users_api.models import CustomToken
 
 
 class CustomTokenAuthentication(BaseAuthentication):
     keyword = 'Token'
 
+    @timed('auth')
     def authenticate(self, request):
+        key = self.get_key(request)
+        if key is None:
+            return None
+        return self.authenticate_credentials(key)
+
+    @timed('auth')
+    async def aauthenticate(self, request):
+        key = self.get_key(request)
+        if key is None:
+            return None
+        return await self.aauthenticate_credentials(key)
+
+    def get_key(self, request):
         view = request.resolver_match.func.cls
         permission_classes = getattr(view, 'permission_classes', [])
         if 'AllowAny' in str(permission_classes):
@@ -19,15 +34,15 @@ class CustomTokenAuthentication(BaseAuthentication):
             return None
 
         try:
-            key = auth.split()[1]
+            return auth.split()[1]
         except IndexError:
             raise AuthenticationFailed(gettext_lazy('Invalid token header. No credentials provided.'))
 
-        return self.authenticate_credentials(key)
-
     def authenticate_credentials(self, key):
         try:
-            token = CustomToken.objects.get(key=key)
+            token = CustomToken.objects.select_related(
+                'user',
+            ).get(key=key)
         except CustomToken.DoesNotExist:
             raise AuthenticationFailed(gettext_lazy('Invalid token.'))
 
@@ -35,6 +50,23 @@ class CustomTokenAuthentication(BaseAuthentication):
             token.delete()
             raise AuthenticationFailed(gettext_lazy('Token has expired.'))
 
+        return self.check_user(token)
+
+    async def aauthenticate_credentials(self, key):
+        try:
+            token = await CustomToken.objects.select_related(
+                'user',
+            ).aget(key=key)
+        except CustomToken.DoesNotExist:
+            raise AuthenticationFailed(gettext_lazy('Invalid token.'))
+
+        if token.is_expired():
+            await token.adelete()
+            raise AuthenticationFailed(gettext_lazy('Token has expired.'))
+
+        return self.check_user(token)
+
+    def check_user(self, token):
         if not token.user.is_active:
             raise AuthenticationFailed(gettext_lazy('User inactive or deleted.'))
 
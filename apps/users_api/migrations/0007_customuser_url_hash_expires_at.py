@@ -0,0 +1,39 @@
+# Generated by Django 4.2 on 2026-10-19 18:46
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def set_url_hash_expiration(apps, schema_editor):
+    CustomUser = apps.get_model('users_api', 'CustomUser')
+    CustomUser.objects.filter(
+        url_hash__isnull=False,
+    ).update(
+        url_hash_expires_at=timezone.now() + timedelta(seconds=settings.EMAIL_LINK_MAX_AGE),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users_api', '0006_alter_customuser_avatar_alter_customuser_thumbnail'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='url_hash_expires_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Дата истечения хэша'),
+        ),
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(condition=models.Q(('url_hash__isnull', False)), fields=['url_hash'], name='users_url_hash_idx'),
+        ),
+        migrations.RunPython(
+            set_url_hash_expiration,
+            migrations.RunPython.noop,
+        ),
+    ]
@@ -5,6 +5,7 @@ from PIL import Image
 
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.db import models
+from django.db.models import Q
 from django.conf import settings
 from django.contrib.auth.models import (
     AbstractBaseUser,
@@ -74,6 +75,11 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
         null=True,
         blank=True,
     )
+    url_hash_expires_at = models.DateTimeField(
+        verbose_name='Дата истечения хэша',
+        null=True,
+        blank=True,
+    )
     date_joined = models.DateTimeField(
         verbose_name='Дата регистрации',
         auto_now_add=True,
@@ -113,6 +119,13 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
         db_table = 'users'
         verbose_name = 'Пользователь'
         verbose_name_plural = 'Пользователи'
+        indexes = [
+            models.Index(
+                fields=['url_hash'],
+                name='users_url_hash_idx',
+                condition=Q(url_hash__isnull=False),
+            ),
+        ]
 
 
 class CustomToken(models.Model):
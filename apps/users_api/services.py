@@ -1,11 +1,16 @@
-import uuid
+import logging
 from typing import Callable
 
+from django.conf import settings
 from django.contrib.auth import authenticate
+from django.core.cache import caches
 from django.http.request import QueryDict
 from django.urls import reverse
+from django.db import transaction
 from django.db.utils import IntegrityError
+from django.utils import timezone
 
+from monitoring.timing import timed
 from notifications.services import Email
 from users_api.models import (
     CustomUser,
@@ -16,6 +21,11 @@ from users_api.serializers import (
     CustomUserSerializer,
     PasswordRestoreSerializer,
 )
+from users_api.tokens import (
+    make_email_token,
+    read_email_token,
+    check_email_token_state,
+)
 from utils.constants import (
     CONFIRM_EMAIL,
     PASSWORD_RESTORE,
@@ -24,6 +34,7 @@ from utils.constants import (
 from utils.logger import (
     get_logger,
     get_log_user_data,
+    lazy_message,
 )
 from utils.response_patterns import generate_response
 
@@ -31,6 +42,7 @@ from utils.response_patterns import generate_response
 logger = get_logger(__name__)
 
 
+@timed()
 def register(data: QueryDict, get_url_func: Callable) -> (int, dict):
     '''
     Создание пользователя(регистрация)
@@ -47,7 +59,12 @@ def register(data: QueryDict, get_url_func: Callable) -> (int, dict):
         user_data=dict(data),
     )
     logger.info(
-        msg=f'Создание пользователя {user_data}',
+        msg=lazy_message(
+            logger,
+            logging.INFO,
+            'Создание пользователя {user_data}',
+            user_data=user_data,
+        ),
     )
 
     serializer = RegisterSerializer(
@@ -55,8 +72,13 @@ def register(data: QueryDict, get_url_func: Callable) -> (int, dict):
     )
     if not serializer.is_valid():
         logger.error(
-            msg=f'Невалидные данные для создания '
-                f'пользователя {user_data}: {serializer.errors}',
+            msg=lazy_message(
+                logger,
+                logging.ERROR,
+                'Невалидные данные для создания пользователя {user_data}: {errors}',
+                user_data=user_data,
+                errors=serializer.errors,
+            ),
         )
         return generate_response(
             status_code=400,
@@ -64,13 +86,28 @@ def register(data: QueryDict, get_url_func: Callable) -> (int, dict):
 
     validated_data = serializer.validated_data
     try:
-        user = CustomUser.objects.create_user(
-            email=validated_data['email'],
-            password=validated_data['password'],
-        )
+        # письмо подтверждения ставится в очередь в той же транзакции, что и создание
+        # пользователя: при ошибке постановки пользователь не создается
+        with transaction.atomic():
+            user = CustomUser.objects.create_user(
+                email=validated_data['email'],
+                password=validated_data['password'],
+            )
+            status_code = send_email_by_type(
+                user=user,
+                get_url_func=get_url_func,
+                email_type=CONFIRM_EMAIL,
+            )
+            if status_code == 500:
+                transaction.set_rollback(True)
     except IntegrityError as exc:
         logger.error(
-            msg=f'Пользователь с таким email уже существует {user_data}',
+            msg=lazy_message(
+                logger,
+                logging.ERROR,
+                'Пользователь с таким email уже существует {user_data}',
+                user_data=user_data,
+            ),
             exc_info=True,
         )
         return generate_response(
@@ -78,23 +115,42 @@ def register(data: QueryDict, get_url_func: Callable) -> (int, dict):
         )
     except Exception as exc:
         logger.error(
-            msg=f'Возникла ошибка при попытке создать пользователя {user_data}',
+            msg=lazy_message(
+                logger,
+                logging.ERROR,
+                'Возникла ошибка при попытке создать пользователя {user_data}',
+                user_data=user_data,
+            ),
             exc_info=True,
         )
         return generate_response(
             status_code=500,
         )
 
-    logger.info(
-        msg=f'Пользователь {user_data} успешно создан',
-    )
+    if status_code == 500:
+        logger.error(
+            msg=lazy_message(
+                logger,
+                logging.ERROR,
+                'Письмо подтверждения не поставлено в очередь, создание '
+                'пользователя {user_data} отменено',
+                user_data=user_data,
+            ),
+        )
+        return generate_response(
+            status_code=500,
+        )
 
-    status = send_email_by_type(
-        user=user,
-        get_url_func=get_url_func,
-        email_type=CONFIRM_EMAIL,
-    )
-    if status != 200:
+    logger.info(
+        msg=lazy_message(
+            logger,
+            logging.INFO,
+            'Пользователь {user_data} успешно создан',
+            user_data=user_data,
+        ),
+    )
+    # письма отключены в настройках или нет шаблона письма
+    if status_code != 200:
         return generate_response(
             status_code=206,
         )
@@ -104,6 +160,7 @@ def register(data: QueryDict, get_url_func: Callable) -> (int, dict):
     )
 
 
+@timed()
 def auth(data: QueryDict) -> (int, dict):
     '''
     Аутентификация пользователя
@@ -157,6 +214,7 @@ def auth(data: QueryDict) -> (int, dict):
     )
 
 
+@timed()
 def detail(user: CustomUser) -> (int, dict):
     '''
     Получение данных пользователя
@@ -175,7 +233,13 @@ def detail(user: CustomUser) -> (int, dict):
     ).data
 
     logger.info(
-        msg=f'Данные пользователя {user} успешно получены: {data}',
+        msg=lazy_message(
+            logger,
+            logging.INFO,
+            'Данные пользователя {user} успешно получены: {data}',
+            user=user,
+            data=data,
+        ),
     )
     return generate_response(
         status_code=200,
@@ -183,6 +247,7 @@ def detail(user: CustomUser) -> (int, dict):
     )
 
 
+@timed()
 def update(user: CustomUser, data: QueryDict) -> (int, dict):
     '''
     Обновление данных пользователя
@@ -199,7 +264,13 @@ def update(user: CustomUser, data: QueryDict) -> (int, dict):
         user_data=dict(data),
     )
     logger.info(
-        msg=f'Обновление данных пользователя {user}: {user_data}',
+        msg=lazy_message(
+            logger,
+            logging.INFO,
+            'Обновление данных пользователя {user}: {user_data}',
+            user=user,
+            user_data=user_data,
+        ),
     )
 
     serializer = CustomUserSerializer(
@@ -208,8 +279,14 @@ def update(user: CustomUser, data: QueryDict) -> (int, dict):
     )
     if not serializer.is_valid():
         logger.error(
-            msg=f'Невалидные данные для обновления '
-                f'пользователя {user} {user_data}: {serializer.errors}',
+            msg=lazy_message(
+                logger,
+                logging.ERROR,
+                'Невалидные данные для обновления пользователя {user} {user_data}: {errors}',
+                user=user,
+                user_data=user_data,
+                errors=serializer.errors,
+            ),
         )
         return generate_response(
             status_code=400,
@@ -225,8 +302,13 @@ def update(user: CustomUser, data: QueryDict) -> (int, dict):
         user.save()
     except Exception as exc:
         logger.error(
-            msg=f'Возникла ошибка при попытке обновить '
-                f'данные пользователя {user}: {user_data}',
+            msg=lazy_message(
+                logger,
+                logging.ERROR,
+                'Возникла ошибка при попытке обновить данные пользователя {user}: {user_data}',
+                user=user,
+                user_data=user_data,
+            ),
             exc_info=True,
         )
         return generate_response(
@@ -235,7 +317,13 @@ def update(user: CustomUser, data: QueryDict) -> (int, dict):
 
     data = serializer.data
     logger.info(
-        msg=f'Обновление данных пользователя {user}: {user_data} прошло успешно',
+        msg=lazy_message(
+            logger,
+            logging.INFO,
+            'Обновление данных пользователя {user}: {user_data} прошло успешно',
+            user=user,
+            user_data=user_data,
+        ),
     )
     return generate_response(
         status_code=200,
@@ -243,6 +331,7 @@ def update(user: CustomUser, data: QueryDict) -> (int, dict):
     )
 
 
+@timed()
 def remove(user: CustomUser) -> (int, dict):
     '''
     Удаление пользователя
@@ -276,10 +365,49 @@ def remove(user: CustomUser) -> (int, dict):
     )
 
 
+def get_email_coalesce_key(user: CustomUser, email_type: str) -> str:
+    '''
+    Получение ключа окна объединения повторных писем
+
+    Args:
+        user: пользователь
+        email_type: тип письма
+
+    Returns:
+        Ключ
+    '''
+
+    return f'email_coalesce:{email_type}:{user.pk}'
+
+
+def release_email_coalesce(user: CustomUser, email_type: str) -> None:
+    '''
+    Закрытие окна объединения писем после использования ссылки
+
+    Args:
+        user: пользователь
+        email_type: тип письма
+
+    Returns:
+        None
+    '''
+
+    caches[settings.EMAIL_COALESCE_CACHE].delete(
+        get_email_coalesce_key(
+            user=user,
+            email_type=email_type,
+        )
+    )
+
+
+@timed()
 def send_email_by_type(user: CustomUser, get_url_func: Callable, email_type: str) -> int:
     '''
     Отправка письма по типу
 
+    Повторный запрос письма того же типа в течение EMAIL_COALESCE_WINDOW
+    не меняет ссылку и не отправляет новое письмо
+
     Args:
         user: пользователь
         get_url_func: функция для создания ссылки
@@ -289,32 +417,42 @@ def send_email_by_type(user: CustomUser, get_url_func: Callable, email_type: str
         Статус
     '''
 
+    cache = caches[settings.EMAIL_COALESCE_CACHE]
+    coalesce_key = get_email_coalesce_key(
+        user=user,
+        email_type=email_type,
+    )
+    if not cache.add(coalesce_key, True, timeout=settings.EMAIL_COALESCE_WINDOW):
+        logger.info(
+            msg=f'Письмо {email_type} пользователю {user} уже отправлено, '
+                f'повторная отправка пропущена',
+        )
+        return 200
+
     logger.info(
         msg=f'Получение данных для формирования текста '
             f'письма {email_type} пользователю {user}',
     )
 
-    url_hash = str(uuid.uuid4())
-    user.url_hash = url_hash
-
-    try:
-        user.save()
-    except Exception as exc:
-        logger.error(
-            msg=f'Не удалось получить данные для '
-                f'формирования текста письма {email_type} пользователю {user}',
-            exc_info=True,
-        )
-        return 500
-
-    url = get_url_func(reverse(email_type, args=(user.url_hash,)))
+    token = make_email_token(
+        user=user,
+        email_type=email_type,
+    )
+    url = get_url_func(reverse(email_type, args=(token,)))
     mail_data = {
         'url': url,
     }
 
     logger.info(
-        msg=f'Данные для формирования текста письма {email_type} '
-            f'пользователю {user} получены: {mail_data}',
+        msg=lazy_message(
+            logger,
+            logging.INFO,
+            'Данные для формирования текста письма {email_type} '
+            'пользователю {user} получены: {mail_data}',
+            email_type=email_type,
+            user=user,
+            mail_data=mail_data,
+        ),
     )
 
     email = Email(
@@ -323,9 +461,50 @@ def send_email_by_type(user: CustomUser, get_url_func: Callable, email_type: str
         recipient=user,
     )
     status = email.send()
+    if status != 200:
+        cache.delete(coalesce_key)
     return status
 
 
+def get_user_by_url_hash(url_hash: str, email_type: str) -> CustomUser | None:
+    '''
+    Поиск пользователя по ссылке из письма
+
+    Подписанная ссылка проверяется без обращения к базе данных,
+    пользователь ищется по первичному ключу. Ссылки со старым url_hash
+    работают до истечения url_hash_expires_at
+
+    Args:
+        url_hash: подписанный токен или хэш из ссылки
+        email_type: тип письма
+
+    Returns:
+        Пользователь или None
+    '''
+
+    data = read_email_token(
+        token=url_hash,
+        email_type=email_type,
+    )
+    if data is not None:
+        user = CustomUser.objects.filter(
+            pk=data['pk'],
+        ).first()
+        if user is None or not check_email_token_state(
+            user=user,
+            email_type=email_type,
+            data=data,
+        ):
+            return None
+        return user
+
+    return CustomUser.objects.filter(
+        url_hash=url_hash,
+        url_hash_expires_at__gt=timezone.now(),
+    ).first()
+
+
+@timed()
 def confirm_email(url_hash: str) -> (int, dict):
     '''
     Подтверждение email
@@ -342,9 +521,10 @@ def confirm_email(url_hash: str) -> (int, dict):
     )
 
     try:
-        user = CustomUser.objects.filter(
+        user = get_user_by_url_hash(
             url_hash=url_hash,
-        ).first()
+            email_type=CONFIRM_EMAIL,
+        )
     except Exception as exc:
         logger.error(
             msg=f'Ошибка при поиске пользователя с хэшем '
@@ -365,6 +545,7 @@ def confirm_email(url_hash: str) -> (int, dict):
 
     user.email_confirmed = True
     user.url_hash = None
+    user.url_hash_expires_at = None
     try:
         user.save()
     except Exception as exc:
@@ -376,6 +557,10 @@ def confirm_email(url_hash: str) -> (int, dict):
             status_code=500,
         )
 
+    release_email_coalesce(
+        user=user,
+        email_type=CONFIRM_EMAIL,
+    )
     logger.info(
         msg=f'Пользователь {user} с успешно подтвердил email',
     )
@@ -384,6 +569,7 @@ def confirm_email(url_hash: str) -> (int, dict):
     )
 
 
+@timed()
 def password_restore(url_hash: str, data: QueryDict) -> (int, dict):
     '''
     Восстановление пароля
@@ -401,9 +587,10 @@ def password_restore(url_hash: str, data: QueryDict) -> (int, dict):
     )
 
     try:
-        user = CustomUser.objects.filter(
+        user = get_user_by_url_hash(
             url_hash=url_hash,
-        ).first()
+            email_type=PASSWORD_RESTORE,
+        )
     except Exception as exc:
         logger.error(
             msg=f'Ошибка при поиске пользователя с хэшем {url_hash} для сброса пароля',
@@ -425,7 +612,13 @@ def password_restore(url_hash: str, data: QueryDict) -> (int, dict):
         user_data=dict(data),
     )
     logger.info(
-        msg=f'Сброс пароля пользователя {user}: {user_data}',
+        msg=lazy_message(
+            logger,
+            logging.INFO,
+            'Сброс пароля пользователя {user}: {user_data}',
+            user=user,
+            user_data=user_data,
+        ),
     )
     serializer = CustomUserSerializer(
         instance=user,
@@ -433,8 +626,14 @@ def password_restore(url_hash: str, data: QueryDict) -> (int, dict):
     )
     if not serializer.is_valid():
         logger.error(
-            msg=f'Невалидные данные для сброса пароля '
-                f'пользователя {user} {user_data}: {serializer.errors}',
+            msg=lazy_message(
+                logger,
+                logging.ERROR,
+                'Невалидные данные для сброса пароля пользователя {user} {user_data}: {errors}',
+                user=user,
+                user_data=user_data,
+                errors=serializer.errors,
+            ),
         )
         return generate_response(
             status_code=400,
@@ -443,26 +642,44 @@ def password_restore(url_hash: str, data: QueryDict) -> (int, dict):
     validated_data = serializer.validated_data
     user.set_password(validated_data['password'])
     user.url_hash = None
+    user.url_hash_expires_at = None
     try:
         user.save()
     except Exception as exc:
         logger.error(
-            msg=f'Возникла ошибка при сбросe пароля '
-                f'пользователя {user} {user_data}: {serializer.errors}',
+            msg=lazy_message(
+                logger,
+                logging.ERROR,
+                'Возникла ошибка при сбросe пароля пользователя {user} {user_data}: {errors}',
+                user=user,
+                user_data=user_data,
+                errors=serializer.errors,
+            ),
             exc_info=True,
         )
         return generate_response(
             status_code=500,
         )
 
+    release_email_coalesce(
+        user=user,
+        email_type=PASSWORD_RESTORE,
+    )
     logger.info(
-        msg=f'Пароль пользователя {user} {user_data} успешно сброшен',
+        msg=lazy_message(
+            logger,
+            logging.INFO,
+            'Пароль пользователя {user} {user_data} успешно сброшен',
+            user=user,
+            user_data=user_data,
+        ),
     )
     return generate_response(
         status_code=200,
     )
 
 
+@timed()
 def password_restore_request(data: QueryDict, get_url_func: Callable) -> (int, dict):
     '''
     Запрос на восстановление пароля
@@ -485,8 +702,13 @@ def password_restore_request(data: QueryDict, get_url_func: Callable) -> (int, d
     )
     if not serializer.is_valid():
         logger.error(
-            msg=f'Невалидные данные для запроса на сброс пароля '
-                f'пользователя {email}: {serializer.errors}',
+            msg=lazy_message(
+                logger,
+                logging.ERROR,
+                'Невалидные данные для запроса на сброс пароля пользователя {email}: {errors}',
+                email=email,
+                errors=serializer.errors,
+            ),
         )
         return generate_response(
             status_code=400,
@@ -1,12 +1,29 @@
 import json
 import os
+from datetime import timedelta
+from urllib.parse import urlparse
 
+from django.conf import settings
+from django.core.cache import caches
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import (
+    DatabaseError,
+    connection,
+)
+from django.test import (
+    TransactionTestCase,
+    override_settings,
+)
+from django.urls import resolve
+from django.utils import timezone
 
 from rest_framework.test import APITestCase
 
 from unittest.mock import patch
 
+from monitoring.nplusone import NPlusOneTestMixin
+from notifications.models import EmailOutbox
+from notifications.registry import email_registry
 from users_api.models import (
     CustomUser,
 )
@@ -19,13 +36,20 @@ from users_api.services import (
     confirm_email,
     password_restore,
     password_restore_request,
+    get_email_coalesce_key,
+    send_email_by_type,
+)
+from users_api.tokens import (
+    check_email_token_state,
+    make_email_token,
+    read_email_token,
 )
 
 
 CUR_DIR = os.path.dirname(__file__)
 
 
-class ServicesTest(APITestCase):
+class ServicesTest(NPlusOneTestMixin, APITestCase):
     @classmethod
     def setUpTestData(cls):
         cls.path = f'{CUR_DIR}/fixtures/services'
@@ -34,6 +58,7 @@ class ServicesTest(APITestCase):
             email='test@cc.com',
             password='test123',
             url_hash='fc0ecf9c-4c37-4bb2-8c22-938a1dc65da4',
+            url_hash_expires_at=timezone.now() + timedelta(days=1),
         )
 
     @patch('users_api.services.send_email_by_type')
@@ -149,6 +174,56 @@ class ServicesTest(APITestCase):
 
             self.assertEqual(status_code, code, msg=fixture)
 
+    def test_confirm_email_signed(self):
+        url_hash = make_email_token(
+            user=self.user,
+            email_type='confirm_email',
+        )
+        fixtures = (
+            (404, make_email_token(user=self.user, email_type='password_reset')),
+            (200, url_hash),
+            (404, url_hash),
+        )
+
+        for code, url_hash in fixtures:
+            status_code, response_data = confirm_email(
+                url_hash=url_hash,
+            )
+
+            self.assertEqual(status_code, code, msg=url_hash)
+
+    def test_confirm_email_expired(self):
+        self.user.url_hash_expires_at = timezone.now()
+        self.user.save()
+
+        status_code, response_data = confirm_email(
+            url_hash=self.user.url_hash,
+        )
+
+        self.assertEqual(status_code, 404)
+
+    def test_password_restore_signed(self):
+        url_hash = make_email_token(
+            user=self.user,
+            email_type='password_reset',
+        )
+        data = {
+            'password': 'test123',
+            'new_password': 'new_password123',
+        }
+        fixtures = (
+            (200, url_hash),
+            (404, url_hash),
+        )
+
+        for code, url_hash in fixtures:
+            status_code, response_data = password_restore(
+                url_hash=url_hash,
+                data=data,
+            )
+
+            self.assertEqual(status_code, code, msg=url_hash)
+
     def test_password_restore(self):
         path = f'{self.path}/password_restore'
         fixtures = (
@@ -198,3 +273,97 @@ class ServicesTest(APITestCase):
 
             self.assertEqual(status_code, code, msg=fixture)
 
+    @patch('users_api.services.Email')
+    def test_send_email_by_type(self, mock_email):
+        mock_email.return_value.send.return_value = 200
+        # удаляется только окно объединения пользователя, общий кэш может быть в Redis
+        coalesce_key = get_email_coalesce_key(
+            user=self.user,
+            email_type='password_reset',
+        )
+        cache = caches[settings.EMAIL_COALESCE_CACHE]
+        cache.delete(coalesce_key)
+        self.addCleanup(cache.delete, coalesce_key)
+
+        request = self.client.post('/').wsgi_request
+        get_url_func = request.build_absolute_uri
+
+        status_code = send_email_by_type(
+            user=self.user,
+            get_url_func=get_url_func,
+            email_type='password_reset',
+        )
+        self.assertEqual(status_code, 200)
+        url = mock_email.call_args.kwargs['mail_data']['url']
+        token = resolve(urlparse(url).path).kwargs['url_hash']
+        data = read_email_token(
+            token=token,
+            email_type='password_reset',
+        )
+        self.assertEqual(data['pk'], self.user.pk)
+        self.assertTrue(
+            check_email_token_state(
+                user=self.user,
+                email_type='password_reset',
+                data=data,
+            ),
+        )
+
+        with self.assertNumQueries(0):
+            status_code = send_email_by_type(
+                user=self.user,
+                get_url_func=get_url_func,
+                email_type='password_reset',
+            )
+        self.assertEqual(status_code, 200)
+        self.assertEqual(mock_email.call_count, 1)
+        self.assertEqual(mock_email.return_value.send.call_count, 1)
+
+
+@override_settings(EMAIL_COALESCE_CACHE='default')
+class RegisterTransactionTest(TransactionTestCase):
+    # пользователь и письмо в очереди фиксируются одной транзакцией
+    fixtures = ['email_template.json']
+
+    def setUp(self):
+        caches['default'].clear()
+        email_registry.clear()
+        self.get_url_func = self.client.post('/').wsgi_request.build_absolute_uri
+        self.data = {
+            'email': 'new@cc.com',
+            'password': 'test123',
+            'confirm_password': 'test123',
+        }
+
+    def test_outbox_in_transaction(self):
+        create = EmailOutbox.objects.create
+        state = {}
+
+        def create_outbox(**kwargs):
+            state['in_atomic_block'] = connection.in_atomic_block
+            state['user_exists'] = CustomUser.objects.filter(email=kwargs['recipient']).exists()
+            return create(**kwargs)
+
+        with patch('notifications.services.EmailOutbox.objects.create', side_effect=create_outbox):
+            status_code, _ = register(
+                data=self.data,
+                get_url_func=self.get_url_func,
+            )
+
+        self.assertEqual(status_code, 200)
+        # письмо записано до фиксации транзакции с пользователем
+        self.assertEqual(state, {'in_atomic_block': True, 'user_exists': True})
+        self.assertFalse(connection.in_atomic_block)
+        self.assertTrue(EmailOutbox.objects.filter(recipient='new@cc.com').exists())
+
+    @patch('notifications.services.EmailOutbox.objects.create', side_effect=DatabaseError)
+    def test_outbox_error(self, mock_create):
+        status_code, _ = register(
+            data=self.data,
+            get_url_func=self.get_url_func,
+        )
+
+        self.assertEqual(status_code, 500)
+        self.assertEqual(mock_create.call_count, 1)
+        self.assertFalse(CustomUser.objects.filter(email='new@cc.com').exists())
+        self.assertFalse(EmailOutbox.objects.exists())
@@ -0,0 +1,115 @@
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.test import override_settings
+from django.urls import reverse
+
+from rest_framework.parsers import JSONParser
+from rest_framework.request import Request
+from rest_framework.test import (
+    APIRequestFactory,
+    APITestCase,
+)
+
+from utils.throttling import (
+    CacheBucketStorage,
+    EmailRateThrottle,
+    get_bucket_storage,
+)
+
+
+@override_settings(
+    RATE_LIMITS={
+        'auth_ip': '3/min',
+        'auth_email': '2/min',
+    },
+)
+class ThrottlingTest(APITestCase):
+    def setUp(self):
+        get_bucket_storage().clear()
+        self.url = reverse('auth')
+
+    def test_ip_limit(self):
+        for index in range(3):
+            response = self.client.post(
+                self.url,
+                data={'email': f'user{index}@cc.com', 'password': 'wrong'},
+            )
+            self.assertEqual(response.status_code, 401)
+
+        with self.assertNumQueries(0):
+            response = self.client.post(
+                self.url,
+                data={'email': 'user4@cc.com', 'password': 'wrong'},
+            )
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response.headers)
+
+    def test_email_limit(self):
+        data = {'email': 'Test@cc.com', 'password': 'wrong'}
+        for index in range(2):
+            response = self.client.post(
+                self.url,
+                data=data,
+                REMOTE_ADDR=f'10.0.0.{index}',
+            )
+            self.assertEqual(response.status_code, 401)
+
+        response = self.client.post(
+            self.url,
+            data={'email': 'test@cc.com ', 'password': 'wrong'},
+            REMOTE_ADDR='10.0.0.100',
+        )
+        self.assertEqual(response.status_code, 429)
+
+    def test_forwarded_for(self):
+        for index in range(3):
+            response = self.client.post(
+                self.url,
+                data={'email': f'user{index}@cc.com', 'password': 'wrong'},
+                HTTP_X_FORWARDED_FOR=f'10.0.0.{index}',
+            )
+            self.assertEqual(response.status_code, 401)
+
+        response = self.client.post(
+            self.url,
+            data={'email': 'user4@cc.com', 'password': 'wrong'},
+            HTTP_X_FORWARDED_FOR='10.0.0.100',
+        )
+        self.assertEqual(response.status_code, 429)
+
+    def test_list_body(self):
+        request = Request(
+            APIRequestFactory().post(self.url, data=[{'email': 'test@cc.com'}], format='json'),
+            parsers=[JSONParser()],
+        )
+
+        self.assertIsNone(EmailRateThrottle().get_key(request, view=None))
+
+    def test_cache_storage(self):
+        with self.assertRaises(ImproperlyConfigured):
+            CacheBucketStorage(alias='default')
+
+    @patch('utils.throttling.has_atomic_counters', return_value=True)
+    def test_cache_storage_concurrency(self, mock_has_atomic_counters):
+        # default заменяет общий кэш: его incr атомарен, как у Redis
+        storage = CacheBucketStorage(alias='default')
+        self.addCleanup(caches['default'].clear)
+
+        def consume(_):
+            return [
+                storage.consume(key='test:ip:1', capacity=50, refill_rate=0.01)
+                for _ in range(20)
+            ]
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            waits = [
+                wait
+                for result in executor.map(consume, range(8))
+                for wait in result
+            ]
+
+        self.assertEqual(waits.count(0), 50)
+        self.assertTrue(all(wait > 0 for wait in waits if wait))
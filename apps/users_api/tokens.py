@@ -0,0 +1,106 @@
+from django.conf import settings
+from django.core import signing
+from django.utils.crypto import (
+    constant_time_compare,
+    salted_hmac,
+)
+
+from users_api.models import CustomUser
+
+
+EMAIL_TOKEN_SALT = 'users_api.email_token'
+
+
+def get_email_token_state(user: CustomUser, email_type: str) -> str:
+    '''
+    Получение отпечатка состояния пользователя для ссылки из письма
+
+    Отпечаток меняется после подтверждения email или смены пароля,
+    поэтому использованная ссылка перестает работать
+
+    Args:
+        user: пользователь
+        email_type: тип письма
+
+    Returns:
+        Отпечаток
+    '''
+
+    value = f'{user.pk}{email_type}{user.email}{user.password}{user.email_confirmed}'
+    return salted_hmac(
+        key_salt=EMAIL_TOKEN_SALT,
+        value=value,
+        algorithm='sha256',
+    ).hexdigest()[:32]
+
+
+def make_email_token(user: CustomUser, email_type: str) -> str:
+    '''
+    Создание подписанного токена для ссылки из письма
+
+    Args:
+        user: пользователь
+        email_type: тип письма
+
+    Returns:
+        Токен
+    '''
+
+    return signing.dumps(
+        {
+            'pk': user.pk,
+            'type': email_type,
+            'state': get_email_token_state(
+                user=user,
+                email_type=email_type,
+            ),
+        },
+        salt=EMAIL_TOKEN_SALT,
+    )
+
+
+def read_email_token(token: str, email_type: str) -> dict | None:
+    '''
+    Проверка подписи и срока действия токена
+
+    Args:
+        token: токен
+        email_type: тип письма
+
+    Returns:
+        Данные токена или None
+    '''
+
+    try:
+        data = signing.loads(
+            token,
+            salt=EMAIL_TOKEN_SALT,
+            max_age=settings.EMAIL_LINK_MAX_AGE,
+        )
+    except signing.BadSignature:
+        return None
+    if not isinstance(data, dict) or data.get('type') != email_type:
+        return None
+    return data
+
+
+def check_email_token_state(user: CustomUser, email_type: str, data: dict) -> bool:
+    '''
+    Проверка, что ссылка еще не использована
+
+    Args:
+        user: пользователь
+        email_type: тип письма
+        data: данные токена
+
+    Returns:
+        Флаг валидности
+    '''
+
+    return constant_time_compare(
+        data.get('state', ''),
+        get_email_token_state(
+            user=user,
+            email_type=email_type,
+        ),
+    )
@@ -0,0 +1,139 @@
+import gc
+import json
+import math
+import os
+import platform
+import statistics
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable
+
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+
+def setup_django() -> None:
+    '''
+    Настройка Django для запуска бенчмарков вне manage.py
+
+    Returns:
+        None
+    '''
+
+    sys.path.insert(0, str(BASE_DIR))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+
+    import django
+    django.setup()
+
+
+@contextmanager
+def test_database():
+    '''
+    Создание временной тестовой базы данных на время замеров
+
+    Returns:
+        Контекстный менеджер
+    '''
+
+    from django.db import connection
+    from django.test.utils import (
+        setup_test_environment,
+        teardown_test_environment,
+    )
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+def measure(func: Callable, number: int = 1000, repeat: int = 7, warmup: int = 1) -> dict:
+    '''
+    Замер времени выполнения функции
+
+    Args:
+        func: функция без аргументов
+        number: количество вызовов в одном повторе
+        repeat: количество повторов
+        warmup: количество повторов для прогрева
+
+    Returns:
+        Словарь со статистикой времени одного вызова в секундах
+    '''
+
+    for _ in range(warmup):
+        for _ in range(number):
+            func()
+
+    timings = []
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            gc.collect()
+            start = time.perf_counter()
+            for _ in range(number):
+                func()
+            timings.append((time.perf_counter() - start) / number)
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+    median = statistics.median(timings)
+    return {
+        'number': number,
+        'repeat': repeat,
+        'min': min(timings),
+        'max': max(timings),
+        'mean': statistics.mean(timings),
+        'median': median,
+        'stdev': statistics.stdev(timings) if repeat > 1 else 0.0,
+        'ops_per_sec': 1 / median if median else None,
+    }
+
+
+def percentile(values: list, percent: float) -> float | None:
+    '''
+    Получение перцентиля методом ближайшего ранга
+
+    Args:
+        values: значения
+        percent: перцентиль от 0 до 100
+
+    Returns:
+        Значение перцентиля или None для пустого списка
+    '''
+
+    if not values:
+        return None
+    values = sorted(values)
+    index = max(math.ceil(len(values) * percent / 100) - 1, 0)
+    return values[index]
+
+
+def report(name: str, results: dict) -> dict:
+    '''
+    Вывод результатов бенчмарка в формате JSON
+
+    Args:
+        name: название бенчмарка
+        results: результаты замеров
+
+    Returns:
+        Словарь отчета
+    '''
+
+    data = {
+        'benchmark': name,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': results,
+    }
+    print(json.dumps(data, indent=2, ensure_ascii=False))
+    return data
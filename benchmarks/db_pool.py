@@ -0,0 +1,167 @@
+'''
+Сравнение задержки запросов к PostgreSQL при параллельной работе потоков:
+новое соединение на каждый запрос, постоянные соединения (CONN_MAX_AGE)
+и пул соединений utils.db_pool
+
+Каждый поток имитирует обработку запросов Django: проверка соединения
+в начале и конце запроса, как при сигналах request_started/request_finished,
+и запрос к базе между ними
+
+Запуск: python -m benchmarks.db_pool --concurrency 32 --requests 200 --pool-size 10
+'''
+import argparse
+import statistics
+import threading
+import time
+
+from benchmarks.base import (
+    setup_django,
+    percentile,
+    report,
+)
+
+
+MODES = {
+    'connect': ('django.db.backends.postgresql', {'CONN_MAX_AGE': 0}),
+    'persistent': ('django.db.backends.postgresql', {'CONN_MAX_AGE': 60}),
+    'pool': ('utils.db_pool', {'CONN_MAX_AGE': 0}),
+}
+
+
+def run_worker(backend, settings_dict: dict, alias: str, requests: int, query: str,
+               timings: list, errors: list) -> None:
+    '''
+    Выполнение запросов одним потоком
+
+    Args:
+        backend: модуль бэкенда базы данных
+        settings_dict: настройки базы
+        alias: название базы
+        requests: количество запросов
+        query: SQL запрос
+        timings: список для времени запросов в секундах
+        errors: список для ошибок
+
+    Returns:
+        None
+    '''
+
+    connection = backend.DatabaseWrapper(dict(settings_dict), alias)
+    try:
+        for _ in range(requests):
+            start = time.perf_counter()
+            try:
+                connection.close_if_unusable_or_obsolete()
+                with connection.cursor() as cursor:
+                    cursor.execute(query)
+                    cursor.fetchall()
+                connection.close_if_unusable_or_obsolete()
+            except Exception as exc:
+                errors.append(repr(exc))
+                connection.close()
+                continue
+            timings.append(time.perf_counter() - start)
+    finally:
+        connection.close()
+
+
+def run_mode(mode: str, concurrency: int, requests: int, query: str) -> dict:
+    '''
+    Замер задержки запросов в одном режиме
+
+    Args:
+        mode: режим из MODES
+        concurrency: количество потоков
+        requests: количество запросов одного потока
+        query: SQL запрос
+
+    Returns:
+        Словарь статистики
+    '''
+
+    from django.db import connections
+    from django.db.utils import load_backend
+    from utils.db_pool.pool import close_pool
+
+    engine, overrides = MODES[mode]
+    settings_dict = dict(
+        connections['default'].settings_dict,
+        ENGINE=engine,
+        **overrides,
+    )
+    backend = load_backend(engine)
+    alias = f'benchmark_{mode}'
+    timings = []
+    errors = []
+    threads = [
+        threading.Thread(
+            target=run_worker,
+            kwargs={
+                'backend': backend,
+                'settings_dict': settings_dict,
+                'alias': alias,
+                'requests': requests,
+                'query': query,
+                'timings': timings,
+                'errors': errors,
+            },
+        )
+        for _ in range(concurrency)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    close_pool(alias)
+
+    return {
+        'requests': len(timings),
+        'errors': len(errors),
+        'error_examples': sorted(set(errors))[:3],
+        'rps': len(timings) / elapsed if elapsed else None,
+        'mean': statistics.mean(timings) if timings else None,
+        'p50': percentile(timings, 50),
+        'p95': percentile(timings, 95),
+        'p99': percentile(timings, 99),
+        'max': max(timings) if timings else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Задержка запросов к БД с пулом и без')
+    parser.add_argument('modes', nargs='*', help=f'Режимы из {", ".join(MODES)}, по умолчанию все')
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--requests', type=int, default=200, help='Запросов на поток')
+    parser.add_argument('--pool-size', type=int, default=None)
+    parser.add_argument('--query', default='SELECT 1')
+    args = parser.parse_args()
+
+    setup_django()
+
+    from django.conf import settings
+
+    if args.pool_size is not None:
+        settings.DB_POOL_MAX_SIZE = args.pool_size
+
+    unknown = set(args.modes) - set(MODES)
+    if unknown:
+        raise SystemExit(f'Неизвестные режимы: {", ".join(sorted(unknown))}')
+
+    results = {
+        'concurrency': args.concurrency,
+        'pool_size': settings.DB_POOL_MAX_SIZE,
+    }
+    for mode in args.modes or MODES:
+        results[mode] = run_mode(
+            mode=mode,
+            concurrency=args.concurrency,
+            requests=args.requests,
+            query=args.query,
+        )
+    report('db_pool', results)
+
+
+if __name__ == '__main__':
+    main()
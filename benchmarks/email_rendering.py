@@ -0,0 +1,49 @@
+'''
+Сравнение форматирования текста письма через str.format и скомпилированный шаблон
+
+Запуск: python -m benchmarks.email_rendering
+'''
+from benchmarks.base import (
+    setup_django,
+    measure,
+    report,
+)
+
+
+BATCH_SIZE = 100
+
+
+def main():
+    setup_django()
+
+    from notifications.templating import (
+        compile_message,
+        render,
+        render_many,
+    )
+
+    message = (
+        'Здравствуйте!\n\n'
+        'Подтвердите адрес электронной почты по ссылке {url}\n\n'
+        'Если вы не регистрировались, просто проигнорируйте это письмо.'
+    )
+    data = {
+        'url': 'http://127.0.0.1:8000/api/v1/users/confirm/email/'
+               'fc0ecf9c-4c37-4bb2-8c22-938a1dc65da4/',
+    }
+    segments = compile_message(message)
+    batch = [data] * BATCH_SIZE
+
+    results = {
+        'str_format': measure(lambda: message.format(**data), number=10000),
+        'compiled_render': measure(lambda: render(segments, data), number=10000),
+        'compiled_render_many': measure(lambda: render_many(segments, batch), number=100),
+    }
+    results['compiled_render_many']['renders_per_sec'] = (
+        results['compiled_render_many']['ops_per_sec'] * BATCH_SIZE
+    )
+    report('email_rendering', results)
+
+
+if __name__ == '__main__':
+    main()
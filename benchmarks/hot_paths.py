@@ -0,0 +1,190 @@
+'''
+Замеры горячих участков кода без HTTP: сериализация постов, проверка токена,
+форматирование лога, формирование ответа сервиса и текста письма
+
+Данные создаются во временной тестовой базе данных, сериализуются уже загруженные
+объекты, поэтому в замеры сериализаторов не входят запросы к базе.
+
+Запуск: python -m benchmarks.hot_paths [название ...]
+'''
+import argparse
+import logging
+
+from benchmarks.base import (
+    setup_django,
+    measure,
+    report,
+    test_database,
+)
+
+
+POST_COUNTS = (
+    10,
+    100,
+    1000,
+)
+AUTHOR_POSTS_COUNT = 100
+
+
+def create_data() -> dict:
+    '''
+    Создание пользователя, токена, постов и шаблонов писем
+
+    Returns:
+        Словарь с созданными объектами
+    '''
+
+    from django.core.management import call_command
+    from posts_api.models import Post
+    from users_api.models import (
+        CustomToken,
+        CustomUser,
+    )
+
+    call_command('loaddata', 'email_template.json', verbosity=0)
+    user = CustomUser.objects.create_user(
+        email='benchmark@example.com',
+        password='benchmark',
+        email_confirmed=True,
+    )
+    token = CustomToken.objects.create(user=user)
+    author = CustomUser.objects.create_user(
+        email='author@example.com',
+        password='benchmark',
+    )
+    Post.objects.bulk_create([
+        Post(
+            author=user if index < max(POST_COUNTS) else author,
+            title=f'Пост {index}',
+            description='Описание поста ' * 10,
+            slug=f'benchmark-{index}',
+        )
+        for index in range(max(POST_COUNTS) + AUTHOR_POSTS_COUNT)
+    ])
+    return {
+        'user': user,
+        'token': token,
+        'author': author,
+        'posts': list(Post.objects.filter(author=user).select_related('author').order_by('pk')),
+    }
+
+
+def get_cases(data: dict) -> dict:
+    '''
+    Получение замеряемых функций
+
+    Args:
+        data: созданные объекты
+
+    Returns:
+        Словарь из названия и кортежа функции и количества вызовов в повторе
+    '''
+
+    from django.test import RequestFactory
+    from django.urls import resolve
+    from django.contrib.auth import get_user_model
+    from notifications.services import Email
+    from posts_api.serializers import (
+        AuthorPostSerializer,
+        PostSerializer,
+    )
+    from users_api.authentication import CustomTokenAuthentication
+    from utils.logger import ColorFormatter
+    from utils.response_patterns import generate_response
+
+    cases = {}
+    for count in POST_COUNTS:
+        posts = data['posts'][:count]
+        cases[f'post_serializer_{count}'] = (
+            lambda posts=posts: PostSerializer(posts, many=True).data,
+            max(10000 // count, 5),
+        )
+
+    author = get_user_model().objects.prefetch_related(
+        'posts',
+    ).get(pk=data['author'].pk)
+    cases['author_post_serializer'] = (
+        lambda: AuthorPostSerializer(author).data,
+        100,
+    )
+
+    path = f'/api/v1/posts/author/{data["user"].pk}/'
+    request = RequestFactory().get(
+        path,
+        HTTP_AUTHORIZATION=f'Token {data["token"].key}',
+    )
+    request.resolver_match = resolve(path)
+    authentication = CustomTokenAuthentication()
+    cases['token_authenticate'] = (
+        lambda: authentication.authenticate(request),
+        1000,
+    )
+
+    formatter = ColorFormatter('%(asctime)s %(levelname)s %(message)s %(name)s.%(funcName)s')
+    cases['color_formatter'] = (
+        lambda: formatter.format(logging.LogRecord(
+            name='posts_api.services',
+            level=logging.INFO,
+            pathname=__file__,
+            lineno=1,
+            msg='Получение списка всех постов',
+            args=None,
+            exc_info=None,
+            func='get_cases',
+        )),
+        10000,
+    )
+
+    response_data = {'token': data['token'].key}
+    cases['generate_response'] = (
+        lambda: generate_response(status_code=200, data=response_data),
+        100000,
+    )
+
+    email = Email(
+        email_type='confirm_email',
+        mail_data={
+            'url': 'http://127.0.0.1:8000/api/v1/users/confirm/email/'
+                   'fc0ecf9c-4c37-4bb2-8c22-938a1dc65da4/',
+        },
+        recipient=data['user'],
+    )
+    status_code, _ = email.formate_email_text()
+    if status_code != 200:
+        raise RuntimeError(f'Не удалось сформировать текст письма: {status_code}')
+    cases['formate_email_text'] = (
+        email.formate_email_text,
+        10000,
+    )
+    return cases
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Замеры горячих участков кода')
+    parser.add_argument('names', nargs='*', help='Названия замеров, по умолчанию все')
+    parser.add_argument('--repeat', type=int, default=7)
+    parser.add_argument('--warmup', type=int, default=1)
+    args = parser.parse_args()
+
+    setup_django()
+
+    results = {}
+    with test_database():
+        cases = get_cases(create_data())
+        unknown = set(args.names) - set(cases)
+        if unknown:
+            parser.error(f'Неизвестные замеры: {", ".join(sorted(unknown))}')
+        for name, (func, number) in cases.items():
+            if args.names and name not in args.names:
+                continue
+            results[name] = measure(
+                func,
+                number=number,
+                repeat=args.repeat,
+                warmup=args.warmup,
+            )
+    report('hot_paths', results)
+
+
+if __name__ == '__main__':
+    main()
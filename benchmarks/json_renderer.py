@@ -0,0 +1,105 @@
+'''
+Сравнение JSONRenderer/JSONParser DRF и ORJSONRenderer/ORJSONParser на ответах
+сервиса get_posts разного размера
+
+Запуск: python -m benchmarks.json_renderer
+'''
+import io
+from datetime import (
+    datetime,
+    timedelta,
+    timezone,
+)
+
+from benchmarks.base import (
+    setup_django,
+    measure,
+    report,
+)
+
+
+POST_COUNTS = (
+    10,
+    100,
+    1000,
+)
+
+
+def get_response_data(count: int) -> dict:
+    '''
+    Получение ответа сервиса get_posts для постов, созданных без базы данных
+
+    Args:
+        count: количество постов
+
+    Returns:
+        Словарь ответа
+    '''
+
+    from posts_api.models import Post
+    from posts_api.serializers import PostSerializer
+    from users_api.models import CustomUser
+    from utils.response_patterns import generate_response
+
+    now = datetime.now(tz=timezone.utc)
+    authors = [
+        CustomUser(pk=index + 1, email=f'author{index}@example.com')
+        for index in range(10)
+    ]
+    posts = [
+        Post(
+            pk=index + 1,
+            author=authors[index % len(authors)],
+            title=f'Пост номер {index}',
+            description='Описание поста со ссылкой и текстом. ' * 5,
+            slug=f'post-{index}',
+            created_at=now - timedelta(minutes=index),
+        )
+        for index in range(count)
+    ]
+    _, data = generate_response(
+        status_code=200,
+        data=PostSerializer(posts, many=True).data,
+    )
+    return data
+
+
+def main():
+    setup_django()
+
+    from rest_framework.parsers import JSONParser
+    from rest_framework.renderers import JSONRenderer
+    from utils.parsers import ORJSONParser
+    from utils.renderers import ORJSONRenderer
+
+    renderers = {
+        'json': JSONRenderer(),
+        'orjson': ORJSONRenderer(),
+    }
+    parsers = {
+        'json': JSONParser(),
+        'orjson': ORJSONParser(),
+    }
+
+    results = {}
+    for count in POST_COUNTS:
+        data = get_response_data(count)
+        body = renderers['json'].render(data)
+        number = max(10000 // count, 10)
+        results[f'posts_{count}'] = {
+            'size': len(body),
+            'identical': renderers['orjson'].render(data) == body,
+            'render': {
+                name: measure(lambda renderer=renderer: renderer.render(data), number=number)
+                for name, renderer in renderers.items()
+            },
+            'parse': {
+                name: measure(lambda parser=parser: parser.parse(io.BytesIO(body)), number=number)
+                for name, parser in parsers.items()
+            },
+        }
+    report('json_renderer', results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,479 @@
+'''
+Нагрузочный тест HTTP API на локально запущенном сервере
+
+Сервер запускается в отдельном процессе (gunicorn, если установлен, иначе runserver,
+uvicorn - ASGI с асинхронными представлениями постов) с текущими настройками Django, письма из очереди отправляются командой send_outbox
+в локальную SMTP заглушку. База данных должна быть доступна из нескольких процессов,
+SQLite в памяти не подходит.
+
+Запуск: python -m benchmarks.load --setup --concurrency 16 --duration 30
+Сравнение WSGI и ASGI: тот же запуск с --server gunicorn и --server uvicorn
+'''
+import argparse
+import http.client
+import itertools
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from importlib.util import find_spec
+
+from benchmarks.base import (
+    BASE_DIR,
+    percentile,
+    report,
+    setup_django,
+)
+from utils.smtp_sink import SMTPSink
+
+
+LOAD_USER_EMAIL = 'load@example.com'
+LOAD_USER_PASSWORD = 'load-password'
+
+SCENARIOS = {
+    'posts': 10,
+    'posts_titles': 5,
+    'post': 5,
+    'author_posts': 3,
+    'user': 2,
+    'auth': 1,
+    'register': 1,
+    'password_restore_request': 1,
+}
+
+
+def get_free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def get_commit() -> str | None:
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=BASE_DIR,
+            stderr=subprocess.DEVNULL,
+            text=True,
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def get_peak_rss(pid: int) -> int | None:
+    '''
+    Получение пикового RSS процесса и его дочерних процессов в килобайтах
+
+    Args:
+        pid: идентификатор процесса
+
+    Returns:
+        Сумма VmHWM или None, если /proc недоступен
+    '''
+
+    pids = [pid]
+    try:
+        with open(f'/proc/{pid}/task/{pid}/children') as file:
+            pids.extend(int(child) for child in file.read().split())
+    except OSError:
+        pass
+    total = None
+    for process_id in pids:
+        try:
+            with open(f'/proc/{process_id}/status') as file:
+                for line in file:
+                    if line.startswith('VmHWM:'):
+                        total = (total or 0) + int(line.split()[1])
+        except OSError:
+            continue
+    return total
+
+
+def get_server_command(server: str, port: int, workers: int) -> list:
+    '''
+    Получение команды запуска сервера
+
+    Args:
+        server: тип сервера
+        port: порт
+        workers: количество процессов сервера
+
+    Returns:
+        Команда
+    '''
+
+    address = f'127.0.0.1:{port}'
+    if server == 'uvicorn':
+        return [
+            sys.executable, '-m', 'uvicorn', 'config.asgi:application',
+            '--host', '127.0.0.1',
+            '--port', str(port),
+            '--workers', str(workers),
+            '--log-level', 'warning',
+            '--no-access-log',
+        ]
+    if server == 'gunicorn':
+        return [
+            sys.executable, '-m', 'gunicorn', 'config.wsgi',
+            '--bind', address,
+            '--workers', str(workers),
+            '--threads', '4',
+            '--log-level', 'warning',
+        ]
+    return [sys.executable, 'manage.py', 'runserver', '--noreload', address]
+
+
+def wait_for_server(port: int, process: subprocess.Popen, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError('Сервер завершился при запуске')
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError('Сервер не запустился')
+
+
+def prepare_data(setup: bool, posts: int) -> dict:
+    '''
+    Подготовка базы данных и выборка данных для запросов
+
+    Args:
+        setup: применить миграции и загрузить шаблоны писем
+        posts: количество постов для генерации, 0 - без генерации
+
+    Returns:
+        Словарь с данными пользователя, слагами и идентификаторами авторов
+    '''
+
+    from django.core.management import call_command
+    from notifications.models import EmailTemplate
+    from posts_api.models import Post
+    from users_api.models import CustomUser
+
+    if setup:
+        call_command('migrate', verbosity=0)
+        if not EmailTemplate.objects.exists():
+            call_command('loaddata', 'email_template.json', verbosity=0)
+    if posts:
+        call_command('seed_data', users=max(posts // 50, 1), posts=posts)
+
+    user = CustomUser.objects.filter(email=LOAD_USER_EMAIL).first()
+    if user is None:
+        CustomUser.objects.create_user(
+            email=LOAD_USER_EMAIL,
+            password=LOAD_USER_PASSWORD,
+            email_confirmed=True,
+        )
+    visible = Post.objects.filter(hidden=False)
+    return {
+        'slugs': list(visible.values_list('slug', flat=True)[:1000]),
+        'authors': list(
+            visible.values_list('author_id', flat=True).distinct()[:1000]
+        ),
+    }
+
+
+class Worker(threading.Thread):
+    def __init__(self, port: int, token: str, data: dict, deadline: float, seed: int):
+        super().__init__(daemon=True)
+        self.port = port
+        self.token = token
+        self.data = data
+        self.deadline = deadline
+        self.random = random.Random(seed)
+        self.results = []
+        self.connection = None
+
+    def request(self, method: str, path: str, body: dict | None = None, auth: bool = False) -> tuple:
+        headers = {'Accept': 'application/json'}
+        payload = None
+        if body is not None:
+            payload = json.dumps(body)
+            headers['Content-Type'] = 'application/json'
+        if auth:
+            headers['Authorization'] = f'Token {self.token}'
+        for attempt in range(2):
+            if self.connection is None:
+                self.connection = http.client.HTTPConnection('127.0.0.1', self.port, timeout=30)
+            try:
+                self.connection.request(method, path, body=payload, headers=headers)
+                response = self.connection.getresponse()
+                content = response.read()
+                return response.status, response.getheader('Server-Timing'), len(content)
+            except (http.client.HTTPException, OSError):
+                self.connection.close()
+                self.connection = None
+                if attempt:
+                    raise
+        return None
+
+    def get_request(self, scenario: str) -> tuple:
+        if scenario == 'posts':
+            return 'GET', '/api/v1/posts/', None, False
+        if scenario == 'posts_titles':
+            return 'GET', '/api/v1/posts/?fields=title,slug', None, False
+        if scenario == 'post':
+            return 'GET', f'/api/v1/posts/{self.random.choice(self.data["slugs"])}/', None, True
+        if scenario == 'author_posts':
+            return 'GET', f'/api/v1/posts/author/{self.random.choice(self.data["authors"])}/', None, True
+        if scenario == 'user':
+            return 'GET', '/api/v1/users/', None, True
+        if scenario == 'auth':
+            body = {'email': LOAD_USER_EMAIL, 'password': LOAD_USER_PASSWORD}
+            return 'POST', '/api/v1/users/auth/', body, False
+        if scenario == 'register':
+            email = f'load-{uuid.uuid4().hex}@example.com'
+            body = {'email': email, 'password': 'load-password', 'confirm_password': 'load-password'}
+            return 'POST', '/api/v1/users/register/', body, False
+        body = {'email': LOAD_USER_EMAIL}
+        return 'POST', '/api/v1/users/password/restore/request/', body, False
+
+    def run(self):
+        scenarios = [
+            scenario for scenario in SCENARIOS
+            if scenario not in ('post', 'author_posts') or self.data['slugs']
+        ]
+        weights = [SCENARIOS[scenario] for scenario in scenarios]
+        while time.monotonic() < self.deadline:
+            scenario = self.random.choices(scenarios, weights)[0]
+            method, path, body, auth = self.get_request(scenario)
+            start = time.perf_counter()
+            try:
+                status, server_timing, size = self.request(method, path, body, auth)
+            except (http.client.HTTPException, OSError):
+                status, server_timing, size = None, None, 0
+            self.results.append((
+                scenario,
+                status,
+                time.perf_counter() - start,
+                get_db_queries(server_timing),
+                size,
+            ))
+        if self.connection is not None:
+            self.connection.close()
+
+
+def get_db_queries(server_timing: str | None) -> int | None:
+    '''
+    Получение количества запросов к БД из заголовка Server-Timing
+
+    Args:
+        server_timing: значение заголовка
+
+    Returns:
+        Количество запросов или None
+    '''
+
+    if not server_timing:
+        return None
+    for metric in server_timing.split(','):
+        name, _, params = metric.strip().partition(';')
+        if name == 'db' and 'desc="' in params:
+            return int(params.split('desc="', 1)[1].split(' ', 1)[0])
+    return None
+
+
+def summarize(results: list, duration: float) -> dict:
+    '''
+    Расчет статистики по результатам запросов
+
+    Args:
+        results: список кортежей из сценария, статуса, времени, запросов к БД и размера ответа
+        duration: длительность теста в секундах
+
+    Returns:
+        Словарь статистики
+    '''
+
+    latencies = [latency for _, _, latency, _, _ in results]
+    queries = [count for _, _, _, count, _ in results if count is not None]
+    statuses = {}
+    for _, status, _, _, _ in results:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    errors = sum(
+        1 for _, status, _, _, _ in results
+        if status is None or status >= 500
+    )
+    return {
+        'requests': len(results),
+        'errors': errors,
+        'statuses': statuses,
+        'throughput': len(results) / duration if duration else None,
+        'latency_ms': {
+            'mean': statistics.mean(latencies) * 1000 if latencies else None,
+            'p50': percentile(latencies, 50) * 1000 if latencies else None,
+            'p95': percentile(latencies, 95) * 1000 if latencies else None,
+            'p99': percentile(latencies, 99) * 1000 if latencies else None,
+            'max': max(latencies) * 1000 if latencies else None,
+        },
+        'db_queries': {
+            'mean': statistics.mean(queries) if queries else None,
+            'max': max(queries) if queries else None,
+        },
+        'response_bytes_mean': (
+            statistics.mean(size for _, _, _, _, size in results) if results else None
+        ),
+    }
+
+
+def get_token(port: int) -> str:
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    try:
+        connection.request(
+            'POST',
+            '/api/v1/users/auth/',
+            body=json.dumps({'email': LOAD_USER_EMAIL, 'password': LOAD_USER_PASSWORD}),
+            headers={'Content-Type': 'application/json'},
+        )
+        response = connection.getresponse()
+        data = json.loads(response.read())
+    finally:
+        connection.close()
+    if response.status != 200:
+        raise RuntimeError(f'Не удалось получить токен: {response.status} {data}')
+    return data['data']['token']
+
+
+def run_load(args, data: dict, sink: SMTPSink) -> dict:
+    '''
+    Запуск сервера, отправки писем и нагрузки
+
+    Args:
+        args: аргументы командной строки
+        data: данные для запросов
+        sink: SMTP заглушка
+
+    Returns:
+        Словарь результатов
+    '''
+
+    port = get_free_port()
+    env = dict(
+        os.environ,
+        SERVER_TIMING_ENABLED='True',
+        RATE_LIMIT_ENABLED='False',
+        NPLUSONE_MODE='off',
+        LOG_LEVEL='WARNING',
+        EMAIL_HOST=sink.host,
+        EMAIL_PORT=str(sink.port),
+        EMAIL_USE_TLS='False',
+        EMAIL_COALESCE_WINDOW='0',
+        ASYNC_VIEWS_ENABLED=str(args.server == 'uvicorn'),
+    )
+    server = subprocess.Popen(
+        get_server_command(args.server, port, args.workers),
+        cwd=BASE_DIR,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    outbox = subprocess.Popen(
+        [sys.executable, 'manage.py', 'send_outbox', '--poll-interval', '0.5'],
+        cwd=BASE_DIR,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_for_server(port, server)
+        token = get_token(port)
+
+        warmup = time.monotonic() + args.warmup
+        workers = [
+            Worker(port, token, data, warmup, seed)
+            for seed in range(args.concurrency)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        start = time.monotonic()
+        deadline = start + args.duration
+        workers = [
+            Worker(port, token, data, deadline, args.seed + seed)
+            for seed in range(args.concurrency)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        duration = time.monotonic() - start
+        peak_rss = get_peak_rss(server.pid)
+    finally:
+        for process in (server, outbox):
+            process.terminate()
+        for process in (server, outbox):
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    results = list(itertools.chain.from_iterable(worker.results for worker in workers))
+    by_scenario = {}
+    for result in results:
+        by_scenario.setdefault(result[0], []).append(result)
+    return {
+        'server': args.server,
+        'concurrency': args.concurrency,
+        'duration': duration,
+        'peak_rss_kb': peak_rss,
+        'emails_delivered': len(sink.messages),
+        'total': summarize(results, duration),
+        'scenarios': {
+            scenario: summarize(items, duration)
+            for scenario, items in sorted(by_scenario.items())
+        },
+    }
+
+
+def get_default_server() -> str:
+    try:
+        import gunicorn  # noqa: F401
+    except ImportError:
+        return 'runserver'
+    return 'gunicorn'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Нагрузочный тест HTTP API')
+    parser.add_argument(
+        '--server',
+        choices=['gunicorn', 'runserver', 'uvicorn'],
+        default=get_default_server(),
+    )
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=30)
+    parser.add_argument('--warmup', type=float, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--setup', action='store_true', help='Применить миграции и загрузить шаблоны писем')
+    parser.add_argument('--posts', type=int, default=0, help='Сгенерировать посты перед тестом')
+    args = parser.parse_args()
+
+    if args.server != 'runserver' and find_spec(args.server) is None:
+        raise SystemExit(f'Требуется пакет {args.server}')
+
+    setup_django()
+    data = prepare_data(setup=args.setup, posts=args.posts)
+
+    sink = SMTPSink().start()
+    try:
+        results = run_load(args, data, sink)
+    finally:
+        sink.stop()
+    results['commit'] = get_commit()
+    report('load', results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+'''
+Стоимость ColorFormatter.format на одну запись лога: поиск цепочки вызовов
+через inspect.stack() против обхода sys._getframe и без цепочки
+
+Запуск: python -m benchmarks.log_formatter
+'''
+import inspect
+import logging
+
+from benchmarks.base import (
+    setup_django,
+    measure,
+    report,
+)
+
+
+STACK_DEPTH = 40
+
+
+def call_nested(depth: int, func):
+    if depth:
+        return call_nested(depth - 1, func)
+    return service_outer(func)
+
+
+def service_outer(func):
+    return service_inner(func)
+
+
+def service_inner(func):
+    return func()
+
+
+def main():
+    setup_django()
+
+    from utils.logger import ColorFormatter
+
+    class InspectColorFormatter(ColorFormatter):
+        def format(self, record):
+            stack = inspect.stack()
+            function_hierarchy = []
+            for frame in stack[1:]:
+                if frame.filename == record.pathname:
+                    function_hierarchy.append(frame.function)
+            if function_hierarchy:
+                record.funcName = ' -> '.join(function_hierarchy)
+            return logging.Formatter.format(self, record)
+
+    fmt = '%(asctime)s %(levelname)s %(message)s %(name)s.%(funcName)s'
+    formatters = {
+        'inspect_stack': InspectColorFormatter(fmt),
+        'getframe': ColorFormatter(fmt),
+        'disabled': ColorFormatter(fmt, function_hierarchy=False),
+    }
+
+    def make_record():
+        return logging.LogRecord(
+            name='posts_api.services',
+            level=logging.INFO,
+            pathname=__file__,
+            lineno=1,
+            msg='Получение списка всех постов',
+            args=None,
+            exc_info=None,
+            func='service_inner',
+        )
+
+    results = {}
+    for name, formatter in formatters.items():
+        results[name] = call_nested(
+            STACK_DEPTH,
+            lambda: measure(
+                lambda: formatter.format(make_record()),
+                number=200 if name == 'inspect_stack' else 20000,
+            ),
+        )
+    report('log_formatter', results)
+
+
+if __name__ == '__main__':
+    main()
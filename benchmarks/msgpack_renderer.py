@@ -0,0 +1,65 @@
+'''
+Сравнение размера и времени кодирования/декодирования ответа get_posts
+в JSON и MessagePack
+
+Запуск: python -m benchmarks.msgpack_renderer
+'''
+import gzip
+import io
+
+from benchmarks.base import (
+    setup_django,
+    measure,
+    report,
+)
+from benchmarks.json_renderer import (
+    POST_COUNTS,
+    get_response_data,
+)
+
+
+def main():
+    setup_django()
+
+    from rest_framework.parsers import JSONParser
+    from rest_framework.renderers import JSONRenderer
+    from utils.parsers import (
+        MessagePackParser,
+        ORJSONParser,
+    )
+    from utils.renderers import (
+        MessagePackRenderer,
+        ORJSONRenderer,
+        msgpack,
+    )
+
+    if msgpack is None:
+        raise SystemExit('Требуется пакет msgpack')
+
+    formats = {
+        'json': (JSONRenderer(), JSONParser()),
+        'orjson': (ORJSONRenderer(), ORJSONParser()),
+        'msgpack': (MessagePackRenderer(), MessagePackParser()),
+    }
+
+    results = {}
+    for count in POST_COUNTS:
+        data = get_response_data(count)
+        number = max(10000 // count, 10)
+        results[f'posts_{count}'] = {}
+        for name, (renderer, parser) in formats.items():
+            body = renderer.render(data)
+            results[f'posts_{count}'][name] = {
+                'size': len(body),
+                'gzip_size': len(gzip.compress(body, compresslevel=6)),
+                'encode': measure(lambda renderer=renderer: renderer.render(data), number=number),
+                'decode': measure(
+                    lambda parser=parser, body=body: parser.parse(io.BytesIO(body)),
+                    number=number,
+                ),
+            }
+    report('msgpack_renderer', results)
+
+
+if __name__ == '__main__':
+    main()
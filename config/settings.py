@@ -11,6 +11,8 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 import os
 import sys
+import tempfile
+from importlib.util import find_spec
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -55,11 +57,16 @@ PROJECT_APPS = [
     'users_api',
     'notifications',
     'posts_api',
+    'monitoring',
 ]
 
 INSTALLED_APPS = DJANGO_APPS + PROJECT_APPS
 
 MIDDLEWARE = [
+    'monitoring.middleware.RequestLogMiddleware',
+    'monitoring.middleware.ServerTimingMiddleware',
+    'monitoring.middleware.NPlusOneMiddleware',
+    'utils.compression.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -67,6 +74,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'utils.db_router.ReplicaStickinessMiddleware',
+    'monitoring.middleware.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'config.urls'
@@ -106,18 +115,94 @@ DB_HOST = os.environ.get(
     'DB_HOST', 'localhost'
 )
 
+# Соединения с базой: без пула соединение потока живет DB_CONN_MAX_AGE секунд
+# и проверяется перед использованием в новом запросе. С DB_POOL_ENABLED соединения
+# процесса берутся из пула размером DB_POOL_MAX_SIZE и возвращаются в него после
+# каждого запроса, при занятом пуле запрос ждет соединение до DB_POOL_TIMEOUT секунд.
+# Соединение, простаивавшее дольше DB_POOL_CHECK_INTERVAL секунд, проверяется перед выдачей
+
+DB_POOL_ENABLED = os.environ.get(
+    'DB_POOL_ENABLED', 'False'
+) == 'True'
+DB_POOL_MAX_SIZE = int(os.environ.get(
+    'DB_POOL_MAX_SIZE', 10
+))
+DB_POOL_TIMEOUT = float(os.environ.get(
+    'DB_POOL_TIMEOUT', 5
+))
+DB_POOL_CHECK_INTERVAL = float(os.environ.get(
+    'DB_POOL_CHECK_INTERVAL', 30
+))
+DB_CONN_MAX_AGE = int(os.environ.get(
+    'DB_CONN_MAX_AGE', 60
+))
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql_psycopg2',
+        'ENGINE': 'utils.db_pool' if DB_POOL_ENABLED else 'django.db.backends.postgresql_psycopg2',
         'NAME': DB_NAME,
         'USER': DB_USER,
         'PASSWORD': DB_PASSWORD,
         'HOST': DB_HOST,
         'PORT': '5432',
+        'CONN_MAX_AGE': 0 if DB_POOL_ENABLED else DB_CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+# Кэш: default - кэш процесса, shared - кэш, общий для всех процессов сервиса
+# (версия реестра писем, привязка к основной базе после записи, счетчики rate limit,
+# окно объединения писем). shared хранится в Redis по REDIS_URL (требует пакет redis),
+# без REDIS_URL shared тоже в памяти процесса и подходит только для одного процесса
+
+REDIS_URL = os.environ.get(
+    'REDIS_URL', ''
+)
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+        'KEY_PREFIX': 'drf_posts',
+    } if REDIS_URL else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'shared',
+    },
+}
+
+# Реплики для чтения: хосты через запятую, остальные параметры как у основной базы.
+# Чтение в use_replica уходит на реплики, пользователь после записи читает с основной
+# базы REPLICA_STICKY_SECONDS секунд. Отметки о записи хранятся в общем кэше
+# REPLICA_STICKY_CACHE, без REDIS_URL сервис с репликами не запускается
+
+DB_REPLICA_HOSTS = [
+    host.strip() for host in os.environ.get('DB_REPLICA_HOSTS', '').split(',')
+    if host.strip()
+]
+DATABASE_REPLICAS = []
+for index, host in enumerate(DB_REPLICA_HOSTS):
+    alias = f'replica_{index}'
+    DATABASES[alias] = dict(
+        DATABASES['default'],
+        HOST=host,
+        TEST={'MIRROR': 'default'},
+    )
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = [
+    'utils.db_router.ReplicaRouter',
+]
+REPLICA_STICKY_SECONDS = int(os.environ.get(
+    'REPLICA_STICKY_SECONDS', 10
+))
+REPLICA_STICKY_CACHE = 'shared'
+
 # DRF
+# NUM_PROXIES - количество прокси перед сервисом, адрес клиента для rate limit берется
+# из X-Forwarded-For только при NUM_PROXIES больше 0, иначе из REMOTE_ADDR
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
@@ -126,6 +211,57 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'utils.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'utils.parsers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+    'NUM_PROXIES': int(os.environ.get(
+        'NUM_PROXIES', 0
+    )),
+}
+
+# Асинхронные представления ленты, поста и постов автора для запуска под ASGI
+# (uvicorn config.asgi:application). Под ASGI соединения с базой не переживают
+# запрос, поэтому вместе с ними стоит включать DB_POOL_ENABLED
+
+ASYNC_VIEWS_ENABLED = os.environ.get(
+    'ASYNC_VIEWS_ENABLED', 'False'
+) == 'True'
+
+# MessagePack для клиентов с Accept: application/msgpack, требует пакет msgpack
+
+MSGPACK_ENABLED = os.environ.get(
+    'MSGPACK_ENABLED', 'True'
+) == 'True' and find_spec('msgpack') is not None
+
+if MSGPACK_ENABLED:
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'].append('utils.renderers.MessagePackRenderer')
+    REST_FRAMEWORK['DEFAULT_PARSER_CLASSES'].append('utils.parsers.MessagePackParser')
+
+# Rate limiting
+# memory - корзины в памяти процесса, cache - общие счетчики в фиксированных окнах
+# в кэше RATE_LIMIT_CACHE (требует REDIS_URL)
+
+RATE_LIMIT_ENABLED = os.environ.get(
+    'RATE_LIMIT_ENABLED', 'True'
+) == 'True'
+RATE_LIMIT_BACKEND = os.environ.get(
+    'RATE_LIMIT_BACKEND', 'memory'
+)
+RATE_LIMIT_CACHE = 'shared'
+
+RATE_LIMITS = {
+    'auth_ip': '30/min',
+    'auth_email': '10/min',
+    'register_ip': '10/min',
+    'register_email': '3/min',
+    'password_restore_request_ip': '10/min',
+    'password_restore_request_email': '3/min',
 }
 
 # Password validation
@@ -178,6 +314,10 @@ MEDIA_URL = "media/"
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Тесты запускаются с временной директорией METRICS_DIR
+
+TEST_RUNNER = 'utils.test_runner.TestRunner'
+
 
 # Email settings
 
@@ -194,7 +334,49 @@ EMAIL_HOST_PASSWORD = os.environ.get(
 EMAIL_PORT = os.environ.get(
     'EMAIL_PORT', 587
 )
-EMAIL_USE_TLS = True
+EMAIL_USE_TLS = os.environ.get(
+    'EMAIL_USE_TLS', 'True'
+) == 'True'
+
+# Email outbox
+
+EMAIL_OUTBOX_BATCH_SIZE = int(os.environ.get(
+    'EMAIL_OUTBOX_BATCH_SIZE', 100
+))
+EMAIL_OUTBOX_MAX_ATTEMPTS = int(os.environ.get(
+    'EMAIL_OUTBOX_MAX_ATTEMPTS', 5
+))
+EMAIL_OUTBOX_RETRY_DELAY = 60
+EMAIL_OUTBOX_MAX_RETRY_DELAY = 60 * 60
+EMAIL_OUTBOX_POLL_INTERVAL = 5
+
+# Срок, на который письмо захватывается для отправки, после него письмо
+# отправляется повторно, если процесс отправки не сохранил результат
+
+EMAIL_OUTBOX_LEASE_SECONDS = 5 * 60
+
+# Кэш шаблонов писем и настроек email. Изменения из других процессов отслеживаются
+# по версии реестра в EMAIL_REGISTRY_CACHE, если этот кэш в памяти процесса (нет REDIS_URL),
+# изменения из других процессов применяются через EMAIL_REGISTRY_LOCAL_TTL секунд
+
+EMAIL_REGISTRY_CACHE = 'shared'
+EMAIL_REGISTRY_CHECK_INTERVAL = 1
+EMAIL_REGISTRY_LOCAL_TTL = 60
+
+# Срок действия ссылок подтверждения email и восстановления пароля, в секундах
+
+EMAIL_LINK_MAX_AGE = int(os.environ.get(
+    'EMAIL_LINK_MAX_AGE', 60 * 60 * 24
+))
+
+# Окно объединения повторных писем подтверждения и восстановления пароля, в секундах.
+# Без REDIS_URL окно действует в пределах процесса, и другой процесс может отправить
+# повторное письмо
+
+EMAIL_COALESCE_CACHE = 'shared'
+EMAIL_COALESCE_WINDOW = int(os.environ.get(
+    'EMAIL_COALESCE_WINDOW', 300
+))
 
 # site
 
@@ -205,6 +387,152 @@ SITE_PROTOCOL = os.environ.get(
     'SITE_PROTOCOL', 'http'
 )
 
+# logging
+# Цепочка вызовов функций в логах, в production можно отключить
+
+LOG_FUNCTION_HIERARCHY = os.environ.get(
+    'LOG_FUNCTION_HIERARCHY', 'True'
+) == 'True'
+LOG_FUNCTION_HIERARCHY_DEPTH = 64
+
+# Записи логов передаются через ограниченную очередь в отдельный поток,
+# при переполнении очереди: drop - запись отбрасывается и учитывается, block - ожидание
+
+LOG_LEVEL = os.environ.get(
+    'LOG_LEVEL', 'DEBUG'
+)
+LOG_QUEUE_SIZE = int(os.environ.get(
+    'LOG_QUEUE_SIZE', 10000
+))
+LOG_QUEUE_OVERFLOW = os.environ.get(
+    'LOG_QUEUE_OVERFLOW', 'drop'
+)
+
+# color - цветной вывод для разработки, json - структурированные логи
+# LOG_SAMPLE_RATE - доля запросов, для которых пишутся INFO логи (WARNING и выше пишутся всегда)
+
+LOG_FORMAT = os.environ.get(
+    'LOG_FORMAT', 'color'
+)
+LOG_SAMPLE_RATE = float(os.environ.get(
+    'LOG_SAMPLE_RATE', 1
+))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'color': {
+            '()': 'utils.logger.ColorFormatter',
+            'fmt': '%(asctime)s %(levelname)s %(message)s %(name)s.%(funcName)s',
+            'function_hierarchy': LOG_FUNCTION_HIERARCHY,
+            'max_depth': LOG_FUNCTION_HIERARCHY_DEPTH,
+        },
+        'json': {
+            '()': 'utils.logger.JSONFormatter',
+        },
+    },
+    'filters': {
+        'request_context': {
+            '()': 'utils.logger.RequestContextFilter',
+        },
+    },
+    'handlers': {
+        'queue': {
+            'class': 'utils.logger.AsyncQueueHandler',
+            'formatter': LOG_FORMAT,
+            'filters': ['request_context'],
+            'maxsize': LOG_QUEUE_SIZE,
+            'overflow': LOG_QUEUE_OVERFLOW,
+        },
+    },
+    'loggers': {
+        app: {
+            'handlers': ['queue'],
+            'level': LOG_LEVEL,
+            'propagate': False,
+        }
+        for app in PROJECT_APPS
+    },
+}
+
+# Замеры этапов обработки запроса (авторизация, сервисы, сериализация, рендеринг)
+# в заголовке Server-Timing и в логе запроса, при отключении middleware не подключается
+
+SERVER_TIMING_ENABLED = os.environ.get(
+    'SERVER_TIMING_ENABLED', str(DEBUG)
+) == 'True'
+
+# Метрики в формате Prometheus по адресу /metrics/, счетчики каждого процесса
+# хранятся в отдельном файле в METRICS_DIR и суммируются при запросе метрик.
+# Файлы завершившихся процессов переносятся в общий архив, поэтому директория
+# не должна быть общей для нескольких хостов или контейнеров. Директорию нужно
+# очищать при перезапуске сервиса. С METRICS_TOKEN метрики отдаются только
+# с заголовком Authorization: Bearer <METRICS_TOKEN>, без него только сотрудникам
+
+METRICS_ENABLED = os.environ.get(
+    'METRICS_ENABLED', 'False'
+) == 'True'
+METRICS_DIR = os.environ.get(
+    'METRICS_DIR', os.path.join(tempfile.gettempdir(), 'drf_posts_metrics')
+)
+METRICS_TOKEN = os.environ.get(
+    'METRICS_TOKEN', ''
+)
+
+# Профилирование отдельных запросов по подписанному заголовку X-Profile
+# (значение выдает python manage.py profiles --token) или по параметру ?profile
+# для сотрудников. Хранятся последние PROFILE_MAX_FILES профилей
+
+PROFILING_ENABLED = os.environ.get(
+    'PROFILING_ENABLED', 'False'
+) == 'True'
+PROFILE_DIR = os.environ.get(
+    'PROFILE_DIR', os.path.join(tempfile.gettempdir(), 'drf_posts_profiles')
+)
+PROFILE_MAX_FILES = 50
+PROFILE_TOKEN_MAX_AGE = 60 * 60
+
+# Поиск N+1 запросов: одинаковые по форме SELECT запросы, выполненные в одном запросе
+# больше NPLUSONE_THRESHOLD раз. off - отключено, warn - предупреждение в лог, raise - исключение
+
+NPLUSONE_MODE = os.environ.get(
+    'NPLUSONE_MODE', 'warn' if DEBUG else 'off'
+)
+NPLUSONE_THRESHOLD = int(os.environ.get(
+    'NPLUSONE_THRESHOLD', 5
+))
+
+# Сжатие ответов по Accept-Encoding. br и zstd используются при установленных
+# пакетах brotli и zstandard, при равных весах клиента выбирается первая кодировка списка.
+# Сжатые тела хранятся в памяти процесса и переиспользуются для одинаковых ответов.
+# text/html не сжимается: HTML страницы (админка, BrowsableAPI) содержат CSRF токен
+# сессии рядом с данными запроса, и сжатие открывает их для атаки BREACH. Ответы API
+# авторизуются заголовком, который браузер не подставляет в чужие запросы
+
+COMPRESSION_ENABLED = os.environ.get(
+    'COMPRESSION_ENABLED', 'True'
+) == 'True'
+COMPRESSION_ENCODINGS = [
+    'br',
+    'zstd',
+    'gzip',
+]
+COMPRESSION_LEVELS = {
+    'br': 4,
+    'zstd': 3,
+    'gzip': 6,
+}
+COMPRESSION_MIN_SIZE = 1024
+COMPRESSION_CONTENT_TYPES = [
+    'application/json',
+    'application/msgpack',
+    'text/plain',
+    'text/css',
+    'text/javascript',
+]
+COMPRESSION_CACHE_MAX_BYTES = 16 * 1024 * 1024
+
 # fixtures
 
 FIXTURE_DIRS = (
@@ -27,4 +27,5 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/v1/users/', include('users_api.urls')),
     path('api/v1/posts/', include('posts_api.urls')),
+    path('metrics/', include('monitoring.urls')),
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
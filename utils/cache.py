@@ -0,0 +1,33 @@
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.cache.backends.memcached import BaseMemcachedCache
+from django.core.cache.backends.redis import RedisCache
+
+
+def is_process_local(alias: str) -> bool:
+    '''
+    Проверка, что кэш хранится в памяти процесса и не виден другим процессам сервиса
+
+    Args:
+        alias: название кэша из CACHES
+
+    Returns:
+        Флаг
+    '''
+
+    return isinstance(caches[alias], (LocMemCache, DummyCache))
+
+
+def has_atomic_counters(alias: str) -> bool:
+    '''
+    Проверка, что кэш общий для процессов и увеличивает счетчики (incr) атомарно
+
+    Args:
+        alias: название кэша из CACHES
+
+    Returns:
+        Флаг
+    '''
+
+    return isinstance(caches[alias], (RedisCache, BaseMemcachedCache))
@@ -0,0 +1,318 @@
+import hashlib
+import threading
+import zlib
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils.cache import patch_vary_headers
+
+from monitoring.metrics import cache_requests
+from monitoring.timing import stage
+from utils.middleware import HybridMiddleware
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+class GzipCompressor:
+    name = 'gzip'
+
+    def __init__(self, level: int):
+        self.level = level
+
+    def make(self):
+        # wbits=31 - формат gzip с нулевым временем, сжатие детерминировано
+        return zlib.compressobj(self.level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        compressobj = self.make()
+        return compressobj.compress(data) + compressobj.flush()
+
+    def stream(self):
+        compressobj = self.make()
+        chunk = yield b''
+        while chunk is not None:
+            chunk = yield compressobj.compress(chunk) + compressobj.flush(zlib.Z_SYNC_FLUSH)
+        yield compressobj.flush()
+
+
+class BrotliCompressor:
+    name = 'br'
+
+    def __init__(self, level: int):
+        self.level = level
+
+    def compress(self, data: bytes) -> bytes:
+        return brotli.compress(data, quality=self.level)
+
+    def stream(self):
+        compressor = brotli.Compressor(quality=self.level)
+        chunk = yield b''
+        while chunk is not None:
+            chunk = yield compressor.process(chunk) + compressor.flush()
+        yield compressor.finish()
+
+
+class ZstdCompressor:
+    name = 'zstd'
+
+    def __init__(self, level: int):
+        self.level = level
+        self.compressor = zstandard.ZstdCompressor(level=level)
+
+    def compress(self, data: bytes) -> bytes:
+        return self.compressor.compress(data)
+
+    def stream(self):
+        compressobj = zstandard.ZstdCompressor(level=self.level).compressobj()
+        chunk = yield b''
+        while chunk is not None:
+            chunk = yield compressobj.compress(chunk) + compressobj.flush(
+                zstandard.COMPRESSOBJ_FLUSH_BLOCK,
+            )
+        yield compressobj.flush()
+
+
+COMPRESSORS = {
+    'gzip': (GzipCompressor, zlib),
+    'br': (BrotliCompressor, brotli),
+    'zstd': (ZstdCompressor, zstandard),
+}
+
+
+def get_compressors(encodings: list, levels: dict) -> dict:
+    '''
+    Получение компрессоров для доступных кодировок в порядке предпочтения
+
+    Args:
+        encodings: кодировки в порядке предпочтения
+        levels: уровни сжатия по кодировкам
+
+    Returns:
+        Словарь из названия кодировки и компрессора
+    '''
+
+    compressors = {}
+    for encoding in encodings:
+        compressor_class, module = COMPRESSORS[encoding]
+        if module is not None:
+            compressors[encoding] = compressor_class(level=levels[encoding])
+    return compressors
+
+
+def parse_accept_encoding(header: str) -> dict:
+    '''
+    Разбор заголовка Accept-Encoding
+
+    Args:
+        header: значение заголовка
+
+    Returns:
+        Словарь из кодировки и ее веса
+    '''
+
+    accepted = {}
+    for item in header.split(','):
+        encoding, _, params = item.partition(';')
+        encoding = encoding.strip().lower()
+        if not encoding:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[encoding] = quality
+    return accepted
+
+
+def choose_encoding(header: str, encodings) -> str | None:
+    '''
+    Выбор кодировки ответа, при равных весах клиента учитывается порядок encodings
+
+    Args:
+        header: значение заголовка Accept-Encoding
+        encodings: доступные кодировки в порядке предпочтения
+
+    Returns:
+        Кодировка или None
+    '''
+
+    accepted = parse_accept_encoding(header)
+    default = accepted.get('*', 0.0)
+    best, best_quality = None, 0.0
+    for encoding in encodings:
+        quality = accepted.get(encoding, default)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+class CompressedCache:
+    '''
+    Сжатые тела ответов по кодировке и хэшу исходного тела, чтобы
+    одинаковые ответы (лента без изменений) не сжимались повторно
+    '''
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple) -> bytes | None:
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def set(self, key: tuple, value: bytes) -> None:
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._items:
+                return
+            self._items[key] = value
+            self.size += len(value)
+            while self.size > self.max_bytes:
+                _, removed = self._items.popitem(last=False)
+                self.size -= len(removed)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self.size = 0
+
+
+class CompressionMiddleware(HybridMiddleware):
+    '''
+    Сжатие ответов gzip, brotli или zstd по заголовку Accept-Encoding
+
+    Сжимаются ответы с типом из COMPRESSION_CONTENT_TYPES размером от
+    COMPRESSION_MIN_SIZE байт. Потоковые ответы сжимаются по частям.
+    '''
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'COMPRESSION_ENABLED', False):
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+        self.compressors = get_compressors(
+            encodings=settings.COMPRESSION_ENCODINGS,
+            levels=settings.COMPRESSION_LEVELS,
+        )
+        self.min_size = settings.COMPRESSION_MIN_SIZE
+        self.content_types = frozenset(settings.COMPRESSION_CONTENT_TYPES)
+        self.cache = CompressedCache(max_bytes=settings.COMPRESSION_CACHE_MAX_BYTES)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        response = self.get_response(request)
+        return self.process_response(request, response)
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        return self.process_response(request, response)
+
+    def is_compressible(self, response) -> bool:
+        if response.has_header('Content-Encoding'):
+            return False
+        content_type = response.get('Content-Type', '').split(';', 1)[0].strip().lower()
+        if content_type not in self.content_types:
+            return False
+        if response.streaming:
+            return True
+        return len(response.content) >= self.min_size
+
+    def process_response(self, request, response):
+        if not self.is_compressible(response):
+            return response
+
+        # ответ зависит от Accept-Encoding, даже если клиент не поддерживает сжатие
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = choose_encoding(
+            header=request.META.get('HTTP_ACCEPT_ENCODING', ''),
+            encodings=self.compressors,
+        )
+        if encoding is None:
+            return response
+        compressor = self.compressors[encoding]
+
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = self.compress_async_stream(
+                    compressor=compressor,
+                    chunks=response.streaming_content,
+                )
+            else:
+                response.streaming_content = self.compress_stream(
+                    compressor=compressor,
+                    chunks=response.streaming_content,
+                )
+            del response.headers['Content-Length']
+        else:
+            with stage('compress'):
+                compressed = self.compress(compressor, response.content)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(compressed))
+
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = f'W/{etag}'
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+    def compress(self, compressor, content: bytes) -> bytes:
+        '''
+        Сжатие тела ответа с повторным использованием ранее сжатых тел
+
+        Args:
+            compressor: компрессор
+            content: тело ответа
+
+        Returns:
+            Сжатое тело
+        '''
+
+        key = (compressor.name, hashlib.blake2b(content, digest_size=16).digest())
+        compressed = self.cache.get(key)
+        if compressed is not None:
+            cache_requests.inc(cache='compression', result='hit')
+            return compressed
+        cache_requests.inc(cache='compression', result='miss')
+        compressed = compressor.compress(content)
+        self.cache.set(key, compressed)
+        return compressed
+
+    @staticmethod
+    def compress_stream(compressor, chunks):
+        stream = compressor.stream()
+        next(stream)
+        for chunk in chunks:
+            data = stream.send(chunk)
+            if data:
+                yield data
+        yield stream.send(None)
+
+    @staticmethod
+    async def compress_async_stream(compressor, chunks):
+        stream = compressor.stream()
+        next(stream)
+        async for chunk in chunks:
+            data = stream.send(chunk)
+            if data:
+                yield data
+        yield stream.send(None)
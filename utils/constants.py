@@ -6,3 +6,8 @@ EMAIL_TYPES = (
     (CONFIRM_EMAIL, 'Подтверждение адреса электронной почты'),
     (PASSWORD_RESTORE, 'Восстановление пароля'),
 )
+
+EMAIL_PLACEHOLDERS = {
+    CONFIRM_EMAIL: ('url',),
+    PASSWORD_RESTORE: ('url',),
+}
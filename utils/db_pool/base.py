@@ -0,0 +1,56 @@
+from django.conf import settings
+from django.db.backends.postgresql import base
+from django.db.backends.postgresql.psycopg_any import IsolationLevel
+from django.utils.asyncio import async_unsafe
+
+from utils.db_pool.creation import DatabaseCreation
+from utils.db_pool.pool import get_pool
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    '''
+    Бэкенд PostgreSQL, который берет соединения из пула процесса и возвращает
+    их в пул при закрытии. CONN_MAX_AGE должен быть 0, чтобы соединение
+    возвращалось в пул после каждого запроса
+    '''
+
+    creation_class = DatabaseCreation
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pool = None
+
+    @async_unsafe
+    def get_new_connection(self, conn_params):
+        pool = get_pool(
+            alias=self.alias,
+            key=sorted((name, str(value)) for name, value in conn_params.items()),
+            max_size=getattr(settings, 'DB_POOL_MAX_SIZE', 10),
+            timeout=getattr(settings, 'DB_POOL_TIMEOUT', 5),
+            check_interval=getattr(settings, 'DB_POOL_CHECK_INTERVAL', 30),
+        )
+        connection = pool.acquire(
+            connect=lambda: super(DatabaseWrapper, self).get_new_connection(conn_params),
+        )
+        # уровень изоляции задается при создании соединения, для соединения из пула
+        # его нужно выставить и в этом объекте
+        self.isolation_level = IsolationLevel(
+            self.settings_dict['OPTIONS'].get('isolation_level', IsolationLevel.READ_COMMITTED),
+        )
+        self.pool = pool
+        return connection
+
+    def _close(self):
+        if self.connection is None:
+            return
+        pool, self.pool = self.pool, None
+        if pool is None or self.in_atomic_block:
+            # после закрытия внутри atomic объект хранит ссылку на соединение
+            # до отката, поэтому такое соединение в пул не возвращается
+            if pool is not None:
+                pool.discard(self.connection)
+            else:
+                super()._close()
+            return
+        with self.wrap_database_errors:
+            pool.release(self.connection)
@@ -0,0 +1,18 @@
+from django.db.backends.postgresql.creation import DatabaseCreation as BaseDatabaseCreation
+
+from utils.db_pool.pool import close_pool
+
+
+class DatabaseCreation(BaseDatabaseCreation):
+    '''
+    Закрытие свободных соединений пула перед копированием и удалением тестовой
+    базы, PostgreSQL не выполняет эти операции при открытых подключениях
+    '''
+
+    def _clone_test_db(self, suffix, verbosity, keepdb=False):
+        close_pool(self.connection.alias)
+        super()._clone_test_db(suffix, verbosity, keepdb)
+
+    def _destroy_test_db(self, test_database_name, verbosity):
+        close_pool(self.connection.alias)
+        super()._destroy_test_db(test_database_name, verbosity)
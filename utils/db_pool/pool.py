@@ -0,0 +1,265 @@
+import os
+import threading
+import time
+from collections import deque
+from typing import Callable
+
+from django.db import OperationalError
+
+from monitoring.metrics import (
+    db_pool_connections,
+    db_pool_events,
+    db_pool_max_connections,
+    db_pool_wait,
+)
+
+
+# значения connection.info.transaction_status совпадают в psycopg2 и psycopg
+TRANSACTION_STATUS_IDLE = 0
+TRANSACTION_STATUS_UNKNOWN = 4
+
+
+class PoolTimeout(OperationalError):
+    pass
+
+
+class ConnectionPool:
+    '''
+    Пул соединений процесса с базой данных
+
+    Свободные соединения выдаются в порядке LIFO, соединение, простаивавшее
+    дольше check_interval секунд, перед выдачей проверяется запросом SELECT 1.
+    Если все max_size соединений заняты, поток ждет освобождения до timeout секунд.
+    '''
+
+    def __init__(self, alias: str, max_size: int, timeout: float, check_interval: float):
+        self.alias = alias
+        self.max_size = max_size
+        self.timeout = timeout
+        self.check_interval = check_interval
+        self.size = 0
+        self.in_use = 0
+        self.pid = os.getpid()
+        self._idle = deque()
+        self._closed = False
+        self._condition = threading.Condition()
+        db_pool_max_connections.set(max_size, database=alias)
+
+    def acquire(self, connect: Callable):
+        '''
+        Получение соединения из пула
+
+        Args:
+            connect: функция создания нового соединения
+
+        Returns:
+            Соединение
+
+        Raises:
+            PoolTimeout: все соединения заняты дольше timeout секунд
+        '''
+
+        started = time.monotonic()
+        while True:
+            connection, returned_at = self._checkout(deadline=started + self.timeout)
+            if connection is None:
+                try:
+                    connection = connect()
+                except Exception:
+                    with self._condition:
+                        self.size -= 1
+                        self.in_use -= 1
+                        self._report()
+                        self._condition.notify()
+                    raise
+                db_pool_events.inc(database=self.alias, event='created')
+                break
+            if self.is_usable(connection, returned_at):
+                db_pool_events.inc(database=self.alias, event='reused')
+                break
+            self.discard(connection)
+        db_pool_wait.observe(time.monotonic() - started, database=self.alias)
+        return connection
+
+    def _checkout(self, deadline: float) -> tuple:
+        '''
+        Выбор свободного соединения или места под новое соединение
+
+        Args:
+            deadline: время окончания ожидания
+
+        Returns:
+            Кортеж из соединения и времени его возврата в пул,
+            (None, None) - нужно создать новое соединение
+        '''
+
+        with self._condition:
+            while True:
+                if self._idle:
+                    connection, returned_at = self._idle.pop()
+                    self.in_use += 1
+                    self._report()
+                    return connection, returned_at
+                if self.size < self.max_size:
+                    self.size += 1
+                    self.in_use += 1
+                    self._report()
+                    return None, None
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    db_pool_events.inc(database=self.alias, event='timeout')
+                    raise PoolTimeout(
+                        f'Нет свободных соединений в пуле {self.alias} '
+                        f'за {self.timeout} с',
+                    )
+                self._condition.wait(remaining)
+
+    def is_usable(self, connection, returned_at: float) -> bool:
+        '''
+        Проверка соединения перед выдачей
+
+        Args:
+            connection: соединение
+            returned_at: время возврата в пул
+
+        Returns:
+            Флаг
+        '''
+
+        if connection.closed:
+            return False
+        if time.monotonic() - returned_at < self.check_interval:
+            return True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+        except Exception:
+            return False
+        return True
+
+    def release(self, connection) -> None:
+        '''
+        Возврат соединения в пул, незавершенная транзакция откатывается
+
+        Args:
+            connection: соединение
+
+        Returns:
+            None
+        '''
+
+        if connection.closed:
+            self.discard(connection)
+            return
+        status = connection.info.transaction_status
+        if status == TRANSACTION_STATUS_UNKNOWN:
+            self.discard(connection)
+            return
+        if status != TRANSACTION_STATUS_IDLE:
+            try:
+                connection.rollback()
+            except Exception:
+                self.discard(connection)
+                return
+        with self._condition:
+            if not self._closed:
+                self.in_use -= 1
+                self._idle.append((connection, time.monotonic()))
+                self._report()
+                self._condition.notify()
+                return
+        self.discard(connection)
+
+    def discard(self, connection) -> None:
+        try:
+            connection.close()
+        except Exception:
+            pass
+        db_pool_events.inc(database=self.alias, event='discarded')
+        with self._condition:
+            self.size -= 1
+            self.in_use -= 1
+            self._report()
+            self._condition.notify()
+
+    def close(self) -> None:
+        '''
+        Закрытие свободных соединений, занятые закрываются при возврате
+
+        Returns:
+            None
+        '''
+
+        with self._condition:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self.size -= len(idle)
+            self._report()
+        for connection, _ in idle:
+            try:
+                connection.close()
+            except Exception:
+                pass
+
+    def _report(self) -> None:
+        db_pool_connections.set(self.in_use, database=self.alias, state='in_use')
+        db_pool_connections.set(self.size - self.in_use, database=self.alias, state='idle')
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(alias: str, key, max_size: int, timeout: float,
+             check_interval: float) -> ConnectionPool:
+    '''
+    Получение пула соединений базы. Пул пересоздается при смене параметров
+    подключения (тестовая база) и после fork, соединения родительского процесса
+    не закрываются, чтобы не разорвать их сессии
+
+    Args:
+        alias: название базы
+        key: параметры подключения
+        max_size: максимальное количество соединений
+        timeout: время ожидания свободного соединения в секундах
+        check_interval: время простоя, после которого соединение проверяется
+
+    Returns:
+        Объект ConnectionPool
+    '''
+
+    pool, pool_key = _pools.get(alias, (None, None))
+    if pool is not None and pool_key == key and pool.pid == os.getpid():
+        return pool
+    with _pools_lock:
+        pool, pool_key = _pools.get(alias, (None, None))
+        if pool is not None and pool_key == key and pool.pid == os.getpid():
+            return pool
+        if pool is not None and pool.pid == os.getpid():
+            pool.close()
+        pool = ConnectionPool(
+            alias=alias,
+            max_size=max_size,
+            timeout=timeout,
+            check_interval=check_interval,
+        )
+        _pools[alias] = (pool, key)
+        return pool
+
+
+def close_pool(alias: str) -> None:
+    '''
+    Закрытие пула соединений базы
+
+    Args:
+        alias: название базы
+
+    Returns:
+        None
+    '''
+
+    with _pools_lock:
+        pool, _ = _pools.pop(alias, (None, None))
+    if pool is not None and pool.pid == os.getpid():
+        pool.close()
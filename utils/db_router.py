@@ -0,0 +1,223 @@
+import random
+from contextlib import (
+    asynccontextmanager,
+    contextmanager,
+)
+from contextvars import ContextVar
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import (
+    ImproperlyConfigured,
+    MiddlewareNotUsed,
+)
+from django.db import connections
+
+from utils.cache import is_process_local
+from utils.middleware import HybridMiddleware
+
+
+PRIMARY = 'default'
+
+router_state = ContextVar('router_state', default=None)
+
+
+def get_sticky_key(user_pk) -> str:
+    return f'db_router:sticky:{user_pk}'
+
+
+def get_cache_alias() -> str:
+    return getattr(settings, 'REPLICA_STICKY_CACHE', 'default')
+
+
+def get_cache():
+    return caches[get_cache_alias()]
+
+
+def is_sticky(user) -> bool:
+    '''
+    Проверка, что пользователь недавно изменял данные и должен читать с основной базы
+
+    Args:
+        user: пользователь или None
+
+    Returns:
+        Флаг
+    '''
+
+    if user is None or not getattr(user, 'is_authenticated', False):
+        return False
+    return bool(get_cache().get(get_sticky_key(user.pk)))
+
+
+def mark_written(user) -> None:
+    '''
+    Закрепление чтения пользователя за основной базой на REPLICA_STICKY_SECONDS,
+    пока реплики догоняют его изменения
+
+    Args:
+        user: пользователь
+
+    Returns:
+        None
+    '''
+
+    if user is None or not getattr(user, 'is_authenticated', False):
+        return
+    get_cache().set(
+        get_sticky_key(user.pk),
+        True,
+        timeout=getattr(settings, 'REPLICA_STICKY_SECONDS', 10),
+    )
+
+
+async def ais_sticky(user) -> bool:
+    '''
+    Асинхронный вариант is_sticky
+
+    Args:
+        user: пользователь или None
+
+    Returns:
+        Флаг
+    '''
+
+    if user is None or not getattr(user, 'is_authenticated', False):
+        return False
+    return bool(await get_cache().aget(get_sticky_key(user.pk)))
+
+
+@contextmanager
+def replica_reads(enabled: bool):
+    '''
+    Включение или отключение чтения с реплик внутри блока
+
+    Args:
+        enabled: флаг чтения с реплик
+
+    Returns:
+        Контекстный менеджер
+    '''
+
+    state = router_state.get()
+    token = None
+    if state is None:
+        state = {'written': False}
+        token = router_state.set(state)
+    previous = state.get('replica', False)
+    state['replica'] = enabled
+    try:
+        yield
+    finally:
+        state['replica'] = previous
+        if token is not None:
+            router_state.reset(token)
+
+
+@contextmanager
+def use_replica(user=None):
+    '''
+    Чтение с реплик внутри блока, если они настроены, пользователь не изменял
+    данные в последние REPLICA_STICKY_SECONDS и в текущем запросе не было записи
+
+    Args:
+        user: пользователь, для которого выполняется чтение
+
+    Returns:
+        Контекстный менеджер
+    '''
+
+    enabled = bool(getattr(settings, 'DATABASE_REPLICAS', None)) and not is_sticky(user)
+    with replica_reads(enabled):
+        yield
+
+
+@asynccontextmanager
+async def ause_replica(user=None):
+    '''
+    Асинхронный вариант use_replica, закрепление пользователя проверяется
+    без блокировки цикла событий
+
+    Args:
+        user: пользователь, для которого выполняется чтение
+
+    Returns:
+        Асинхронный контекстный менеджер
+    '''
+
+    enabled = bool(getattr(settings, 'DATABASE_REPLICAS', None)) and not await ais_sticky(user)
+    with replica_reads(enabled):
+        yield
+
+
+class ReplicaRouter:
+    '''
+    Запись и чтение по умолчанию выполняются в основной базе, чтение внутри
+    use_replica вне транзакций - на случайной реплике из DATABASE_REPLICAS
+    '''
+
+    def db_for_read(self, model, **hints):
+        state = router_state.get()
+        if state is None or not state.get('replica') or state['written']:
+            return PRIMARY
+        # внутри транзакции основной базы реплика не видит ее незафиксированные изменения
+        if connections[PRIMARY].in_atomic_block:
+            return PRIMARY
+        return random.choice(settings.DATABASE_REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        state = router_state.get()
+        if state is not None:
+            state['written'] = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == PRIMARY
+
+
+class ReplicaStickinessMiddleware(HybridMiddleware):
+    '''
+    Закрепление пользователя за основной базой после запроса с записью. Отметка
+    о записи должна быть видна всем процессам сервиса, поэтому кэш в памяти
+    процесса для REPLICA_STICKY_CACHE не допускается
+    '''
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'DATABASE_REPLICAS', None):
+            raise MiddlewareNotUsed
+        if is_process_local(get_cache_alias()):
+            raise ImproperlyConfigured(
+                f'Для чтения с реплик кэш REPLICA_STICKY_CACHE ({get_cache_alias()}) '
+                f'должен быть общим для процессов сервиса, задайте REDIS_URL',
+            )
+        super().__init__(get_response)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        state = {'written': False}
+        token = router_state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            router_state.reset(token)
+        if state['written']:
+            # DRF сохраняет пользователя, прошедшего авторизацию по токену, в HttpRequest
+            mark_written(getattr(request, 'user', None))
+        return response
+
+    async def __acall__(self, request):
+        state = {'written': False}
+        token = router_state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            router_state.reset(token)
+        if state['written']:
+            # пользователь из сессии может быть еще не загружен из базы
+            await sync_to_async(mark_written)(getattr(request, 'user', None))
+        return response
@@ -1,5 +1,17 @@
-import inspect
+import copy
+import hashlib
+import json
 import logging
+import os
+import queue
+import sys
+import threading
+from contextvars import ContextVar
+from datetime import datetime
+from logging.handlers import (
+    QueueHandler,
+    QueueListener,
+)
 
 from colorama import (
     init,
@@ -29,21 +41,36 @@ class ColorFormatter(logging.Formatter):
         'CRITICAL': Fore.MAGENTA
     }
 
-    def format(self, record):
-        stack = inspect.stack()
+    def __init__(self, *args, function_hierarchy: bool = True, max_depth: int = 64, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.function_hierarchy = function_hierarchy
+        self.max_depth = max_depth
+
+    def add_function_hierarchy(self, record: logging.LogRecord) -> None:
+        '''
+        Добавление цепочки вызовов функций в запись лога
+
+        Должно вызываться в потоке, создавшем запись
 
-        function_hierarchy = []
-        record_file = record.pathname
+        Args:
+            record: запись лога
 
-        for frame in stack[1:]:
-            if frame.filename == record_file:
-                function_name = frame.function
-                function_hierarchy.append(function_name)
+        Returns:
+            None
+        '''
 
-        if len(function_hierarchy) > 1:
+        if not self.function_hierarchy or getattr(record, 'function_hierarchy', False):
+            return
+        function_hierarchy = get_function_hierarchy(
+            pathname=record.pathname,
+            max_depth=self.max_depth,
+        )
+        if function_hierarchy:
             record.funcName = " -> ".join(function_hierarchy)
-        else:
-            record.funcName = function_hierarchy[-1] if function_hierarchy else record.funcName
+        record.function_hierarchy = True
+
+    def format(self, record):
+        self.add_function_hierarchy(record)
 
         levelname = record.levelname
         if levelname in self.COLOR_CODES:
@@ -54,10 +81,204 @@ class ColorFormatter(logging.Formatter):
         return super().format(record)
 
 
+def get_function_hierarchy(pathname: str, max_depth: int = 64) -> list:
+    '''
+    Получение цепочки вызовов функций из файла, в котором создана запись лога
+
+    Обходит кадры стека через sys._getframe без чтения исходников,
+    не глубже max_depth кадров
+
+    Args:
+        pathname: путь к файлу записи лога
+        max_depth: максимальное количество просматриваемых кадров
+
+    Returns:
+        Список названий функций от внутренней к внешней
+    '''
+
+    function_hierarchy = []
+    frame = sys._getframe(1)
+    depth = 0
+    while frame is not None and depth < max_depth:
+        code = frame.f_code
+        if code.co_filename == pathname:
+            function_hierarchy.append(code.co_name)
+        frame = frame.f_back
+        depth += 1
+    return function_hierarchy
+
+
+request_context = ContextVar('request_context', default=None)
+
+LOG_RECORD_ATTRS = frozenset(
+    logging.LogRecord(None, None, '', 0, '', (), None).__dict__
+) | {
+    'message',
+    'asctime',
+    'function_hierarchy',
+}
+
+
+def is_request_sampled(request_id: str, sample_rate: float) -> bool:
+    '''
+    Детерминированное решение о записи INFO логов запроса
+
+    Args:
+        request_id: идентификатор запроса
+        sample_rate: доля записываемых запросов от 0 до 1
+
+    Returns:
+        Флаг записи
+    '''
+
+    if sample_rate >= 1:
+        return True
+    if sample_rate <= 0:
+        return False
+    digest = hashlib.blake2b(request_id.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'big') / 2 ** 64 < sample_rate
+
+
+class RequestContextFilter(logging.Filter):
+    def filter(self, record):
+        '''
+        Добавление данных запроса в запись лога и сэмплирование
+
+        Записи WARNING и выше, а также записи вне запроса не отбрасываются
+
+        Args:
+            record: запись лога
+
+        Returns:
+            Флаг записи
+        '''
+
+        context = request_context.get()
+        if context is None:
+            return True
+        record.request_id = context['request_id']
+        record.route = context.get('route')
+        return record.levelno >= logging.WARNING or context['sampled']
+
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record):
+        data = {
+            'time': datetime.fromtimestamp(record.created).astimezone().isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'function': record.funcName,
+        }
+        for key, value in record.__dict__.items():
+            if key not in LOG_RECORD_ATTRS:
+                data[key] = value
+        if record.exc_info:
+            data['exc_info'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            data['exc_info'] = record.exc_text
+        if record.stack_info:
+            data['stack_info'] = self.formatStack(record.stack_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class AsyncQueueHandler(QueueHandler):
+    DROP = 'drop'
+    BLOCK = 'block'
+
+    def __init__(self, maxsize: int = 10000, overflow: str = DROP, stream=None):
+        self.target = logging.StreamHandler(stream)
+        super().__init__(queue.Queue(maxsize))
+        self.maxsize = maxsize
+        self.overflow = overflow
+        self.dropped = 0
+        self._dropped_lock = threading.Lock()
+        self.listener = None
+        self._start_listener()
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._restart_listener)
+
+    def _start_listener(self) -> None:
+        self.listener = QueueListener(
+            self.queue,
+            self.target,
+        )
+        self.listener.start()
+
+    def _restart_listener(self) -> None:
+        self.queue = queue.Queue(self.maxsize)
+        self._start_listener()
+
+    def setFormatter(self, fmt):
+        super().setFormatter(fmt)
+        self.target.setFormatter(fmt)
+
+    def prepare(self, record):
+        '''
+        Подготовка записи к передаче в очередь
+
+        В потоке запроса собирается цепочка вызовов функций, подставляются
+        аргументы сообщения и форматируется исключение, как в QueueHandler.prepare,
+        поэтому запись в очереди не ссылается на данные запроса и кадры стека.
+        Форматирование записи откладывается до потока QueueListener
+
+        Args:
+            record: запись лога
+
+        Returns:
+            Копия записи лога
+        '''
+
+        if isinstance(self.formatter, ColorFormatter):
+            self.formatter.add_function_hierarchy(record)
+        message = record.getMessage()
+        exc_text = record.exc_text
+        if record.exc_info and not exc_text:
+            exc_text = (self.formatter or logging.Formatter()).formatException(record.exc_info)
+        record = copy.copy(record)
+        record.message = message
+        record.msg = message
+        record.args = None
+        record.exc_info = None
+        record.exc_text = exc_text
+        return record
+
+    def enqueue(self, record):
+        if self.overflow == self.BLOCK:
+            self.queue.put(record)
+            return
+
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._dropped_lock:
+                self.dropped += 1
+
+    def close(self):
+        '''
+        Запись оставшихся в очереди записей и остановка потока QueueListener
+
+        Returns:
+            None
+        '''
+
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+            if self.dropped:
+                self.target.stream.write(
+                    f'Отброшено записей лога при переполнении очереди: {self.dropped}\n'
+                )
+            self.target.flush()
+        super().close()
+
+
 def get_logger(name: str) -> logging.Logger:
     '''
     Получение логгера
 
+    Обработчики и уровни логгеров настраиваются через LOGGING в config/settings.py
+
     Args:
         name: название модуля
 
@@ -65,15 +286,119 @@ def get_logger(name: str) -> logging.Logger:
         Объект логгера
     '''
 
-    logger = logging.getLogger(name)
-    console_handler = logging.StreamHandler()
-    logger.setLevel(logging.DEBUG)
-    formatter = ColorFormatter(
-        '%(asctime)s %(levelname)s %(message)s %(name)s.%(funcName)s'
+    return logging.getLogger(name)
+
+
+LOG_MAX_VALUE_LENGTH = 300
+LOG_MAX_ITEMS = 10
+LOG_ID_KEYS = (
+    'slug',
+    'pk',
+    'id',
+    'email',
+)
+
+
+def summarize(value, max_length: int = LOG_MAX_VALUE_LENGTH, max_items: int = LOG_MAX_ITEMS) -> str:
+    '''
+    Сокращенное представление данных для логов
+
+    Списки словарей заменяются количеством и идентификаторами элементов,
+    длинные строки обрезаются до max_length символов
+
+    Args:
+        value: данные
+        max_length: максимальная длина строки
+        max_items: максимальное количество элементов списка
+
+    Returns:
+        Строка
+    '''
+
+    if isinstance(value, (list, tuple)):
+        items = value[:max_items]
+        ids = [get_item_id(item) for item in items]
+        more = ', ...' if len(value) > max_items else ''
+        if items and None not in ids:
+            text = f'[{len(value)} шт.: {", ".join(ids)}{more}]'
+        else:
+            text = f'[{", ".join(summarize_item(item, max_length, max_items) for item in items)}{more}]'
+    elif isinstance(value, dict):
+        text = '{' + ', '.join(
+            f'{key!r}: {summarize_item(item, max_length, max_items)}'
+            for key, item in value.items()
+        ) + '}'
+    else:
+        text = str(value)
+
+    if len(text) > max_length:
+        text = f'{text[:max_length]}...(+{len(text) - max_length})'
+    return text
+
+
+def summarize_item(item, max_length: int, max_items: int) -> str:
+    if isinstance(item, str):
+        return repr(str(item)[:max_length])
+    return summarize(item, max_length, max_items)
+
+
+def get_item_id(item) -> str | None:
+    '''
+    Получение идентификатора элемента списка для логов
+
+    Args:
+        item: элемент списка
+
+    Returns:
+        Идентификатор или None
+    '''
+
+    if not isinstance(item, dict):
+        return None
+    for key in LOG_ID_KEYS:
+        if key in item:
+            return str(item[key])
+    return None
+
+
+class LazyMessage:
+    __slots__ = (
+        'template',
+        'values',
+    )
+
+    def __init__(self, template: str, values: dict):
+        self.template = template
+        self.values = values
+
+    def __str__(self):
+        return self.template.format(**self.values)
+
+
+def lazy_message(logger: logging.Logger, level: int, template: str, /, **kwargs) -> LazyMessage | str:
+    '''
+    Сообщение лога, шаблон которого заполняется только при выводе записи
+
+    Если уровень level включен для logger, значения сразу сокращаются (см. summarize),
+    поэтому запись не зависит от последующих изменений данных. Подстановка в шаблон
+    откладывается до вывода записи, при отключенном уровне данные не обрабатываются
+
+    Args:
+        logger: логгер записи
+        level: уровень записи
+        template: шаблон сообщения в формате str.format
+        kwargs: данные для шаблона
+
+    Returns:
+        Объект LazyMessage или шаблон, если уровень отключен
+    '''
+
+    if not logger.isEnabledFor(level):
+        return template
+    return LazyMessage(
+        template,
+        {key: summarize(value) for key, value in kwargs.items()},
     )
-    console_handler.setFormatter(formatter)
-    logger.handlers = [console_handler]
-    return logger
 
 
 def get_log_user_data(user_data: dict) -> dict:
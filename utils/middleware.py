@@ -0,0 +1,43 @@
+from asgiref.sync import (
+    iscoroutinefunction,
+    markcoroutinefunction,
+    sync_to_async,
+)
+from django.db import connections
+
+
+class HybridMiddleware:
+    '''
+    Базовый класс middleware для синхронного и асинхронного стека: под ASGI
+    Django не переключает запрос в поток ради такого middleware. Наследник
+    реализует __call__ и __acall__, __call__ в асинхронном режиме возвращает
+    корутину __acall__
+    '''
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+
+async def aget_connections(request) -> list:
+    '''
+    Получение соединений с базой для асинхронного middleware. Соединения Django
+    привязаны к потоку, а ORM из асинхронного кода выполняет запросы в потоке
+    sync_to_async запроса, поэтому обертки запросов ставятся на его соединения
+
+    Args:
+        request: запрос
+
+    Returns:
+        Список соединений
+    '''
+
+    databases = getattr(request, '_db_connections', None)
+    if databases is None:
+        databases = request._db_connections = await sync_to_async(connections.all)()
+    return databases
@@ -0,0 +1,57 @@
+import io
+
+from django.conf import settings
+
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import (
+    BaseParser,
+    JSONParser,
+)
+
+from utils.renderers import (
+    MessagePackRenderer,
+    ORJSONRenderer,
+    msgpack,
+    orjson,
+)
+
+
+class ORJSONParser(JSONParser):
+    '''
+    Парсер JSON на orjson
+
+    Тела, которые orjson не разбирает (ошибки, целые числа больше 64 бит,
+    кодировка не UTF-8), разбираются стандартным JSONParser, поэтому
+    результат и тексты ошибок совпадают с JSONParser.
+    '''
+
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        if orjson is None or encoding.lower().replace('-', '') != 'utf8':
+            return super().parse(stream, media_type, parser_context)
+
+        data = stream.read()
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            return super().parse(io.BytesIO(data), media_type, parser_context)
+
+
+class MessagePackParser(BaseParser):
+    '''
+    Парсер тел запросов в формате MessagePack
+    '''
+
+    media_type = 'application/msgpack'
+    renderer_class = MessagePackRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        assert msgpack is not None, 'MessagePackParser requires msgpack to be installed'
+
+        try:
+            return msgpack.unpackb(stream.read(), raw=False)
+        except (ValueError, TypeError, msgpack.UnpackException) as exc:
+            raise ParseError(f'MessagePack parse error - {exc!r}')
@@ -0,0 +1,90 @@
+import re
+
+from rest_framework.renderers import (
+    BaseRenderer,
+    JSONRenderer,
+)
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+# число с дробной частью или экспонентой вне строк, совпадения внутри строк
+# только отправляют ответ в JSONRenderer
+FLOAT_PATTERN = re.compile(rb'(?:^|[\[:,])-?\d+[.e]')
+
+
+class ORJSONRenderer(JSONRenderer):
+    '''
+    Рендерер JSON на orjson с тем же результатом, что и у JSONRenderer
+
+    Отступы, ASCII вывод, некомпактный формат, данные, которые orjson
+    не умеет сериализовать, и ответы с дробными числами (orjson записывает
+    экспоненту как 1e16 вместо 1e+16 и 0.00001 вместо 1e-05) отдаются
+    стандартному JSONRenderer. Отличие одно: если в ответе нет других дробных
+    чисел, NaN и бесконечность orjson выводит как null, а JSONRenderer отклоняет
+    их ошибкой ValueError. Без установленного orjson рендерер работает как JSONRenderer.
+    '''
+
+    default = JSONEncoder().default
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None
+            or data is None
+            or self.ensure_ascii
+            or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context or {}) is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(
+                data,
+                default=self.default,
+                option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS,
+            )
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        if FLOAT_PATTERN.search(ret):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # JSONRenderer экранирует разделители строк для совместимости с JavaScript
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
+
+
+class MessagePackRenderer(BaseRenderer):
+    '''
+    Рендерер MessagePack для клиентов с заголовком Accept: application/msgpack
+
+    Даты, UUID и ленивые строки приводятся к тем же значениям, что и в JSON.
+    '''
+
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    default = JSONEncoder().default
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        assert msgpack is not None, 'MessagePackRenderer requires msgpack to be installed'
+
+        if data is None:
+            return b''
+        return msgpack.packb(
+            data,
+            default=self.default,
+            use_bin_type=True,
+            datetime=False,
+        )
@@ -0,0 +1,140 @@
+import socketserver
+import threading
+
+
+class SMTPSinkHandler(socketserver.StreamRequestHandler):
+    def reply(self, line: str) -> None:
+        self.wfile.write(f'{line}\r\n'.encode())
+
+    def read_data(self) -> bytes:
+        lines = []
+        while True:
+            line = self.rfile.readline()
+            if not line or line in (b'.\r\n', b'.\n'):
+                break
+            if line.startswith(b'..'):
+                line = line[1:]
+            lines.append(line)
+        return b''.join(lines)
+
+    def handle(self):
+        sink = self.server
+        sink.add_session()
+        mail_from, recipients = None, []
+        self.reply('220 localhost SMTP sink')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                break
+            command = line.decode(errors='replace').strip()
+            verb = command.split(' ', 1)[0].upper()
+            if verb == 'EHLO':
+                self.reply('250-localhost')
+                self.reply('250 AUTH PLAIN LOGIN')
+            elif verb == 'HELO':
+                self.reply('250 localhost')
+            elif verb == 'AUTH':
+                self.reply('235 Authentication successful')
+            elif verb == 'MAIL':
+                mail_from, recipients = command.split(':', 1)[1].strip(), []
+                self.reply('250 OK')
+            elif verb == 'RCPT':
+                recipient = command.split(':', 1)[1].strip().strip('<>')
+                if sink.rejects(recipient):
+                    self.reply('550 Mailbox unavailable')
+                else:
+                    recipients.append(recipient)
+                    self.reply('250 OK')
+            elif verb == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                sink.add_message(
+                    mail_from=mail_from,
+                    recipients=recipients,
+                    data=self.read_data(),
+                )
+                self.reply('250 OK')
+            elif verb in ('RSET', 'NOOP'):
+                self.reply('250 OK')
+            elif verb == 'QUIT':
+                self.reply('221 Bye')
+                break
+            else:
+                self.reply('502 Command not implemented')
+
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, reject: tuple = ()):
+        super().__init__((host, port), SMTPSinkHandler)
+        self.reject = reject
+        self.sessions = 0
+        self.messages = []
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def host(self) -> str:
+        return self.server_address[0]
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+    def rejects(self, recipient: str) -> bool:
+        return any(pattern in recipient for pattern in self.reject)
+
+    def add_session(self) -> None:
+        with self._lock:
+            self.sessions += 1
+
+    def add_message(self, mail_from: str, recipients: list, data: bytes) -> None:
+        with self._lock:
+            self.messages.append({
+                'mail_from': mail_from,
+                'recipients': recipients,
+                'data': data,
+            })
+
+    def start(self) -> 'SMTPSink':
+        '''
+        Запуск SMTP заглушки в фоновом потоке
+
+        Returns:
+            Объект SMTPSink
+        '''
+
+        self._thread = threading.Thread(
+            target=self.serve_forever,
+            daemon=True,
+        )
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        '''
+        Остановка SMTP заглушки
+
+        Returns:
+            None
+        '''
+
+        self.shutdown()
+        self.server_close()
+
+    def email_settings(self) -> dict:
+        '''
+        Получение настроек Django для отправки писем в заглушку
+
+        Returns:
+            Словарь настроек
+        '''
+
+        return {
+            'EMAIL_BACKEND': 'django.core.mail.backends.smtp.EmailBackend',
+            'EMAIL_HOST': self.host,
+            'EMAIL_PORT': self.port,
+            'EMAIL_USE_TLS': False,
+            'EMAIL_USE_SSL': False,
+        }
@@ -0,0 +1,22 @@
+import tempfile
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+
+
+class TestRunner(DiscoverRunner):
+    '''
+    Запуск тестов с временной директорией файлов метрик, чтобы тесты
+    не смешивали свои значения с метриками запущенного сервиса
+    '''
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._metrics_dir = tempfile.TemporaryDirectory(prefix='metrics_')
+        self._metrics_dir_setting = settings.METRICS_DIR
+        settings.METRICS_DIR = self._metrics_dir.name
+
+    def teardown_test_environment(self, **kwargs):
+        settings.METRICS_DIR = self._metrics_dir_setting
+        self._metrics_dir.cleanup()
+        super().teardown_test_environment(**kwargs)
@@ -0,0 +1,267 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+
+from rest_framework.throttling import BaseThrottle
+
+from utils.cache import has_atomic_counters
+
+
+RATE_PERIODS = {
+    's': 1,
+    'm': 60,
+    'h': 60 * 60,
+    'd': 60 * 60 * 24,
+}
+
+
+def parse_rate(rate: str | None) -> tuple[int, float] | None:
+    '''
+    Разбор лимита вида "10/min"
+
+    Args:
+        rate: лимит
+
+    Returns:
+        Кортеж из емкости корзины и скорости пополнения (токенов в секунду) или None
+    '''
+
+    if not rate:
+        return None
+    num, period = rate.split('/')
+    capacity = int(num)
+    duration = RATE_PERIODS[period[0]]
+    return capacity, capacity / duration
+
+
+class MemoryBucketStorage:
+    def __init__(self, max_entries: int = 100000):
+        self.max_entries = max_entries
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def consume(self, key: str, capacity: int, refill_rate: float) -> float:
+        '''
+        Списание токена из корзины
+
+        Args:
+            key: ключ корзины
+            capacity: емкость корзины
+            refill_rate: скорость пополнения
+
+        Returns:
+            Время ожидания в секундах, 0 если токен списан
+        '''
+
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * refill_rate)
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0
+            else:
+                wait = (1 - tokens) / refill_rate
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_entries:
+                self._buckets.popitem(last=False)
+        return wait
+
+    def clear(self) -> None:
+        '''
+        Очистка всех корзин
+
+        Returns:
+            None
+        '''
+
+        with self._lock:
+            self._buckets.clear()
+
+
+class CacheBucketStorage:
+    '''
+    Общие для процессов лимиты в кэше: счетчик запросов в фиксированном окне
+    длиной capacity / refill_rate секунд. Счетчик увеличивается атомарным incr,
+    поэтому параллельные процессы не списывают один и тот же запрос дважды
+    '''
+
+    key_prefix = 'rate_limit'
+
+    def __init__(self, alias: str = 'default'):
+        if not has_atomic_counters(alias):
+            raise ImproperlyConfigured(
+                f'Для RATE_LIMIT_BACKEND=cache кэш RATE_LIMIT_CACHE ({alias}) должен быть '
+                f'общим для процессов сервиса с атомарным incr (Redis или Memcached), '
+                f'задайте REDIS_URL',
+            )
+        self.alias = alias
+
+    @property
+    def cache(self):
+        '''
+        Кэш со счетчиками
+
+        Returns:
+            Объект кэша Django
+        '''
+
+        return caches[self.alias]
+
+    def consume(self, key: str, capacity: int, refill_rate: float) -> float:
+        '''
+        Учет запроса в счетчике текущего окна
+
+        Args:
+            key: ключ корзины
+            capacity: количество запросов в окне
+            refill_rate: скорость пополнения, задает длину окна
+
+        Returns:
+            Время ожидания в секундах до следующего окна, 0 если запрос разрешен
+        '''
+
+        window = capacity / refill_rate
+        now = time.time()
+        index = int(now // window)
+        cache_key = f'{self.key_prefix}:{key}:{index}'
+        timeout = int(window) + 1
+        self.cache.add(cache_key, 0, timeout=timeout)
+        try:
+            count = self.cache.incr(cache_key)
+        except ValueError:
+            # счетчик удален из кэша между add и incr
+            self.cache.add(cache_key, 1, timeout=timeout)
+            count = 1
+        if count <= capacity:
+            return 0
+        return (index + 1) * window - now
+
+    def clear(self) -> None:
+        '''
+        Очистка счетчиков недоступна для общего кэша
+
+        Returns:
+            None
+        '''
+
+        return None
+
+
+_storage = None
+_storage_lock = threading.Lock()
+
+
+def get_bucket_storage() -> MemoryBucketStorage | CacheBucketStorage:
+    '''
+    Получение хранилища корзин согласно RATE_LIMIT_BACKEND
+
+    Returns:
+        Хранилище корзин
+    '''
+
+    global _storage
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                backend = getattr(settings, 'RATE_LIMIT_BACKEND', 'memory')
+                if backend == 'cache':
+                    _storage = CacheBucketStorage(
+                        alias=getattr(settings, 'RATE_LIMIT_CACHE', 'default'),
+                    )
+                else:
+                    _storage = MemoryBucketStorage()
+    return _storage
+
+
+class TokenBucketThrottle(BaseThrottle):
+    key_type = None
+
+    def __init__(self):
+        self._wait = None
+
+    def get_key(self, request, view) -> str | None:
+        raise NotImplementedError('.get_key() must be overridden')
+
+    def get_rate(self, view) -> tuple[int, float] | None:
+        '''
+        Получение лимита для представления
+
+        Args:
+            view: представление
+
+        Returns:
+            Кортеж из емкости корзины и скорости пополнения или None
+        '''
+
+        scope = getattr(view, 'throttle_scope', None)
+        if scope is None:
+            return None
+        rates = getattr(settings, 'RATE_LIMITS', {})
+        return parse_rate(rates.get(f'{scope}_{self.key_type}'))
+
+    def allow_request(self, request, view) -> bool:
+        '''
+        Списание токена из корзины ключа запроса
+
+        Args:
+            request: запрос DRF
+            view: представление
+
+        Returns:
+            Флаг, False - лимит исчерпан
+        '''
+
+        if not getattr(settings, 'RATE_LIMIT_ENABLED', True):
+            return True
+
+        rate = self.get_rate(view)
+        if rate is None:
+            return True
+
+        key = self.get_key(request, view)
+        if key is None:
+            return True
+
+        capacity, refill_rate = rate
+        scope = view.throttle_scope
+        self._wait = get_bucket_storage().consume(
+            key=f'{scope}:{self.key_type}:{key}',
+            capacity=capacity,
+            refill_rate=refill_rate,
+        )
+        return not self._wait
+
+    def wait(self) -> float | None:
+        '''
+        Время до пополнения корзины для заголовка Retry-After
+
+        Returns:
+            Время ожидания в секундах или None
+        '''
+
+        return self._wait
+
+
+class IPRateThrottle(TokenBucketThrottle):
+    key_type = 'ip'
+
+    def get_key(self, request, view) -> str | None:
+        # X-Forwarded-For учитывается только при NUM_PROXIES больше 0
+        return self.get_ident(request)
+
+
+class EmailRateThrottle(TokenBucketThrottle):
+    key_type = 'email'
+
+    def get_key(self, request, view) -> str | None:
+        if not isinstance(request.data, dict):
+            return None
+        email = request.data.get('email')
+        if not email or not isinstance(email, str):
+            return None
+        return email.strip().lower()
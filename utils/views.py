@@ -0,0 +1,75 @@
+import inspect
+
+from asgiref.sync import sync_to_async
+from django.utils.functional import classproperty
+from rest_framework import exceptions
+from rest_framework.views import APIView
+
+
+class AsyncAPIView(APIView):
+    '''
+    APIView с асинхронными обработчиками методов
+
+    Авторизация выполняется через aauthenticate классов авторизации, классы без
+    него вызываются в потоке. Проверки прав и лимитов, согласование формата
+    и обработка ошибок остаются синхронными DRF, они не обращаются к базе.
+    Синхронные обработчики (изменение данных) нужно оборачивать в sync_to_async
+    '''
+
+    @classproperty
+    def view_is_async(cls):
+        return True
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await self.aperform_authentication(request)
+            self.initial(request, *args, **kwargs)
+
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+
+            response = handler(request, *args, **kwargs)
+            if inspect.isawaitable(response):
+                response = await response
+
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+    async def aperform_authentication(self, request) -> None:
+        '''
+        Авторизация запроса без блокировки цикла событий, после нее
+        request.user не вызывает синхронную авторизацию DRF
+
+        Args:
+            request: запрос DRF
+
+        Returns:
+            None
+        '''
+
+        for authenticator in request.authenticators:
+            if hasattr(authenticator, 'aauthenticate'):
+                authenticate = authenticator.aauthenticate
+            else:
+                authenticate = sync_to_async(authenticator.authenticate)
+            try:
+                user_auth_tuple = await authenticate(request)
+            except exceptions.APIException:
+                request._not_authenticated()
+                raise
+            if user_auth_tuple is not None:
+                request._authenticator = authenticator
+                request.user, request.auth = user_auth_tuple
+                return
+        request._not_authenticated()